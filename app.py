@@ -1,26 +1,37 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import tempfile
+from array import array
+from collections import Counter
+from itertools import repeat
+from operator import itemgetter
 from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
-from utils.firebase_config import db, USERS_COLLECTION, TASKS_COLLECTION
+from utils.storage import get_storage
 from utils.auth import authenticate_user, initialize_sample_users
+from utils.task_repository import get_cached_tasks, cache_tasks, cache_put_task, normalize_filters
+from utils.kpi_counters import kpis_from_counters, STATUSES, COMPLETED_STATUSES
+from utils.compliance_counters import compliance_matrix, COMPLIANCE_CHECKS, COMPLIANCE_ROLLING_MONTHS
+from utils.work_order_allocator import format_work_order_number
+from utils.page_loader import PageReads
+from utils.kpi_engine import get_kpi_engine
+from utils.task_snapshot import get_task_snapshot, SNAPSHOT_SCHEMA
+from utils.checklist_items import failure_rates, CHECKLIST_ITEM_SCHEMA
+from utils.daily_rollup import get_daily_rollup, ROLLUP_DIMENSIONS
+from utils.findings_index import get_findings_index
+from utils.pdf_cache import get_pdf_cache, task_revision
+from utils.kpi_forecast import get_kpi_forecaster, FORECAST_COLUMNS, OVERALL_SEGMENT
+from utils.findings_terms import findings_term_counts, top_terms, WORD_COUNTS_FIELD, PHRASE_COUNTS_FIELD
 
 # Imports for PDF Generation 
-from fpdf import FPDF
-
-# Imports WO Counter Findings
-from firebase_admin import firestore 
-import re
-from collections import Counter
-
-
-# Firebase_collection
-COMPLIANCE_COLLECTION = "compliance_reports"
-NOTIFICATIONS_COLLECTION = "notifications"
-COUNTERS_COLLECTION = "counters" 
+from utils.pdf_report import generate_task_pdf
+from utils.pdf_export import export_task_pdfs, task_pdf_file_name
+from utils.consolidated_report import ConsolidatedReport
+from utils.task_export import ExportJob, EXPORT_FORMATS, XLSX_ENGINE, CHECKLIST_LAYOUTS
 
+# Imports Findings
 
 
 # Page 
@@ -31,6 +42,21 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Storage backend (Firestore, SQLite or in-memory, see utils/storage.py)
+storage = get_storage()
+# KPI aggregates kept current from task writes (see utils/kpi_engine.py)
+kpi_engine = get_kpi_engine() if storage else None
+# Local columnar copy of the tasks for the analytics pages (see utils/task_snapshot.py)
+task_snapshot = get_task_snapshot() if storage else None
+# Per-day activity rollup for long-range history (see utils/daily_rollup.py)
+daily_rollup = get_daily_rollup() if storage else None
+# Approval-rate forecasts per work center x location (see utils/kpi_forecast.py)
+kpi_forecaster = get_kpi_forecaster() if storage else None
+# Rendered work order PDFs, reused until the task changes (see utils/pdf_cache.py)
+pdf_cache = get_pdf_cache()
+# Full-text index over findings and checklist remarks (see utils/findings_index.py)
+findings_index = get_findings_index() if storage else None
+
 # Location
 LOCATION_MAP = {
     'TGAST': 'Onshore',
@@ -87,15 +113,6 @@ STANDARD_SAFETY_CHECKS = [
     "Gas Test Conducted"
 ]
 
-# Stop Words for Findings Analysis
-STOP_WORDS = set([
-    'a', 'an', 'and', 'the', 'in', 'is', 'it', 'of', 'for', 'on', 'with', 'was', 'to', 
-    'as', 'at', 'by', 'but', 'or', 'be', 'not', 'no', 'na', 'n/a', 'leaking', 'found',
-    'observed', 'requires', 'required', 'needs', 'due', 'level', 'high', 'low', 'unit',
-    'equipment', 'work', 'task', 'see', 'check', 'checked', 'also', 'has', 'had', 'per',
-    'need', 'replace', 'repair', 'broken', 'faulty', 'damage', 'damaged'
-])
-
 # Dynamic Sheet
 CHECKLIST_DEFINITIONS = {
     'Electrical': {
@@ -204,6 +221,25 @@ ELEC_EQUIPMENT_TYPES = list(CHECKLIST_DEFINITIONS['Electrical'].keys())
 MECH_EQUIPMENT_TYPES = list(CHECKLIST_DEFINITIONS['Mechanical'].keys())
 INST_EQUIPMENT_TYPES = list(CHECKLIST_DEFINITIONS['Instrument'].keys())
 
+# Number of work orders shown per page in task listings
+TASK_PAGE_SIZE = 20
+# Full work orders read per storage page when writing a consolidated report
+REPORT_PAGE_SIZE = 200
+
+# Fields list views need; the checklist payloads are loaded per task on demand
+TASK_SUMMARY_FIELDS = [
+    'work_order_number', 'work_center', 'location_type', 'specific_location', 'area',
+    'equipment_name', 'equipment_type', 'instrument_name', 'instrument_type',
+    'work_type', 'priority', 'estimated_duration', 'overall_findings',
+    'submitted_by', 'submitted_by_name', 'submission_date',
+    'status', 'feedback', 'reviewed_by', 'review_date'
+]
+# Task list exports: the summary fields plus safety checks, and at most as many
+# checklist item columns as the longest checklist has items
+TASK_EXPORT_FIELDS = ['id'] + TASK_SUMMARY_FIELDS + ['safety_checks']
+CHECKLIST_MAX_ITEMS = max(len(items) for equipment in CHECKLIST_DEFINITIONS.values() for items in equipment.values())
+TASK_DETAIL_FIELDS = ['checklist_data', 'safety_checks']
+
 
 
 # Initialize session state
@@ -215,36 +251,19 @@ def initialize_session_state():
     if 'current_page' not in st.session_state:
         st.session_state.current_page = "login"
 
-# Firebase Data Functions
+# Data Functions (storage backend chosen in utils/storage.py)
 def get_next_work_order_number():
     """
-    Atomically increments and returns a new work order number.
-    e.g., WO-00001
+    Returns a new, unique work order number, e.g. WO-00001.
+    On Firestore, numbers come from a block leased by this server process,
+    so most submissions do not touch the shared counter document.
     """
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return None
-    
-    counter_ref = db.collection(COUNTERS_COLLECTION).document("work_order_counter")
-    
-    @firestore.transactional
-    def update_in_transaction(transaction, doc_ref):
-        doc = doc_ref.get(transaction=transaction)
-        if not doc.exists:
-            new_val = 1
-            transaction.set(doc_ref, {'current_number': new_val})
-        else:
-            new_val = doc.to_dict()['current_number'] + 1
-            transaction.update(doc_ref, {'current_number': new_val})
-        return new_val
 
     try:
-        transaction = db.transaction()
-        next_number = update_in_transaction(transaction, counter_ref)
-        if next_number:
-            return f"WO-{next_number:05d}"
-        else:
-            return None
+        return format_work_order_number(storage.next_work_order_number())
     except Exception as e:
         st.error(f"Error generating work order number: {e}", icon="❌")
         return None
@@ -252,77 +271,94 @@ def get_next_work_order_number():
 
 
 def get_all_tasks():
-    """Get all tasks from Firebase"""
-    if not db:
+    """Get all tasks from the database"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return []
+    if storage.reads_are_local:
+        return storage.query_tasks()
+    cached = get_cached_tasks()
+    if cached is not None:
+        return cached
     try:
-        tasks_ref = db.collection(TASKS_COLLECTION)
-        tasks = tasks_ref.stream()
-        return [{'id': task.id, **task.to_dict()} for task in tasks]
+        task_list = storage.query_tasks()
+        cache_tasks(None, task_list)
+        return task_list
     except Exception as e:
         st.error(f"Error fetching tasks: {e}", icon="❌")
         return []
 
 def get_tasks_by_filters(filters=None):
     """Get tasks with filters"""
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return []
+    if storage.reads_are_local:
+        return storage.query_tasks(filters)
+    cached = get_cached_tasks(filters)
+    if cached is not None:
+        return cached
     try:
-        tasks_ref = db.collection(TASKS_COLLECTION)
-        
-        query = tasks_ref
-        
-        # Firestore query filters
-        if filters:
-            if 'work_center' in filters and filters['work_center']:
-                query = query.where('work_center', '==', filters['work_center'])
-            
-            if 'status' in filters and filters['status']:
-                if isinstance(filters['status'], list):
-                    if len(filters['status']) > 0 and len(filters['status']) <= 10:
-                        query = query.where('status', 'in', filters['status'])
-                    elif len(filters['status']) == 0:
-                        return []
-                else:
-                    query = query.where('status', '==', filters['status'])
-        
-        tasks = query.stream()
-        task_list = []
-        for task in tasks:
-            task_data = task.to_dict()
-            task_data['id'] = task.id
-            task_list.append(task_data)
-        #Python filter
-        if filters:
-            if 'location_type' in filters and filters['location_type']:
-                if isinstance(filters['location_type'], list):
-                    task_list = [t for t in task_list if t.get('location_type') in filters['location_type']]
-                else:
-                    task_list = [t for t in task_list if t.get('location_type') == filters['location_type']]
-            
-            if 'specific_location' in filters and filters['specific_location']:
-                task_list = [t for t in task_list if t.get('specific_location') == filters['specific_location']]
-            
-            if 'username' in filters and filters['username']:
-                task_list = [t for t in task_list if t.get('submitted_by') == filters['username']]
-            
-            if 'status' in filters and isinstance(filters['status'], list):
-                task_list = [t for t in task_list if t.get('status') in filters['status']]
-
+        task_list = storage.query_tasks(filters)
+        cache_tasks(filters, task_list)
         return task_list
     except Exception as e:
         st.error(f"Error fetching tasks: {e}", icon="❌")
         return []
 
+def get_tasks_page(filters=None, page_size=None, cursor=None, fields=TASK_SUMMARY_FIELDS):
+    """
+    Get one page of tasks, newest first.
+    'cursor' is the previous page's next_cursor, or a submission_date to
+    start with the tasks submitted before it.
+    Only 'fields' are downloaded (None for the full documents).
+    Returns (tasks, next_cursor); next_cursor is None on the last page.
+    """
+    page_size = page_size or TASK_PAGE_SIZE
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return [], None
+    try:
+        return storage.query_tasks_page(filters, page_size, cursor, fields)
+    except Exception as e:
+        st.error(f"Error fetching tasks: {e}", icon="❌")
+        return [], None
+
+@st.cache_data(max_entries=500, show_spinner=False)
+def _fetch_task_details(task_id):
+    task = storage.get_task(task_id, fields=TASK_DETAIL_FIELDS) or {}
+    return {field: task[field] for field in TASK_DETAIL_FIELDS if field in task}
+
+def get_task_details(task_id):
+    """Get the checklist and safety payload of one task (left out of list queries)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return {}
+    try:
+        # Checklist results never change after submission, so they are cached per task
+        return _fetch_task_details(task_id)
+    except Exception as e:
+        st.error(f"Error fetching task details: {e}", icon="❌")
+        return {}
+
+def count_tasks(filters=None):
+    """Count tasks matching the filters without downloading them"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return 0
+    try:
+        return storage.count_tasks(filters)
+    except Exception as e:
+        st.error(f"Error counting tasks: {e}", icon="❌")
+        return 0
+
 # Add WO Numbe
 def add_task(task_data):
     """
-    Add task to Firebase with all metadata (WO Number, User, Timestamp).
+    Add task to the database with all metadata (WO Number, User, Timestamp).
     'task_data' now only contains data from the form.
     """
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False, None
     try:
@@ -338,10 +374,14 @@ def add_task(task_data):
         task_data['submitted_by_name'] = st.session_state.user_data['name']
         task_data['submission_date'] = datetime.now().isoformat()
         task_data['status'] = 'pending'
+        # Keyword and phrase counts for findings analysis, computed once here
+        task_data.update(findings_term_counts(task_data.get('overall_findings')))
         
-        # Save to Firebase
-        tasks_ref = db.collection(TASKS_COLLECTION)
-        tasks_ref.add(task_data)
+        # Save together with the KPI counter updates
+        task_id = storage.add_task(task_data)
+        cache_put_task({'id': task_id, **task_data})
+        kpi_engine.apply(new_task=task_data)
+        findings_index.add({'id': task_id, **task_data})
         
         # Return success and the new WO number
         return True, wo_number 
@@ -350,21 +390,26 @@ def add_task(task_data):
         return False, None
 
 
+def _rejection_notification(task_id, task_data, feedback):
+    """Notification for the user who submitted a rejected task (None if unknown)"""
+    submitted_by_username = task_data.get('submitted_by')
+    if not submitted_by_username:
+        return None
+    return {
+        'username': submitted_by_username,
+        'message': f"Work Order '{task_data.get('work_order_number', task_id)}' was rejected. Reason: {feedback}",
+        'read': False,
+        'timestamp': datetime.now().isoformat(),
+        'task_id': task_id
+    }
+
+
 def update_task_status(task_id, status, feedback="", reviewed_by=""):
-    """Update task status in Firebase and create notification if rejected"""
-    if not db:
+    """Update task status and create notification if rejected"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False
     try:
-        task_ref = db.collection(TASKS_COLLECTION).document(task_id)
-        
-        #designated person submit form
-        task_doc = task_ref.get()
-        if not task_doc.exists:
-            st.error("Task not found.", icon="❌")
-            return False
-        task_data = task_doc.to_dict()
-
         # Prepare update data
         update_data = {
             'status': status,
@@ -373,23 +418,19 @@ def update_task_status(task_id, status, feedback="", reviewed_by=""):
             'review_date': datetime.now().isoformat()
         }
         
-        # Update the task
-        task_ref.update(update_data)
+        # Update the task and the KPI counters atomically
+        task_data = storage.update_task(task_id, update_data)
+        if task_data is None:
+            st.error("Task not found.", icon="❌")
+            return False
+        cache_put_task({'id': task_id, **task_data, **update_data})
+        kpi_engine.apply(task_data, {**task_data, **update_data})
         
         # notification if the task is rejected 
         if status == 'rejected' and feedback:
-            submitted_by_username = task_data.get('submitted_by')
-            if submitted_by_username:
-                # Create a notification for the user who submitted the task
-                notif_ref = db.collection(NOTIFICATIONS_COLLECTION)
-                notif_data = {
-                    'username': submitted_by_username,
-                    'message': f"Work Order '{task_data.get('work_order_number', task_id)}' was rejected. Reason: {feedback}",
-                    'read': False,
-                    'timestamp': datetime.now().isoformat(),
-                    'task_id': task_id
-                }
-                notif_ref.add(notif_data)
+            notif_data = _rejection_notification(task_id, task_data, feedback)
+            if notif_data:
+                storage.add_notification(notif_data)
         
         return True
     except Exception as e:
@@ -397,41 +438,167 @@ def update_task_status(task_id, status, feedback="", reviewed_by=""):
         return False
 
 
+def bulk_update_task_status(tasks, status, feedback="", reviewed_by=""):
+    """
+    Approve or reject several pending tasks with batched writes; returns how
+    many were updated. Tasks reviewed in the meantime are skipped, and the
+    chunks written before a failure stay counted.
+    """
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return 0
+    update_data = {
+        'status': status,
+        'feedback': feedback,
+        'reviewed_by': reviewed_by,
+        'review_date': datetime.now().isoformat()
+    }
+    updates = []
+    for task in tasks:
+        notif_data = None
+        if status == 'rejected' and feedback:
+            notif_data = _rejection_notification(task['id'], task, feedback)
+        updates.append((task['id'], update_data, notif_data))
+    
+    updated = 0
+    remaining = iter(tasks)
+    try:
+        # Each chunk is applied to the cache and the KPI engine as soon as it is committed
+        for old_tasks in storage.bulk_update_tasks(updates, expected_status='pending'):
+            # old_tasks first, so zip does not take a task past the end of the chunk
+            for old_task, task in zip(old_tasks, remaining):
+                if old_task is not None:
+                    cache_put_task({'id': task['id'], **old_task, **update_data})
+                    kpi_engine.apply(old_task, {**old_task, **update_data})
+                    updated += 1
+    except Exception as e:
+        st.error(f"Error updating tasks: {e} ({updated} of {len(tasks)} were updated before the error)", icon="❌")
+        return updated
+    
+    if updated < len(tasks):
+        st.warning(f"{len(tasks) - updated} work order(s) were skipped: already reviewed or deleted.", icon="⚠️")
+    return updated
+
+
+def get_kpi_summary(location_type=None):
+    """Get headline KPIs (same shape as calculate_kpis) from the incremental KPI aggregates"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return calculate_kpis([])
+    try:
+        return kpis_from_counters(kpi_engine.counters(), location_type)
+    except Exception as e:
+        st.error(f"Error loading KPI counters: {e}", icon="❌")
+        return calculate_kpis([])
+
+
+def get_snapshot_table(columns, filters=None):
+    """Get task columns from the local Parquet snapshot as an Arrow table (no per-document reads)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return SNAPSHOT_SCHEMA.empty_table().select(columns)
+    try:
+        return task_snapshot.read(columns, filters)
+    except Exception as e:
+        st.error(f"Error reading task snapshot: {e}", icon="❌")
+        return SNAPSHOT_SCHEMA.empty_table().select(columns)
+
+
+def get_snapshot_tasks(columns, filters=None):
+    """Get task columns from the local Parquet snapshot as a DataFrame (no per-document reads)"""
+    return get_snapshot_table(columns, filters).to_pandas()
+
+
+def search_findings(query):
+    """Rank the tasks whose findings or checklist remarks contain every query word (words match as prefixes)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return []
+    try:
+        return findings_index.search(query)
+    except Exception as e:
+        st.error(f"Error searching findings: {e}", icon="❌")
+        return []
+
+
+def get_checklist_items(columns, filters=None):
+    """Get flattened checklist results (one row per item) from the local Parquet snapshot as an Arrow table"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return CHECKLIST_ITEM_SCHEMA.empty_table().select(columns)
+    try:
+        return task_snapshot.read_checklist_items(columns, filters)
+    except Exception as e:
+        st.error(f"Error reading checklist results: {e}", icon="❌")
+        return CHECKLIST_ITEM_SCHEMA.empty_table().select(columns)
+
+
+def get_rollup_rows():
+    """Get the closed-day activity rollup rows (a few rows per day with activity)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return pd.DataFrame()
+    try:
+        return daily_rollup.rows()
+    except Exception as e:
+        st.error(f"Error loading daily rollup: {e}", icon="❌")
+        return pd.DataFrame()
+
+
+def get_kpi_trend(start_date, end_date, granularity="D"):
+    """Get the KPI trend history from the incremental KPI aggregates (no task reads)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return pd.DataFrame(columns=TREND_COLUMNS)
+    try:
+        return trend_history_from_counters(kpi_engine.daily_counts(start_date, end_date), start_date, end_date, granularity)
+    except Exception as e:
+        st.error(f"Error loading KPI trend: {e}", icon="❌")
+        return pd.DataFrame(columns=TREND_COLUMNS)
+
+
+def get_kpi_forecast(horizon=7, target=80):
+    """Get the approval-rate forecasts, overall row first, then every work center x location (cached for the day)"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+    try:
+        return kpi_forecaster.forecast(horizon, target)
+    except Exception as e:
+        st.error(f"Error forecasting KPIs: {e}", icon="❌")
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+
 def get_unread_notifications(username):
     """Get all unread notifications for a user"""
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return []
     try:
-        notif_ref = db.collection(NOTIFICATIONS_COLLECTION)
-        
-        query = notif_ref.where('username', '==', username).where('read', '==', False).order_by('timestamp', direction=firestore.Query.DESCENDING)
-        notifications = query.stream()
-        return [{'id': notif.id, **notif.to_dict()} for notif in notifications]
+        return storage.get_unread_notifications(username)
     except Exception as e:
         st.error(f"Error fetching notifications: {e}", icon="❌")
         return []
 
 def mark_notification_read(notification_id):
     """Mark a notification as read"""
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False
     try:
-        notif_ref = db.collection(NOTIFICATIONS_COLLECTION).document(notification_id)
-        notif_ref.update({'read': True})
+        storage.mark_notification_read(notification_id)
         return True
     except Exception as e:
         st.error(f"Error dismissing notification: {e}", icon="❌")
         return False
 
 def save_compliance_report(report_data):
-    """Save a new compliance report to Firebase"""
-    if not db:
+    """Save a new compliance report"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False
     try:
-        db.collection(COMPLIANCE_COLLECTION).add(report_data)
+        storage.add_compliance_report(report_data)
         return True
     except Exception as e:
         st.error(f"Error saving compliance report: {e}", icon="❌")
@@ -440,171 +607,122 @@ def save_compliance_report(report_data):
 # compliance location
 def get_compliance_reports(location):
     """Get all compliance reports for a specific location"""
-    if not db:
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return []
     try:
-        reports_ref = db.collection(COMPLIANCE_COLLECTION)
-        
-        query = reports_ref.where('location', '==', location).order_by('report_date', direction=firestore.Query.DESCENDING)
-        reports = query.stream()
-        return [{'id': report.id, **report.to_dict()} for report in reports]
+        return storage.get_compliance_reports(location)
     except Exception as e:
         st.error(f"Error fetching compliance reports: {e}", icon="❌")
         return []
 
+def get_compliance_matrix():
+    """Get per-location check pass rates and rolling compliance scores from the compliance counters (one small read)"""
+    columns = ['location', 'reports', 'compliant_rate'] + list(COMPLIANCE_CHECKS) + ['rolling_score']
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return pd.DataFrame(columns=columns)
+    try:
+        return pd.DataFrame(compliance_matrix(storage.load_compliance_counters(), ALL_LOCATIONS), columns=columns)
+    except Exception as e:
+        st.error(f"Error loading compliance summary: {e}", icon="❌")
+        return pd.DataFrame(columns=columns)
+
 # PDF Generation Functions 
 
-class PDF(FPDF):
-    """Custom PDF class with header and footer"""
-    def header(self):
-        self.set_font('Arial', 'B', 14)
-        self.cell(0, 10, 'Work Order Maintenance Report', 0, 1, 'C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        page_num = f'Page {self.page_no()}/{{nb}}'
-        gen_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        self.cell(0, 10, page_num, 0, 0, 'L')
-        self.cell(0, 10, f'Report Generated: {gen_time}', 0, 0, 'R')
-
-def safe_text(text):
-    """Helper to clean text for FPDF latin-1 encoding"""
-    if text is None:
-        return "N/A"
-    return str(text).encode('latin-1', 'replace').decode('latin-1')
-
-def generate_task_pdf(task_data):
-    """Generates a dynamic PDF report for a given task and returns it as bytes"""
-    
-    pdf = PDF()
-    pdf.alias_nb_pages()
-    pdf.add_page()
-    pdf.set_font('Arial', '', 10)
-    
-    line_height = 7 # Define a standard line height
-    
-    #Helper function for metadata rows 
-    def add_dual_row(l1, v1, l2, v2):
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(40, line_height, safe_text(l1), 1, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(55, line_height, safe_text(v1), 1, 0)
-        
-        pdf.set_font('Arial', 'B', 10)
-        pdf.cell(40, line_height, safe_text(l2), 1, 0)
-        pdf.set_font('Arial', '', 10)
-        pdf.cell(55, line_height, safe_text(v2), 1, 1) # ln=1 for new line
-    
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, '1. Work Order Details', 0, 1, 'L')
-    
-    # Get dynamic names
-    equip_name = task_data.get('equipment_name', task_data.get('instrument_name', 'N/A'))
-    equip_type = task_data.get('equipment_type', task_data.get('instrument_type', 'N/A'))
-    
-    add_dual_row("Work Order #:", task_data.get('work_order_number'), "Status:", task_data.get('status', 'N/A').title())
-    add_dual_row("Submitted By:", task_data.get('submitted_by_name'), "Submission Date:", task_data.get('submission_date', 'N/A')[:10])
-    add_dual_row("Work Center:", task_data.get('work_center'), "Priority:", task_data.get('priority'))
-    add_dual_row("Location Type:", task_data.get('location_type'), "Location:", task_data.get('specific_location'))
-    add_dual_row("Area/Unit:", task_data.get('area'), "Est. Duration (h):", task_data.get('estimated_duration'))
-    add_dual_row("Equipment Tag:", equip_name, "Equipment Type:", equip_type)
-    
-    # Single row for Work Type
-    pdf.set_font('Arial', 'B', 10)
-    pdf.cell(40, line_height, safe_text("Work Type:"), 1, 0)
-    pdf.set_font('Arial', '', 10)
-    pdf.cell(150, line_height, safe_text(task_data.get('work_type')), 1, 1)
-
-    # Findings ---
-    pdf.ln(5) # Add space
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, '2. Overall Findings / Summary', 0, 1, 'L')
-    pdf.set_font('Arial', '', 10)
-    pdf.multi_cell(190, line_height - 2, safe_text(task_data.get('overall_findings', 'N/A')), 1, 1)
-    
-    #  Safety ---
-    pdf.ln(5)
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, '3. Safety Checks Performed', 0, 1, 'L')
-    pdf.set_font('Arial', '', 10)
-    
-    safety_checks = task_data.get('safety_checks', [])
-    if not safety_checks:
-        pdf.cell(190, line_height, "No safety checks recorded.", 1, 1)
-    else:
-        safety_text = ""
-        for check in safety_checks:
-            safety_text += f"- {safe_text(check)}\n"
-        pdf.multi_cell(190, line_height - 2, safety_text, 1, 1)
-
-    # Checklist ---
-    pdf.ln(5)
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, '4. PPM Checklist Results', 0, 1, 'L')
-    
-    # Table Header
-    col_width_task = 110
-    col_width_status = 25
-    col_width_remarks = 55
-    
-    pdf.set_font('Arial', 'B', 10)
-    pdf.cell(col_width_task, line_height, 'Task Description', 1, 0, 'C')
-    pdf.cell(col_width_status, line_height, 'Status', 1, 0, 'C')
-    pdf.cell(col_width_remarks, line_height, 'Remarks', 1, 1, 'C')
-    
-    pdf.set_font('Arial', '', 9)
-    checklist_data = task_data.get('checklist_data', [])
-    
-    if not checklist_data:
-           pdf.cell(190, line_height, "No checklist data found.", 1, 1, 'C')
-    else:
-        for item in checklist_data:
-            task_desc = safe_text(item.get('task', 'N/A'))
-            status = safe_text(item.get('status', 'N/A'))
-            remarks = safe_text(item.get('remarks', 'N/A'))
-            
-            # Get Y position before drawing row
-            y_start = pdf.get_y()
-            
-            # Cell Task
-            pdf.multi_cell(col_width_task, line_height - 2, task_desc, 1, 'L')
-            y1 = pdf.get_y() # Get Y after drawing
-            
-            # Reset X,Y for Cell 2
-            pdf.set_xy(pdf.get_x() + col_width_task, y_start)
-            
-            # Cell Status
-            pdf.multi_cell(col_width_status, line_height - 2, status, 1, 'C')
-            y2 = pdf.get_y() # Get Y after drawing
-            
-            # Reset X,Y for Cell 3
-            pdf.set_xy(pdf.get_x() + col_width_task + col_width_status, y_start)
-            
-            # Cell Remarks
-            pdf.multi_cell(col_width_remarks, line_height - 2, remarks, 1, 'L')
-            y3 = pdf.get_y() # Get Y after drawing
+def get_task_pdf(task):
+    """
+    PDF bytes for a task, rendered (and its checklist loaded) only when the
+    download is clicked and only once per task revision. A failed checklist
+    load raises instead of caching a report without the checklist.
+    """
+    return pdf_cache.get_or_render(
+        task['id'], task_revision(task),
+        lambda: generate_task_pdf({**task, **_fetch_task_details(task['id'])})
+    )
+
+def iter_tasks_between(filters, start_date=None, end_date=None):
+    """
+    Yields the full documents of every task matching the filters and
+    submitted between start_date and end_date (either may be None), newest
+    first. The date range is applied by the storage query, a page at a time.
+    """
+    start = start_date.isoformat() if start_date else ''
+    cursor = (end_date + timedelta(days=1)).isoformat() if end_date else None
+    while True:
+        tasks, cursor = get_tasks_page(filters, REPORT_PAGE_SIZE, cursor, fields=None)
+        for task in tasks:
+            # Pages are newest first, so the first task before start_date is the end
+            if str(task.get('submission_date') or '') < start:
+                return
+            yield task
+        if not cursor:
+            return
+
+def export_task_pdfs_zip(output, filters, start_date, end_date, on_progress=None):
+    """
+    Writes a ZIP archive of the PDFs of every task matching the filters and
+    submitted between start_date and end_date to the file 'output',
+    rendered across all CPU cores. Tasks are read a page at a time as the
+    workers need them. Returns the number of PDFs.
+    """
+    try:
+        return export_task_pdfs(iter_tasks_between(filters, start_date, end_date), output, on_progress)
+    except Exception as e:
+        st.error(f"Error exporting PDFs: {e}", icon="❌")
+        return 0
 
-            # Set cursor to the bottom of the tallest cell 
-            max_y = max(y1, y2, y3)
-            pdf.set_y(max_y)
+def write_consolidated_report(output, filters, start_date, end_date, title, scope, on_progress=None):
+    """
+    Writes one PDF to the file 'output': a cover with the KPI summary, a
+    table of contents and the report of every task matching the filters
+    (submitted between start_date and end_date when given). Tasks are read
+    a page at a time and every PDF page is written out when finished, so
+    memory stays flat however many work orders there are.
+    Returns the number of work orders.
+    """
+    kpi_columns = KpiColumns()
+    try:
+        report = ConsolidatedReport(output, title, scope)
+        for task in iter_tasks_between(filters, start_date, end_date):
+            report.add_work_order(task)
+            kpi_columns.append(task)
+            if on_progress and len(kpi_columns) % REPORT_PAGE_SIZE == 0:
+                on_progress(len(kpi_columns))
+        report.finish(calculate_kpis(kpi_columns))
+        return len(kpi_columns)
+    except Exception as e:
+        st.error(f"Error writing consolidated report: {e}", icon="❌")
+        return 0
+
+def start_task_export(filters, file_format, layout):
+    """Starts exporting every task matching the filters in the background, replacing any earlier export"""
+    if not storage:
+        st.error("Database connection not available.", icon="❌")
+        return
+    previous = st.session_state.pop('task_export', None)
+    if previous:
+        previous.discard()
+    try:
+        st.session_state['task_export_total'] = count_tasks(filters)
+        st.session_state['task_export'] = ExportJob(storage, filters, file_format, TASK_EXPORT_FIELDS, layout, CHECKLIST_MAX_ITEMS)
+    except Exception as e:
+        st.error(f"Error starting export: {e}", icon="❌")
 
-    # Output the PDF as bytes
-    return pdf.output().encode('latin-1')
+def read_report_file(report_file):
+    """The whole content of a report temp file"""
+    report_file.seek(0)
+    return report_file.read()
 
 
 # User Profile Functions 
 def update_user_profile_details(username, name, email):
-    """Update user's name and email in Firebase"""
-    if not db:
+    """Update user's name and email"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False
     try:
-        user_ref = db.collection(USERS_COLLECTION).document(username)
-        user_ref.update({
+        storage.update_user(username, {
             'name': name,
             'email': email
         })
@@ -614,21 +732,18 @@ def update_user_profile_details(username, name, email):
         return False
 
 def update_user_password(username, old_password, new_password):
-    """Update user's password in Firebase after verifying the old one"""
-    if not db:
+    """Update user's password after verifying the old one"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False, "Database connection not available."
     try:
-        user_ref = db.collection(USERS_COLLECTION).document(username)
-        user_doc = user_ref.get()
-        if not user_doc.exists:
+        user_data = storage.get_user(username)
+        if user_data is None:
             return False, "User not found."
-            
-        user_data = user_doc.to_dict()
         
         # comparing plaintext passwords.
         if user_data.get('password') == old_password:
-            user_ref.update({'password': new_password})
+            storage.update_user(username, {'password': new_password})
             return True, "Password updated successfully!"
         else:
             return False, "Incorrect current password."
@@ -638,21 +753,115 @@ def update_user_password(username, old_password, new_password):
         return False, f"An error occurred: {e}"
 
 def delete_user_from_db(username):
-    """Delete a user document from Firebase"""
-    if not db:
+    """Delete a user from the database"""
+    if not storage:
         st.error("Database connection not available.", icon="❌")
         return False
     try:
-        db.collection(USERS_COLLECTION).document(username).delete()
+        storage.delete_user(username)
         return True
     except Exception as e:
         st.error(f"Error deleting user: {e}", icon="❌")
         return False
 
 # KPI Calculation Functions
+# Task fields the KPI engine groups by
+KPI_GROUP_FIELDS = ['work_center', 'specific_location', 'location_type']
+
+
+def _categorical(values):
+    """Categorical column via factorize (much faster than pd.Categorical on object lists)"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+    if (codes < 0).any():
+        # Explicit None values are grouped with missing fields
+        known = np.flatnonzero(uniques == 'Unknown')
+        if known.size:
+            unknown_code = known[0]
+        else:
+            uniques, unknown_code = np.append(uniques, 'Unknown'), len(uniques)
+        codes = np.where(codes < 0, unknown_code, codes)
+    return pd.Categorical.from_codes(codes, categories=uniques)
+
+
+# The task fields calculate_kpis reads, as one key per task
+KPI_TASK_FIELDS = KPI_GROUP_FIELDS + ['status', 'estimated_duration']
+_kpi_task_key = itemgetter(*KPI_TASK_FIELDS)
+
+
+def _duration_column(values):
+    """Float durations, NaN when missing or not numeric"""
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('integer', 'floating', 'mixed-integer-float', 'empty'):
+        values = [d if isinstance(d, (int, float)) else None for d in values]
+    return np.array(values, dtype=float)
+
+
+def build_task_frame(tasks):
+    """
+    Typed frame the KPI engine works on: one row per distinct combination of
+    group fields, status and duration, with the number of tasks sharing it
+    in 'task_count'. Tasks repeat a handful of combinations, so counting
+    them (in C, via Counter) replaces a per-task pass over the dicts. Build
+    it once when several KPI calculations run over the same tasks.
+    """
+    try:
+        counts = Counter(map(_kpi_task_key, tasks))
+    except KeyError:
+        # Some task lacks a field: read them all with get() instead
+        counts = Counter(zip(*(map(dict.get, tasks, repeat(field)) for field in KPI_TASK_FIELDS)))
+    *groups, statuses, durations = zip(*counts) if counts else [()] * len(KPI_TASK_FIELDS)
+    
+    # Missing or None group fields and statuses are grouped as 'Unknown'
+    frame = pd.DataFrame({field: _categorical(values) for field, values in zip(KPI_GROUP_FIELDS, groups)})
+    frame['status'] = _categorical(statuses)
+    frame['estimated_duration'] = _duration_column(list(durations))
+    frame['task_count'] = np.fromiter(counts.values(), dtype=float, count=len(counts))
+    return frame
+
+
+class KpiColumns:
+    """
+    Collects the fields calculate_kpis reads from tasks seen one at a time
+    (e.g. page by page), dictionary-encoding them on the way in. frame()
+    then returns a frame in the build_task_frame layout, one row per task,
+    without another pass over task dicts.
+    """
+    def __init__(self):
+        # Typed arrays, so frame() wraps their buffers instead of converting Python lists
+        self._codes = {field: array('i') for field in KPI_GROUP_FIELDS + ['status']}
+        self._categories = {field: {} for field in self._codes}
+        self._durations = array('d')
+    
+    def __len__(self):
+        return len(self._durations)
+    
+    def append(self, task):
+        for field, codes in self._codes.items():
+            value = task.get(field)
+            if value is None:
+                # Missing group fields count as 'Unknown'; a missing status stays missing
+                if field == 'status':
+                    codes.append(-1)
+                    continue
+                value = 'Unknown'
+            categories = self._categories[field]
+            codes.append(categories.setdefault(value, len(categories)))
+        duration = task.get('estimated_duration')
+        self._durations.append(duration if isinstance(duration, (int, float)) else np.nan)
+    
+    def frame(self):
+        frame = pd.DataFrame({
+            field: pd.Categorical.from_codes(np.frombuffer(codes, dtype=np.intc),
+                                             categories=list(self._categories[field]))
+            for field, codes in self._codes.items()
+        })
+        frame['estimated_duration'] = np.frombuffer(self._durations, dtype=float)
+        frame['task_count'] = np.ones(len(frame))
+        return frame
+
+
 def calculate_kpis(tasks):
-    """Calculate key performance indicators"""
-    if not tasks:
+    """Calculate key performance indicators from task dicts, a build_task_frame frame or a KpiColumns"""
+    if len(tasks) == 0:
         return {
             'total_tasks': 0,
             'completed_tasks': 0,
@@ -663,147 +872,129 @@ def calculate_kpis(tasks):
             'location_type_performance': {}
         }
     
-    total_tasks = len(tasks)
-    completed_tasks = len([t for t in tasks if t['status'] in ['approved', 'rejected']])
-    approved_tasks = len([t for t in tasks if t['status'] == 'approved'])
-    
+    if isinstance(tasks, KpiColumns):
+        frame = tasks.frame()
+    else:
+        frame = tasks if isinstance(tasks, pd.DataFrame) else build_task_frame(tasks)
+    # Every row stands for task_count tasks
+    task_count = frame['task_count'].to_numpy()
+    completed = frame['status'].isin(COMPLETED_STATUSES).to_numpy() * task_count
+    approved = (frame['status'] == 'approved').to_numpy() * task_count
+    
+    total_tasks = int(task_count.sum())
+    completed_tasks = int(completed.sum())
+    approved_tasks = int(approved.sum())
     approval_rate = (approved_tasks / completed_tasks * 100) if completed_tasks > 0 else 0
     
-
-    #Avg Completion Time Calculation
-    completion_times = []
-    for task in tasks:
-        if task['status'] in ['approved', 'rejected']:
-            duration = task.get('estimated_duration')
-            if isinstance(duration, (int, float)):
-                completion_times.append(duration)
-                
-    avg_completion_time = np.mean(completion_times) if completion_times else 0
-    
-    # Work center performance
-    work_centers = set(task['work_center'] for task in tasks)
-    work_center_performance = {}
-    for wc in work_centers:
-        wc_tasks = [t for t in tasks if t['work_center'] == wc]
-        wc_completed = len([t for t in wc_tasks if t['status'] in ['approved', 'rejected']])
-        wc_approved = len([t for t in wc_tasks if t['status'] == 'approved'])
-        wc_approval_rate = (wc_approved / wc_completed * 100) if wc_completed > 0 else 0
-        work_center_performance[wc] = wc_approval_rate
-    
-    # Location performance
-    locations = set(task.get('specific_location', 'Unknown') for task in tasks)
-    location_performance = {}
-    for loc in locations:
-        loc_tasks = [t for t in tasks if t.get('specific_location') == loc]
-        loc_completed = len([t for t in loc_tasks if t['status'] in ['approved', 'rejected']])
-        loc_approved = len([t for t in loc_tasks if t['status'] == 'approved'])
-        loc_approval_rate = (loc_approved / loc_completed * 100) if loc_completed > 0 else 0
-        location_performance[loc] = loc_approval_rate
-    
-    # Location type performance
-    location_types = set(task.get('location_type', 'Unknown') for task in tasks)
-    location_type_performance = {}
-    for loc_type in location_types:
-        type_tasks = [t for t in tasks if t.get('location_type') == loc_type]
-        type_completed = len([t for t in type_tasks if t['status'] in ['approved', 'rejected']])
-        type_approved = len([t for t in type_tasks if t['status'] == 'approved'])
-        type_approval_rate = (type_approved / type_completed * 100) if type_completed > 0 else 0
-        location_type_performance[loc_type] = type_approval_rate
+    #Avg Completion Time Calculation (numeric durations of completed tasks)
+    durations = frame['estimated_duration'].to_numpy()
+    timed = completed * ~np.isnan(durations)
+    avg_completion_time = float(np.dot(np.nan_to_num(durations), timed) / timed.sum()) if timed.any() else 0
+    
+    def approval_rates(field):
+        # Counts per group straight from the category codes, one bincount per measure
+        column = frame[field].array
+        size = len(column.categories)
+        totals = np.bincount(column.codes, weights=task_count, minlength=size)
+        group_completed = np.bincount(column.codes, weights=completed, minlength=size)
+        group_approved = np.bincount(column.codes, weights=approved, minlength=size)
+        rates = np.divide(group_approved * 100, group_completed, out=np.zeros(size), where=group_completed > 0)
+        return {group: rate for group, rate, count in zip(column.categories, rates.tolist(), totals) if count}
     
     return {
         'total_tasks': total_tasks,
         'completed_tasks': completed_tasks,
         'approval_rate': approval_rate,
         'avg_completion_time': avg_completion_time,
-        'work_center_performance': work_center_performance,
-        'location_performance': location_performance,
-        'location_type_performance': location_type_performance
+        'work_center_performance': approval_rates('work_center'),
+        'location_performance': approval_rates('specific_location'),
+        'location_type_performance': approval_rates('location_type')
     }
 
-def predict_kpi_trend(tasks, days=30):
-    """Predict KPI trends for the next period"""
-    historical_data = []
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-    
-    current_date = start_date
-    while current_date <= end_date:
-        date_str = current_date.strftime('%Y-%m-%d')
-        # Filter tasks submitted on this day
-        day_tasks = [
-            t for t in tasks 
-            if 'submission_date' in t and t['submission_date'].startswith(date_str)
-        ]
-        
-        if day_tasks:
-            day_kpis = calculate_kpis(day_tasks)
-            historical_data.append({
-                'date': current_date,
-                'approval_rate': day_kpis['approval_rate'],
-                'completion_rate': (day_kpis['completed_tasks'] / day_kpis['total_tasks'] * 100) if day_kpis['total_tasks'] > 0 else 0
-            })
-        
-        current_date += timedelta(days=1)
-    
-    # Simple prediction
-    if len(historical_data) >= 2:
-        approval_rates = [d['approval_rate'] for d in historical_data]
-        current_rate = approval_rates[-1] if approval_rates else 0
-        
-        # Use simple moving average or trend
-        x = np.arange(len(approval_rates))
-        y = np.array(approval_rates)
-        
-        try:
-            # Fit a linear trend
-            trend_poly = np.polyfit(x, y, 1)
-            trend = trend_poly[0] # The slope
-        except np.linalg.LinAlgError:
-            trend = 0 
-            # Handle singular matrix error if data is flat
+# Trend windows (days) and bucket sizes offered on the Performance Trends page
+TREND_WINDOWS = {"Last 30 Days": 30, "Last 90 Days": 90, "Last 365 Days": 365, "Custom Range": None}
+TREND_GRANULARITIES = {"Daily": "D", "Weekly": "W", "Monthly": "M"}
 
-        # Predict 7 days out
-        predicted_rate = current_rate + (trend * 7) 
-        predicted_rate = max(0, min(100, predicted_rate))
-        
-        # Achievement probability
-        recent_rates = approval_rates[-7:] if len(approval_rates) >= 7 else approval_rates
-        above_target = sum(1 for rate in recent_rates if rate >= 80)
-        achievement_probability = (above_target / len(recent_rates) * 100) if recent_rates else 0
-        
-        return {
-            'current_rate': current_rate,
-            'predicted_rate': predicted_rate,
-            'trend': trend,
-            'achievement_probability': achievement_probability,
-            'historical_data': historical_data
-        }
-    
-    return {
-        'current_rate': 0,
-        'predicted_rate': 0,
-        'trend': 0,
-        'achievement_probability': 0,
-        'historical_data': []
-    }
 
-# Helper Function for Findings Analysis 
-def analyze_findings_text(findings_list):
-    """Processes a list of finding strings and returns a Counter of common words."""
-    all_text = ' '.join(findings_list).lower()
-    
-    # Remove punctuation
-    all_text = re.sub(r'[^\w\s]', '', all_text)
-    
-    words = all_text.split()
+TREND_COLUMNS = ['date', 'total_tasks', 'completed_tasks', 'approval_rate', 'completion_rate']
+
+
+def _bucket_trend(daily, granularity):
+    """Rolls per-day total/completed/approved counts up into day, week or month periods"""
+    daily = daily[daily['total_tasks'] > 0]
+    if daily.empty:
+        return pd.DataFrame(columns=TREND_COLUMNS)
     
-    # Filter out stop words and short words
-    filtered_words = [
-        word for word in words 
-        if word not in STOP_WORDS and len(word) > 3
-    ]
+    periods = daily['day'].dt.to_period(granularity)
+    history = daily.groupby(periods)[['total_tasks', 'completed_tasks', 'approved_tasks']].sum()
+    history['date'] = history.index.to_timestamp()
+    completed = history['completed_tasks'].where(history['completed_tasks'] > 0)
+    history['approval_rate'] = (history['approved_tasks'] / completed * 100).fillna(0)
+    history['completion_rate'] = history['completed_tasks'] / history['total_tasks'] * 100
+    return history[TREND_COLUMNS].reset_index(drop=True)
+
+
+def _window_mask(days, start_date, end_date):
+    return (days >= pd.Timestamp(start_date).normalize()) & (days <= pd.Timestamp(end_date).normalize())
+
+
+def trend_history_from_counters(day_counts, start_date, end_date, granularity="D"):
+    """
+    Approval and completion rates per day, week or month between two dates
+    (inclusive), from the daily KPI counters ({day: stats}). Periods without
+    tasks are left out. Returns a DataFrame with TREND_COLUMNS.
+    """
+    if not day_counts:
+        return pd.DataFrame(columns=TREND_COLUMNS)
     
-    return Counter(filtered_words).most_common(20)
+    days = pd.to_datetime(pd.Series(list(day_counts)), format='%Y-%m-%d', errors='coerce')
+    stats = list(day_counts.values())
+    daily = pd.DataFrame({
+        'day': days,
+        'total_tasks': [sum(day.get(s, 0) for s in STATUSES) for day in stats],
+        'completed_tasks': [sum(day.get(s, 0) for s in COMPLETED_STATUSES) for day in stats],
+        'approved_tasks': [day.get('approved', 0) for day in stats]
+    })
+    return _bucket_trend(daily[_window_mask(days, start_date, end_date)], granularity)
+
+
+# Breakdowns offered for the daily rollup history
+ROLLUP_BREAKDOWNS = {"Work Center": 'work_center', "Location": 'specific_location', "Work Type": 'work_type'}
+
+
+def rollup_by_period(rollup, start_date, end_date, granularity, breakdown):
+    """
+    Aggregates daily rollup rows into periods for one breakdown field.
+    Returns date, group, submitted, approved, rejected, approval_rate and
+    pending (the backlog at the end of the period) columns.
+    """
+    columns = ['date', 'group', 'submitted', 'approved', 'rejected', 'approval_rate', 'pending']
+    start_day, end_day = pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize()
+    if rollup.empty or start_day > end_day:
+        return pd.DataFrame(columns=columns)
+    rollup = rollup.assign(day=pd.to_datetime(rollup['day']))
+    
+    # Activity: plain sums over the days in each period
+    window = rollup[(rollup['day'] >= start_day) & (rollup['day'] <= end_day)]
+    flows = window.groupby([window['day'].dt.to_period(granularity), breakdown])[['submitted', 'approved', 'rejected']].sum()
+    
+    # Backlog: last known value of every group carried forward, read at each period end
+    backlog = (rollup[rollup['day'] <= end_day]
+               .pivot_table(index='day', columns=ROLLUP_DIMENSIONS, values='pending', aggfunc='last')
+               .reindex(pd.date_range(min(start_day, rollup['day'].min()), end_day, freq='D'))
+               .ffill().fillna(0))
+    backlog = backlog.T.groupby(level=breakdown).sum().T.loc[start_day:]
+    backlog = backlog.groupby(backlog.index.to_period(granularity)).last().stack()
+    backlog.index.names = ['day', breakdown]
+    
+    history = flows.join(backlog.rename('pending'), how='outer').fillna(0).astype('int64')
+    history = history[(history[['submitted', 'approved', 'rejected', 'pending']] > 0).any(axis=1)].reset_index()
+    if history.empty:
+        return pd.DataFrame(columns=columns)
+    reviewed = (history['approved'] + history['rejected']).where(lambda r: r > 0)
+    history['approval_rate'] = (history['approved'] / reviewed * 100).fillna(0)
+    history['date'] = history['day'].dt.to_timestamp()
+    return history.rename(columns={breakdown: 'group'})[columns]
 
 
 # RENDER CHECKLIST ---
@@ -1178,10 +1369,10 @@ def login_page():
 
 
 # --- Notification Display Function ---
-def display_notifications():
-    """Fetches and displays dismissible notifications for the current user."""
+def display_notifications(reads):
+    """Displays dismissible notifications for the current user."""
     try:
-        notifications = get_unread_notifications(st.session_state.user_data['username'])
+        notifications = reads.get('notifications')
         if notifications:
             st.warning("You have unread notifications:", icon="🔔")
             for notif in notifications:
@@ -1200,13 +1391,43 @@ def display_notifications():
         pass
 
 # --- MODIFIED BLOCK 7: main_dashboard (Request 2: Add Findings Analysis Nav) ---
+def user_task_count_reads(username, breakdowns):
+    """
+    Page reads counting a user's work orders with count queries (no task
+    downloads): 'user_tasks_total', and 'user_tasks_<value>' for each value
+    of every breakdown filter, e.g. {'status': STATUSES}
+    """
+    reads = {'user_tasks_total': (count_tasks, {'username': username})}
+    for name, values in breakdowns.items():
+        for value in values:
+            reads[f"user_tasks_{value}"] = (count_tasks, {'username': username, name: [value]})
+    return reads
+
+def page_reads(selected_page):
+    """The independent reads a page needs, declared up front so they can run concurrently"""
+    user_data = st.session_state.user_data
+    reads = {'notifications': (get_unread_notifications, user_data['username'])}
+    
+    if selected_page == "📊 Dashboard Overview":
+        reads['kpis'] = (get_kpi_summary,)
+        reads['recent_tasks'] = (get_tasks_page, None, 8)
+        if user_data['role'] in ['user']:
+            reads.update(user_task_count_reads(user_data['username'], {'status': STATUSES}))
+    elif selected_page == "✅ Work Order Review Center":
+        reads['pending_count'] = (count_tasks, {'status': ['pending']})
+    elif selected_page == "🛡️ Compliance Dashboard":
+        # The location picker keeps its value in session state between reruns
+        reads['compliance_reports'] = (get_compliance_reports, st.session_state.get('view_location', ALL_LOCATIONS[0]))
+        reads['compliance_matrix'] = (get_compliance_matrix,)
+    elif selected_page == "👤 My Profile":
+        reads.update(user_task_count_reads(user_data.get('username', ''),
+                                           {'status': STATUSES, 'location_type': ['Onshore', 'Offshore']}))
+    return reads
+
 def main_dashboard():
     st.title(f"🏭 Welcome, {st.session_state.user_data['name']}!")
     st.markdown("### Enterprise Maintenance Management System")
     
-    # --- Display notifications at the top of the dashboard ---
-    display_notifications()
-    
     # Sidebar Navigation
     st.sidebar.title("Main Navigation")
     
@@ -1233,6 +1454,7 @@ def main_dashboard():
             "📈 Performance Trends",
             "🎯 KPI Predictions",
             "🔬 Findings Analysis", # Request 2: New Page
+            "🧾 Checklist Analytics",
             "👥 User Management",
             "👤 My Profile"
         ]
@@ -1255,9 +1477,15 @@ def main_dashboard():
         st.session_state.current_page = "login"
         st.rerun()
     
+    # Start every read the page needs before rendering anything
+    reads = PageReads(page_reads(selected_page))
+    
+    # --- Display notifications at the top of the dashboard ---
+    display_notifications(reads)
+    
     # Page routing
     if selected_page == "📊 Dashboard Overview":
-        dashboard_overview()
+        dashboard_overview(reads)
     elif selected_page == "📝 Submit New Work Order":
         submit_task_page()
     elif selected_page == "📋 My Submitted Work Orders":
@@ -1266,7 +1494,7 @@ def main_dashboard():
         work_center_tasks_page()
     elif selected_page == "✅ Work Order Review Center":
         if user_role in ['admin', 'supervisor']:
-            task_approval_page()
+            task_approval_page(reads)
         else:
             st.warning("Access denied. Supervisor/Admin role required.", icon="⛔")
     elif selected_page == "📍 Location Analytics":
@@ -1276,7 +1504,7 @@ def main_dashboard():
             st.warning("Access denied. Supervisor/Admin role required.", icon="⛔")
     elif selected_page == "🛡️ Compliance Dashboard":
         if user_role in ['admin', 'supervisor']:
-            compliance_checksheet_page()
+            compliance_checksheet_page(reads)
         else:
             st.warning("Access denied. Supervisor/Admin role required.", icon="⛔")
             
@@ -1287,6 +1515,11 @@ def main_dashboard():
         else:
             st.warning("Access denied. Supervisor/Admin role required.", icon="⛔")
     # --- End of Request 2 ---
+    elif selected_page == "🧾 Checklist Analytics":
+        if user_role in ['admin', 'supervisor']:
+            checklist_analytics_page()
+        else:
+            st.warning("Access denied. Supervisor/Admin role required.", icon="⛔")
             
     elif selected_page == "📈 Performance Trends":
         if user_role in ['admin', 'supervisor']:
@@ -1304,16 +1537,15 @@ def main_dashboard():
         else:
             st.warning("Admin access required.", icon="⛔")
     elif selected_page == "👤 My Profile":
-        profile_page()
+        profile_page(reads)
 # --- END OF MODIFIED BLOCK 7 ---
 
 
 # --- MODIFIED BLOCK 8: dashboard_overview (Request 1: Show WO#) ---
-def dashboard_overview():
+def dashboard_overview(reads):
     st.header("📊 System Overview Dashboard")
     
-    all_tasks = get_all_tasks()
-    kpis = calculate_kpis(all_tasks)
+    kpis = reads.get('kpis')
     
     # Main KPI Cards
     col1, col2, col3, col4 = st.columns(4)
@@ -1343,15 +1575,14 @@ def dashboard_overview():
     
     # User-specific stats
     if st.session_state.user_data['role'] in ['user']:
-        user_tasks = get_tasks_by_filters({'username': st.session_state.user_data['username']})
-        user_pending = len([t for t in user_tasks if t['status'] == 'pending'])
-        user_approved = len([t for t in user_tasks if t['status'] == 'approved'])
-        user_rejected = len([t for t in user_tasks if t['status'] == 'rejected'])
+        user_pending = reads.get('user_tasks_pending')
+        user_approved = reads.get('user_tasks_approved')
+        user_rejected = reads.get('user_tasks_rejected')
         
         st.subheader("👤 Your Personal Statistics")
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("My Total Work Orders", len(user_tasks))
+            st.metric("My Total Work Orders", reads.get('user_tasks_total'))
         with col2:
             st.metric("Pending Approval", user_pending)
         with col3:
@@ -1362,7 +1593,7 @@ def dashboard_overview():
 
     # Recent Activity
     st.subheader("🕒 Recent System Activity")
-    recent_tasks = sorted(all_tasks, key=lambda x: x.get('submission_date', ''), reverse=True)[:8]
+    recent_tasks, _ = reads.get('recent_tasks')
     
     if recent_tasks:
         for task in recent_tasks:
@@ -1416,16 +1647,37 @@ def submit_task_page():
     else:
         st.warning("No work center assigned. Please contact administrator.")
 
+# Pagination controls shared by the task listing pages
+def get_page_cursor(page_key, filters):
+    """Returns the cursor of the current page, going back to page 1 whenever the filters change"""
+    state_key = f"{page_key}_pagination"
+    filter_key = normalize_filters(filters)
+    state = st.session_state.get(state_key)
+    if not state or state['filters'] != filter_key:
+        state = {'filters': filter_key, 'cursors': [None]}
+        st.session_state[state_key] = state
+    return state['cursors'][-1]
+
+def render_page_controls(page_key, next_cursor):
+    """Renders Previous / Next buttons for a paginated task listing"""
+    cursors = st.session_state[f"{page_key}_pagination"]['cursors']
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("⬅️ Previous", key=f"{page_key}_prev", disabled=len(cursors) <= 1, use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.markdown(f"<p style='text-align: center;'>Page {len(cursors)}</p>", unsafe_allow_html=True)
+    with col3:
+        if st.button("Next ➡️", key=f"{page_key}_next", disabled=next_cursor is None, use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+
 # --- MODIFIED BLOCK 9: my_tasks_page (Updated for New Fields) ---
 def my_tasks_page():
     st.header("📋 My Submitted Work Orders")
     
-    user_tasks = get_tasks_by_filters({'username': st.session_state.user_data['username']})
-    
-    if not user_tasks:
-        st.info("You haven't submitted any work orders yet. Use the 'Submit New Work Order' page to get started.")
-        return
-    
     # Status filter for user
     status_filter = st.multiselect(
         "Filter by Status",
@@ -1433,7 +1685,16 @@ def my_tasks_page():
         default=['pending', 'approved', 'rejected']
     )
     
-    filtered_tasks = [t for t in user_tasks if t['status'] in status_filter]
+    task_filters = {'username': st.session_state.user_data['username'], 'status': status_filter}
+    cursor = get_page_cursor("my_tasks", task_filters)
+    filtered_tasks, next_cursor = get_tasks_page(task_filters, cursor=cursor)
+    
+    if not filtered_tasks and cursor is None:
+        if len(status_filter) == 3:
+            st.info("You haven't submitted any work orders yet. Use the 'Submit New Work Order' page to get started.")
+        else:
+            st.info("No work orders match the selected status.")
+        return
     
     for task in filtered_tasks:
         with st.container(border=True):
@@ -1475,10 +1736,56 @@ def my_tasks_page():
                         st.write(f"By: {task['reviewed_by']}")
                 else:
                     st.warning("Pending Review ⏳")
+    
+    render_page_controls("my_tasks", next_cursor)
 # --- END OF MODIFIED BLOCK 9 ---
 
 
 # --- MODIFIED BLOCK 10: work_center_tasks_page (Updated for New Fields) ---
+def render_task_export_status(job, polling):
+    if job.error:
+        st.error(f"Export failed: {job.error}", icon="❌")
+    elif not job.finished:
+        total = st.session_state.get('task_export_total') or 0
+        st.progress(min(job.exported / total, 1.0) if total else 0.0,
+                    text=f"Exported {job.exported} of {total} work orders...")
+    elif polling:
+        # Rerun the page once so the status stops polling
+        st.rerun()
+    else:
+        extension = job.file_format.lower()
+        st.download_button(
+            label=f"⬇️ Download {job.file_format} ({job.exported} work orders)",
+            data=job.read,
+            file_name=f"work_orders_{datetime.now():%Y%m%d_%H%M}.{extension}",
+            mime="text/csv" if extension == 'csv' else "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            key="task_export_download",
+            use_container_width=True
+        )
+
+
+def task_export_section(task_filters):
+    """CSV/XLSX export of every task matching the queue filters, written by a background thread"""
+    with st.expander("⬇️ Export Work Orders"):
+        col1, col2 = st.columns(2)
+        with col1:
+            file_format = st.radio("Format", EXPORT_FORMATS, horizontal=True, key="task_export_format")
+            if XLSX_ENGINE is None:
+                st.caption("Install xlsxwriter or openpyxl to export XLSX.")
+        with col2:
+            layout = st.selectbox("Checklist Results", options=list(CHECKLIST_LAYOUTS),
+                                  format_func=CHECKLIST_LAYOUTS.get, key="task_export_layout")
+        
+        if st.button("Start Export", key="task_export_start", use_container_width=True):
+            start_task_export(task_filters, file_format, layout)
+        
+        job = st.session_state.get('task_export')
+        if job is not None:
+            # While the export runs only this status block reruns, once a second
+            polling = not job.finished
+            st.fragment(render_task_export_status, run_every=1.0 if polling else None)(job, polling)
+
+
 def work_center_tasks_page():
     st.header("🏗️ Work Center Queue")
     
@@ -1520,22 +1827,22 @@ def work_center_tasks_page():
     # Build filter dictionary
     task_filters = {
         'status': status_filter,
-        'location_type': location_filter
+        'location_type': location_filter,
+        'priority': priority_filter
     }
     
     if work_center_filter != 'All':
         task_filters['work_center'] = work_center_filter
         
-    tasks = get_tasks_by_filters(task_filters)
-    
-    # Apply priority filter (post-query)
-    tasks = [t for t in tasks if t.get('priority', 'Medium') in priority_filter]
+    cursor = get_page_cursor("work_center_tasks", task_filters)
+    tasks, next_cursor = get_tasks_page(task_filters, cursor=cursor)
     
-    if not tasks:
+    if not tasks and cursor is None:
         st.info(f"No tasks found for selected filters.")
         return
     
-    st.metric(f"Total Tasks Matching Filters", len(tasks))
+    st.metric(f"Total Tasks Matching Filters", count_tasks(task_filters))
+    task_export_section(task_filters)
     
     for task in tasks:
         with st.container(border=True):
@@ -1563,49 +1870,231 @@ def work_center_tasks_page():
                 
                 if task.get('reviewed_by'):
                     st.write(f"Reviewed by: {task['reviewed_by']}")
+    
+    render_page_controls("work_center_tasks", next_cursor)
 # --- END OF MODIFIED BLOCK 10 ---
 
 
+def bulk_pdf_export_section():
+    """Bulk PDF export of the work orders matching a filter, for audits"""
+    with st.expander("📦 Bulk PDF Export"):
+        today = datetime.now().date()
+        col1, col2 = st.columns(2)
+        with col1:
+            date_range = st.date_input("Submission Date Range", value=(today.replace(day=1), today), key="pdf_export_dates")
+            work_centers = st.multiselect("Work Center", options=["Electrical", "Mechanical", "Instrument"],
+                                          default=["Electrical", "Mechanical", "Instrument"], key="pdf_export_work_centers")
+        with col2:
+            locations = st.multiselect("Location", options=ALL_LOCATIONS, default=ALL_LOCATIONS, key="pdf_export_locations")
+            statuses = st.multiselect("Status", options=['approved', 'pending', 'rejected'], default=['approved'],
+                                      format_func=str.title, key="pdf_export_statuses")
+        
+        if st.button("Build ZIP", key="pdf_export_build", use_container_width=True):
+            if len(date_range) != 2 or not (work_centers and locations and statuses):
+                st.error("Select a date range and at least one work center, location and status.", icon="❌")
+            else:
+                progress = st.empty()
+                zip_file = tempfile.TemporaryFile()
+                count = export_task_pdfs_zip(
+                    zip_file, {'work_center': work_centers, 'specific_location': locations, 'status': statuses},
+                    date_range[0], date_range[1],
+                    on_progress=lambda done: progress.caption(f"Rendered {done} work orders...")
+                )
+                progress.empty()
+                if not count:
+                    st.session_state.pop('pdf_export', None)
+                    st.info("No work orders match the selected filters.")
+                else:
+                    file_name = f"work_orders_{date_range[0]:%Y%m%d}_{date_range[1]:%Y%m%d}.zip"
+                    st.session_state['pdf_export'] = (zip_file, count, file_name)
+        
+        if 'pdf_export' in st.session_state:
+            zip_file, count, file_name = st.session_state['pdf_export']
+            # Read from the temp file only when downloaded
+            st.download_button(
+                label=f"⬇️ Download {count} PDF(s)",
+                data=lambda: read_report_file(zip_file),
+                file_name=file_name,
+                mime="application/zip",
+                key="pdf_export_download",
+                use_container_width=True
+            )
+
+
+def consolidated_report_section():
+    """One PDF covering a month and/or location, with KPI summary and table of contents"""
+    with st.expander("📑 Consolidated Report"):
+        this_month = datetime.now().date().replace(day=1)
+        months = [this_month]
+        for _ in range(11):
+            months.append((months[-1] - timedelta(days=1)).replace(day=1))
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            month = st.selectbox("Month", options=[None] + months, index=1,
+                                 format_func=lambda m: "All Months" if m is None else m.strftime("%B %Y"),
+                                 key="consolidated_month")
+        with col2:
+            location = st.selectbox("Location", options=["All"] + ALL_LOCATIONS, key="consolidated_location")
+        with col3:
+            statuses = st.multiselect("Status", options=['approved', 'pending', 'rejected'], default=['approved'],
+                                      format_func=str.title, key="consolidated_statuses")
+        
+        if st.button("Build Report", key="consolidated_build", use_container_width=True):
+            if not statuses:
+                st.error("Select at least one status.", icon="❌")
+            else:
+                filters = {'status': statuses}
+                if location != "All":
+                    filters['specific_location'] = location
+                month_end = (month + timedelta(days=32)).replace(day=1) - timedelta(days=1) if month else None
+                scope = f"{'All Locations' if location == 'All' else location}, {'All Months' if month is None else month.strftime('%B %Y')}"
+                
+                progress = st.empty()
+                report_file = tempfile.TemporaryFile()
+                count = write_consolidated_report(
+                    report_file, filters, month, month_end, "Consolidated Work Order Report", scope,
+                    on_progress=lambda done: progress.caption(f"Added {done} work orders...")
+                )
+                progress.empty()
+                if not count:
+                    st.session_state.pop('consolidated_report', None)
+                    st.info("No work orders match the selected filters.")
+                else:
+                    file_name = f"work_orders_{location}_{month:%Y%m}.pdf" if month else f"work_orders_{location}.pdf"
+                    st.session_state['consolidated_report'] = (report_file, count, file_name)
+        
+        if 'consolidated_report' in st.session_state:
+            report_file, count, file_name = st.session_state['consolidated_report']
+            # Read from the temp file only when downloaded
+            st.download_button(
+                label=f"⬇️ Download Report ({count} work orders)",
+                data=lambda: read_report_file(report_file),
+                file_name=file_name,
+                mime="application/pdf",
+                key="consolidated_download",
+                use_container_width=True
+            )
+
+
 # --- MODIFIED BLOCK 11: task_approval_page (PDF Buttons Added) ---
-def task_approval_page():
+def task_approval_page(reads):
     st.header("✅ Work Order Review Center")
     
-    pending_tasks = get_tasks_by_filters({'status': ['pending']})
+    if st.session_state.user_data['role'] in ['supervisor', 'admin']:
+        bulk_pdf_export_section()
+        consolidated_report_section()
     
-    if not pending_tasks:
+    # Left by a bulk review that finished and reran the page
+    bulk_review_message = st.session_state.pop('bulk_review_message', None)
+    if bulk_review_message:
+        st.success(bulk_review_message, icon="✅")
+    
+    pending_count = reads.get('pending_count')
+    
+    if not pending_count:
         st.success("No pending work orders! All caught up.", icon="🎉")
         return
     
-    st.metric("Work Orders Pending Approval", len(pending_tasks))
+    st.metric("Work Orders Pending Approval", pending_count)
     
     # Filters for approval center
     col1, col2, col3 = st.columns(3)
     with col1:
         work_center_filter = st.multiselect(
             "Work Center",
-            options=sorted(list(set(task['work_center'] for task in pending_tasks))),
-            default=sorted(list(set(task['work_center'] for task in pending_tasks)))
+            options=["Electrical", "Mechanical", "Instrument"],
+            default=["Electrical", "Mechanical", "Instrument"]
         )
     with col2:
         location_filter = st.multiselect(
             "Location Type",
-            options=sorted(list(set(task.get('location_type', 'Unknown') for task in pending_tasks))),
-            default=sorted(list(set(task.get('location_type', 'Unknown') for task in pending_tasks)))
+            options=['Onshore', 'Offshore'],
+            default=['Onshore', 'Offshore']
         )
     with col3:
         priority_filter = st.multiselect(
             "Priority",
-            options=sorted(list(set(task.get('priority', 'Medium') for task in pending_tasks))),
-            default=sorted(list(set(task.get('priority', 'Medium') for task in pending_tasks)))
+            options=['Low', 'Medium', 'High'],
+            default=['Low', 'Medium', 'High']
         )
     
+    if not (work_center_filter and location_filter and priority_filter):
+        st.info("Select at least one work center, location type and priority.")
+        return
+    
     # Filter tasks
-    filtered_tasks = [
-        task for task in pending_tasks
-        if task['work_center'] in work_center_filter
-        and task.get('location_type', 'Unknown') in location_filter
-        and task.get('priority', 'Medium') in priority_filter
-    ]
+    task_filters = {
+        'status': ['pending'],
+        'work_center': work_center_filter,
+        'location_type': location_filter,
+        'priority': priority_filter
+    }
+    cursor = get_page_cursor("task_approval", task_filters)
+    filtered_tasks, next_cursor = get_tasks_page(task_filters, cursor=cursor)
+    
+    if not filtered_tasks and cursor is None:
+        st.info("No pending work orders match the selected filters.")
+        return
+    
+    # --- Bulk review: one batched write instead of one round-trip and rerun per work order ---
+    if st.session_state.user_data['role'] == 'supervisor':
+        with st.expander("Bulk Review"):
+            apply_to_all = st.checkbox(
+                f"Apply to all {count_tasks(task_filters)} pending work orders matching the filters",
+                key="bulk_review_all"
+            )
+            selected_ids = []
+            if not apply_to_all:
+                task_labels = {
+                    t['id']: f"{t.get('work_order_number', 'N/A')}: {t.get('equipment_name', t.get('instrument_name', 'Task'))}"
+                    for t in filtered_tasks
+                }
+                selected_ids = st.multiselect(
+                    "Work Orders on this page",
+                    options=list(task_labels),
+                    format_func=task_labels.get,
+                    key=f"bulk_review_selection_{cursor}"
+                )
+            bulk_feedback = st.text_area(
+                "Shared Feedback:",
+                key="bulk_review_feedback",
+                placeholder="Required for rejection; optional for approval...",
+                height=100
+            )
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                bulk_approve = st.button("✅ Approve Selected", key="bulk_approve", use_container_width=True)
+            with col2:
+                bulk_reject = st.button("❌ Reject Selected", key="bulk_reject", use_container_width=True)
+            
+            if bulk_approve or bulk_reject:
+                if apply_to_all:
+                    selected_tasks = get_tasks_by_filters(task_filters)
+                else:
+                    selected_tasks = [t for t in filtered_tasks if t['id'] in selected_ids]
+                
+                if not selected_tasks:
+                    st.error("Please select at least one work order.", icon="❌")
+                elif bulk_reject and not bulk_feedback.strip():
+                    st.error("Please provide a reason for rejection.", icon="❌")
+                else:
+                    reviewer = st.session_state.user_data['name']
+                    if bulk_approve:
+                        updated = bulk_update_task_status(
+                            selected_tasks, 'approved', bulk_feedback.strip() or "Task approved as per standards", reviewer
+                        )
+                    else:
+                        updated = bulk_update_task_status(selected_tasks, 'rejected', bulk_feedback.strip(), reviewer)
+                    message = f"{updated} work order(s) {'approved' if bulk_approve else 'rejected'} successfully!"
+                    if updated == len(selected_tasks):
+                        # Shown after the rerun, which drops the reviewed work orders from the list
+                        st.session_state['bulk_review_message'] = message
+                        st.rerun()
+                    # Skipped tasks or a failed chunk leave their warnings on the page instead of a rerun
+                    if updated:
+                        st.success(message, icon="✅")
     
     for task in filtered_tasks:
         with st.container(border=True):
@@ -1642,30 +2131,36 @@ def task_approval_page():
                     """)
                     st.markdown("---")
                     
-                    # --- Request 3: Display Safety Checks ---
-                    st.markdown("**Safety Checks Recorded:**")
-                    safety_checks = task.get('safety_checks', [])
-                    if safety_checks:
-                        for check in safety_checks:
-                            st.markdown(f"- {check}")
-                    else:
-                        st.markdown("_No safety checks recorded._")
-                    st.markdown("---")
-                    # --- End of Request 3 ---
-                    
-                    # --- NEW: Display Checklist Results ---
-                    st.markdown("**Checklist Results:**")
-                    checklist_data = task.get('checklist_data', [])
-                    if not checklist_data:
-                        st.markdown("_No checklist data found._")
-                    else:
-                        for item in checklist_data:
-                            status = item.get('status', 'N/A')
-                            status_icon = "🟢" if status == 'PASS' else "🔴" if status == 'FAIL' else "⚪"
-                            
-                            st.markdown(f"- {status_icon} **{item.get('task', 'N/A')}** (Status: *{status}*)")
-                            if item.get('remarks'):
-                                st.info(f"  **Remarks:** {item.get('remarks')}")
+                    # Checklist payloads are only downloaded once a supervisor asks for them
+                    details_key = f"details_loaded_{task['id']}"
+                    if st.session_state.get(details_key) or st.button("Load Checklist & Safety Details", key=f"load_details_{task['id']}"):
+                        st.session_state[details_key] = True
+                        details = get_task_details(task['id'])
+                        
+                        # --- Request 3: Display Safety Checks ---
+                        st.markdown("**Safety Checks Recorded:**")
+                        safety_checks = details.get('safety_checks', [])
+                        if safety_checks:
+                            for check in safety_checks:
+                                st.markdown(f"- {check}")
+                        else:
+                            st.markdown("_No safety checks recorded._")
+                        st.markdown("---")
+                        # --- End of Request 3 ---
+                        
+                        # --- NEW: Display Checklist Results ---
+                        st.markdown("**Checklist Results:**")
+                        checklist_data = details.get('checklist_data', [])
+                        if not checklist_data:
+                            st.markdown("_No checklist data found._")
+                        else:
+                            for item in checklist_data:
+                                status = item.get('status', 'N/A')
+                                status_icon = "🟢" if status == 'PASS' else "🔴" if status == 'FAIL' else "⚪"
+                                
+                                st.markdown(f"- {status_icon} **{item.get('task', 'N/A')}** (Status: *{status}*)")
+                                if item.get('remarks'):
+                                    st.info(f"  **Remarks:** {item.get('remarks')}")
                     # --- END OF NEW Checklist Display ---
 
             
@@ -1674,16 +2169,13 @@ def task_approval_page():
                 if st.session_state.user_data['role'] in ['supervisor', 'admin']:
                     st.write("**Report Generation:**")
                     
-                    # 1. Generate PDF in memory
                     try:
-                        pdf_bytes = generate_task_pdf(task)
-                        wo_number = task.get('work_order_number', 'task')
-                        file_name = f"{wo_number}_{task['work_center']}.pdf"
+                        file_name = task_pdf_file_name(task)
 
-                        # 2. Download Button
+                        # The PDF is only rendered when the button is clicked
                         st.download_button(
                             label="⬇️ Download PDF",
-                            data=pdf_bytes,
+                            data=lambda task=task: get_task_pdf(task),
                             file_name=file_name,
                             mime="application/pdf",
                             key=f"download_pdf_{task['id']}",
@@ -1722,36 +2214,31 @@ def task_approval_page():
                                 
                 elif st.session_state.user_data['role'] == 'admin':
                     st.info("Admins can generate reports. Only Supervisors can approve or reject tasks.")
+    
+    render_page_controls("task_approval", next_cursor)
 # --- END OF MODIFIED BLOCK 11 ---
 
 
 def location_analytics_page():
     st.header("📍 Location-Based Analytics")
     
-    all_tasks = get_all_tasks()
-    
     # Location type selection
     location_type = st.selectbox("Select Location Type", ["All", "Onshore", "Offshore"])
     
-    if location_type != "All":
-        tasks = [t for t in all_tasks if t.get('location_type') == location_type]
-    else:
-        tasks = all_tasks
+    kpis = get_kpi_summary(location_type if location_type != "All" else None)
     
-    if not tasks:
+    if not kpis['total_tasks']:
         st.info("No task data found for the selected location.")
         return
-        
-    kpis = calculate_kpis(tasks)
     
     # Location KPIs
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Work Orders", len(tasks))
+        st.metric("Total Work Orders", kpis['total_tasks'])
     with col2:
         st.metric("Approval Rate", f"{kpis['approval_rate']:.1f}%")
     with col3:
-        completion_rate = (kpis['completed_tasks'] / len(tasks) * 100) if tasks else 0
+        completion_rate = (kpis['completed_tasks'] / kpis['total_tasks'] * 100)
         st.metric("Completion Rate", f"{completion_rate:.1f}%")
     with col4:
         st.metric("Avg Completion Time", f"{kpis['avg_completion_time']:.1f}h")
@@ -1806,9 +2293,33 @@ def location_analytics_page():
 
 
 # --- Compliance Checksheet Page ---
-def compliance_checksheet_page():
+def compliance_checksheet_page(reads):
     st.header("🛡️ Location Compliance Dashboard")
     
+    # Cross-location summary from the compliance counters
+    st.subheader("📊 Compliance Matrix (All Locations)")
+    matrix = reads.get('compliance_matrix')
+    if matrix is None or not matrix['reports'].any():
+        st.info("No compliance reports have been submitted yet.")
+    else:
+        pass_rates = matrix.set_index('location')[list(COMPLIANCE_CHECKS)].rename(columns=COMPLIANCE_CHECKS)
+        fig = px.imshow(pass_rates.astype(float), text_auto='.0f', aspect='auto', zmin=0, zmax=100,
+                        color_continuous_scale='RdYlGn',
+                        labels={'x': 'Check', 'y': 'Location', 'color': 'Pass Rate (%)'})
+        st.plotly_chart(fig, use_container_width=True)
+        
+        score_cols = st.columns(len(matrix))
+        for score_col, row in zip(score_cols, matrix.itertuples()):
+            score = row.rolling_score
+            score_col.metric(
+                f"{row.location} Score",
+                "N/A" if pd.isna(score) else f"{score:.1f}%",
+                help=f"Share of checks passed in the last {COMPLIANCE_ROLLING_MONTHS} months "
+                     f"({row.reports} reports in total)"
+            )
+    
+    st.markdown("---")
+    
     col1, col2 = st.columns(2)
     
     with col1:
@@ -1863,7 +2374,7 @@ def compliance_checksheet_page():
         st.subheader("Past Compliance Reports")
         filter_location = st.selectbox("View Reports For Location", ALL_LOCATIONS, key="view_location")
         
-        reports = get_compliance_reports(filter_location)
+        reports = reads.get('compliance_reports')
         
         if not reports:
             st.info(f"No compliance reports found for {filter_location}.")
@@ -1905,16 +2416,22 @@ def compliance_checksheet_page():
 def findings_analysis_page():
     st.header("🔬 Findings & Observations Analysis")
     
-    all_tasks = get_all_tasks()
-    
-    # Filter for tasks that have findings
-    tasks_with_findings = [
-        t for t in all_tasks 
-        if t.get('overall_findings') 
-        and t.get('overall_findings').strip() != 'N/A'
-    ]
-    
-    if not tasks_with_findings:
+    findings_table = get_snapshot_table([
+        'id', 'work_order_number', 'equipment_name', 'instrument_name', 'work_center', 'location_type',
+        'specific_location', 'submitted_by_name', 'submission_date', 'overall_findings',
+        WORD_COUNTS_FIELD, PHRASE_COUNTS_FIELD
+    ])
+    # Row labels stay positions in findings_table, so the term counts of any subset can be taken from it
+    findings = findings_table.drop_columns([WORD_COUNTS_FIELD, PHRASE_COUNTS_FIELD]).to_pandas()
+    findings['work_center'] = findings['work_center'].fillna('N/A')
+    findings['location_type'] = findings['location_type'].fillna('N/A')
+    
+    # Without a search the log lists the tasks that have findings; a search also
+    # returns tasks that only match in their checklist remarks
+    text = findings['overall_findings']
+    has_findings = text.notna() & (text != '') & (text.str.strip() != 'N/A')
+    
+    if findings.empty:
         st.info("No tasks with 'Overall Findings / Summary' have been submitted yet.")
         return
 
@@ -1922,26 +2439,49 @@ def findings_analysis_page():
     st.sidebar.subheader("Findings Filters")
     
     # Filters
+    work_centers = sorted(findings['work_center'].unique())
     wc_filter = st.sidebar.multiselect(
         "Filter by Work Center",
-        options=sorted(list(set(t['work_center'] for t in tasks_with_findings))),
-        default=sorted(list(set(t['work_center'] for t in tasks_with_findings)))
+        options=work_centers,
+        default=work_centers
     )
     
+    location_types = sorted(findings['location_type'].unique())
     loc_filter = st.sidebar.multiselect(
         "Filter by Location Type",
-        options=sorted(list(set(t.get('location_type', 'N/A') for t in tasks_with_findings))),
-        default=sorted(list(set(t.get('location_type', 'N/A') for t in tasks_with_findings)))
+        options=location_types,
+        default=location_types
     )
     
-    search_term = st.sidebar.text_input("Search Findings Text").lower()
+    search_term = st.sidebar.text_input(
+        "Search Findings Text",
+        help="Searches findings and checklist remarks. All words must match; partial words match as prefixes."
+    )
     
     # Apply filters
+    mask = findings['work_center'].isin(wc_filter) & findings['location_type'].isin(loc_filter)
+    if search_term.strip():
+        # Best matches first
+        ranks = {task_id: rank for rank, (task_id, _) in enumerate(search_findings(search_term))}
+        mask &= findings['id'].isin(ranks)
+        filtered = findings[mask]
+        filtered = filtered.iloc[filtered['id'].map(ranks).argsort()]
+    else:
+        filtered = findings[mask & has_findings].sort_values('submission_date', ascending=False)
+    
+    if filtered.empty:
+        if search_term.strip():
+            st.info("No findings or checklist remarks match the search and filters.")
+        elif not has_findings.any():
+            st.info("No tasks with 'Overall Findings / Summary' have been submitted yet.")
+        else:
+            st.info("No findings match the current filters.")
+        return
+    
+    # Only the rows shown in the log become dicts
     filtered_tasks = [
-        t for t in tasks_with_findings
-        if t['work_center'] in wc_filter
-        and t.get('location_type', 'N/A') in loc_filter
-        and (search_term in t.get('overall_findings', '').lower() if search_term else True)
+        {key: value for key, value in row.items() if not pd.isna(value)}
+        for row in filtered.to_dict('records')
     ]
     
     st.metric("Total Findings Records Found", len(filtered_tasks))
@@ -1952,30 +2492,33 @@ def findings_analysis_page():
     with col1:
         st.subheader("Common Keywords in Findings")
         
-        # Get list of all text
-        findings_text_list = [t.get('overall_findings', '') for t in filtered_tasks]
-        
-        if findings_text_list:
-            common_words = analyze_findings_text(findings_text_list)
-            
-            if common_words:
-                df_words = pd.DataFrame(common_words, columns=['Word', 'Count'])
-                fig = px.bar(df_words, x='Count', y='Word', orientation='h',
-                             title="Top 20 Common Keywords",
-                             color='Count', color_continuous_scale='cividis_r')
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.info("No common keywords found after filtering.")
+        # Merge the per-task counts stored at submission
+        term_counts = findings_table.take(filtered.index.to_numpy())
+        common_words = top_terms(term_counts[WORD_COUNTS_FIELD])
+        common_phrases = top_terms(term_counts[PHRASE_COUNTS_FIELD])
+        
+        if common_words:
+            df_words = pd.DataFrame(common_words, columns=['Word', 'Count'])
+            fig = px.bar(df_words, x='Count', y='Word', orientation='h',
+                         title="Top 20 Common Keywords",
+                         color='Count', color_continuous_scale='cividis_r')
+            fig.update_layout(yaxis={'categoryorder':'total ascending'})
+            st.plotly_chart(fig, use_container_width=True)
         else:
-            st.info("No findings text in filtered results.")
+            st.info("No common keywords found after filtering.")
+        
+        if common_phrases:
+            st.subheader("Common Phrases in Findings")
+            df_phrases = pd.DataFrame(common_phrases, columns=['Phrase', 'Count'])
+            fig = px.bar(df_phrases, x='Count', y='Phrase', orientation='h',
+                         title="Top 20 Common Phrases",
+                         color='Count', color_continuous_scale='cividis_r')
+            fig.update_layout(yaxis={'categoryorder':'total ascending'})
+            st.plotly_chart(fig, use_container_width=True)
 
     with col2:
         st.subheader("Raw Findings Log")
         
-        if not filtered_tasks:
-            st.info("No tasks match the current filters.")
-        
         for task in filtered_tasks:
             location_icon = "🏢" if task.get('location_type') == 'Onshore' else "🛳️"
             exp_header = f"{task.get('work_order_number', 'N/A')}: {task.get('equipment_name', task.get('instrument_name', 'Task'))}"
@@ -1988,19 +2531,92 @@ def findings_analysis_page():
                 - **Submitted By:** {task.get('submitted_by_name', 'N/A')}
                 """
                 )
-                st.info(f"**Overall Findings:**\n\n{task.get('overall_findings')}")
+                if str(task.get('overall_findings') or '').strip() not in ('', 'N/A'):
+                    st.info(f"**Overall Findings:**\n\n{task.get('overall_findings')}")
+                else:
+                    st.info("No overall findings; the search matched this task's checklist remarks.")
 # --- END OF NEW BLOCK 7 ---
 
 
+def checklist_analytics_page():
+    st.header("🧾 Checklist Item Failure Analysis")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        work_center = st.selectbox("Work Center", list(CHECKLIST_DEFINITIONS), key="checklist_work_center")
+    with col2:
+        equipment_type = st.selectbox("Equipment Type", list(CHECKLIST_DEFINITIONS[work_center]), key="checklist_equipment_type")
+    
+    # Only this work center's item rows are read
+    items = get_checklist_items(['equipment_type', 'specific_location', 'item', 'status'],
+                                filters=[('work_center', '=', work_center)])
+    if items.num_rows == 0:
+        st.info(f"No checklist results recorded for {work_center} yet.")
+        return
+    
+    st.subheader(f"📊 {work_center}: Fail Rate by Equipment Type")
+    by_type = failure_rates(items, ['equipment_type']).sort_values('fail_rate', ascending=False)
+    fig = px.bar(by_type, x='equipment_type', y='fail_rate', text='failed',
+                 labels={'equipment_type': 'Equipment Type', 'fail_rate': 'Fail Rate (%)', 'failed': 'Fails'},
+                 color='fail_rate', color_continuous_scale='reds')
+    st.plotly_chart(fig, use_container_width=True)
+    
+    equipment_items = get_checklist_items(['equipment_type', 'specific_location', 'item', 'status'],
+                                          filters=[('work_center', '=', work_center), ('equipment_type', '=', equipment_type)])
+    st.markdown("---")
+    st.subheader(f"🔍 {equipment_type} Checklist")
+    if equipment_items.num_rows == 0:
+        st.info(f"No checklist results recorded for {equipment_type} yet.")
+        return
+    
+    overall = failure_rates(equipment_items, ['equipment_type']).iloc[0]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Items Checked", f"{overall['checked']:,}")
+    col2.metric("Items Failed", f"{overall['failed']:,}")
+    col3.metric("Fail Rate", f"{overall['fail_rate']:.1f}%")
+    
+    # Items in checklist order; items from older checklist versions follow
+    by_item = failure_rates(equipment_items, ['item'])
+    defined = CHECKLIST_DEFINITIONS[work_center][equipment_type]
+    order = defined + sorted(set(by_item['item'].dropna()) - set(defined))
+    by_item = by_item.set_index('item').reindex(order).dropna(how='all').reset_index()
+    fig = px.bar(by_item, x='fail_rate', y='item', orientation='h', hover_data=['checked', 'failed'],
+                 labels={'fail_rate': 'Fail Rate (%)', 'item': 'Checklist Item'},
+                 title="Fail Rate per Checklist Item", color='fail_rate', color_continuous_scale='reds')
+    fig.update_layout(yaxis={'categoryorder': 'array', 'categoryarray': order[::-1]})
+    st.plotly_chart(fig, use_container_width=True)
+    
+    st.subheader("📍 Fail Rate by Location")
+    by_location = failure_rates(equipment_items, ['item', 'specific_location'])
+    matrix = by_location.pivot(index='item', columns='specific_location', values='fail_rate')
+    matrix = matrix.reindex([item for item in order if item in matrix.index])
+    fig = px.imshow(matrix, text_auto='.0f', aspect='auto', color_continuous_scale='reds',
+                    labels={'x': 'Location', 'y': 'Checklist Item', 'color': 'Fail Rate (%)'})
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def performance_trends_page():
     st.header("📈 Performance Trend Analysis")
     
-    all_tasks = get_all_tasks()
-    prediction = predict_kpi_trend(all_tasks)
+    col1, col2 = st.columns(2)
+    with col1:
+        window = st.selectbox("Time Window", list(TREND_WINDOWS))
+    with col2:
+        granularity = st.selectbox("Granularity", list(TREND_GRANULARITIES))
+    
+    end_date = datetime.now().date()
+    if TREND_WINDOWS[window] is None:
+        date_range = st.date_input("Date Range", value=(end_date - timedelta(days=30), end_date), max_value=end_date)
+        if len(date_range) != 2:
+            st.info("Select both a start and an end date.")
+            return
+        start_date, end_date = date_range
+    else:
+        start_date = end_date - timedelta(days=TREND_WINDOWS[window])
     
-    if prediction['historical_data']:
-        df = pd.DataFrame(prediction['historical_data'])
-        
+    df = get_kpi_trend(start_date, end_date, TREND_GRANULARITIES[granularity])
+    
+    if not df.empty:
         # Create trend chart
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=df['date'], y=df['approval_rate'], mode='lines+markers', 
@@ -2009,7 +2625,7 @@ def performance_trends_page():
                                  name='Completion Rate', line=dict(color='green', width=3)))
         fig.add_hline(y=80, line_dash="dash", line_color="red", annotation_text="Target: 80%")
         fig.update_layout(
-            title="Performance Trends Over Time",
+            title=f"{granularity} Performance Trends ({start_date:%d %b %Y} - {end_date:%d %b %Y})",
             xaxis_title="Date",
             yaxis_title="Rate (%)",
             hovermode='x unified'
@@ -2017,15 +2633,41 @@ def performance_trends_page():
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("Not enough historical data for trend analysis. Continue using the system to generate data.")
+    
+    # --- Long-range workload history from the daily rollup (closed days only) ---
+    st.markdown("---")
+    st.subheader("🗓️ Workload History")
+    breakdown = st.selectbox("Break Down By", list(ROLLUP_BREAKDOWNS))
+    history = rollup_by_period(get_rollup_rows(), start_date, min(end_date, datetime.now().date() - timedelta(days=1)),
+                               TREND_GRANULARITIES[granularity], ROLLUP_BREAKDOWNS[breakdown])
+    
+    if history.empty:
+        st.info("No completed days with activity in the selected window yet.")
+        return
+    
+    st.caption("Reviews are counted on the day they happened; the backlog is what was still pending at the end of each period. Today is added after midnight.")
+    col1, col2 = st.columns(2)
+    with col1:
+        fig = px.bar(history, x='date', y='submitted', color='group', hover_data=['approved', 'rejected', 'approval_rate'],
+                     title=f"Work Orders Submitted by {breakdown}", labels={'date': 'Date', 'submitted': 'Submitted', 'group': breakdown})
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        fig = px.line(history, x='date', y='pending', color='group', markers=True,
+                      title=f"Pending Backlog by {breakdown}", labels={'date': 'Date', 'pending': 'Pending', 'group': breakdown})
+        st.plotly_chart(fig, use_container_width=True)
 
 def kpi_predictions_page():
     st.header("🎯 KPI Predictions & Achievement Analysis")
     
-    all_tasks = get_all_tasks()
-    prediction = predict_kpi_trend(all_tasks)
-    
     TARGET_KPI = 80
     
+    forecast = get_kpi_forecast(horizon=7, target=TARGET_KPI)
+    overall = forecast[forecast['work_center'] == OVERALL_SEGMENT]
+    if overall.empty:
+        prediction = {'current_rate': 0, 'predicted_rate': 0, 'lower': 0, 'upper': 0, 'achievement_probability': 0}
+    else:
+        prediction = overall.iloc[0].fillna(0).to_dict()
+    
     # Prediction metrics
     col1, col2, col3 = st.columns(3)
     
@@ -2037,7 +2679,8 @@ def kpi_predictions_page():
         st.metric(
             "7-Day Prediction", 
             f"{prediction['predicted_rate']:.1f}%", 
-            delta=f"{delta:+.1f}%"
+            delta=f"{delta:+.1f}%",
+            help=f"95% interval: {prediction['lower']:.1f}% – {prediction['upper']:.1f}%"
         )
     
     with col3:
@@ -2078,6 +2721,34 @@ def kpi_predictions_page():
     fig.update_layout(height=400)
     st.plotly_chart(fig, use_container_width=True)
     
+    # Per-segment forecasts (all fitted together, see utils/kpi_forecast.py)
+    st.subheader("📍 7-Day Forecast by Work Center & Location")
+    segments = forecast[forecast['work_center'] != OVERALL_SEGMENT]
+    if segments.empty:
+        st.info("Not enough review history yet for per-location forecasts.")
+    else:
+        work_centers = sorted(segments['work_center'].unique())
+        wc_choice = st.selectbox("Work Center", work_centers, key="forecast_work_center")
+        segment_rows = segments[segments['work_center'] == wc_choice].sort_values('predicted_rate')
+        fig = px.bar(
+            segment_rows, x='predicted_rate', y='specific_location', orientation='h',
+            error_x=segment_rows['upper'] - segment_rows['predicted_rate'],
+            error_x_minus=segment_rows['predicted_rate'] - segment_rows['lower'],
+            labels={'predicted_rate': 'Predicted Approval Rate (%)', 'specific_location': 'Location'},
+            title=f"{wc_choice}: predicted approval rate with 95% interval"
+        )
+        fig.add_vline(x=TARGET_KPI, line_dash="dash", line_color="red")
+        st.plotly_chart(fig, use_container_width=True)
+        
+        st.dataframe(
+            segments.rename(columns={
+                'work_center': 'Work Center', 'specific_location': 'Location', 'reviews': 'Reviews (90d)',
+                'current_rate': 'Last 7 Days (%)', 'predicted_rate': 'Predicted (%)', 'lower': 'Lower (%)',
+                'upper': 'Upper (%)', 'trend': 'Trend (%/day)', 'achievement_probability': f'P(≥{TARGET_KPI}%)'
+            }).round(1),
+            use_container_width=True, hide_index=True
+        )
+    
     # Recommendations based on probability
     st.subheader("💡 Recommendations")
     
@@ -2118,15 +2789,13 @@ def user_management_page():
     st.subheader("Current System Users")
     
     user_list = []
-    # Fetch users from Firebase
+    # Fetch users from the database
     try:
-        users_ref = db.collection(USERS_COLLECTION)
-        users = users_ref.stream()
+        users = storage.list_users()
         
-        for user in users:
-            user_data = user.to_dict()
+        for user_data in users:
             user_list.append({
-                'Username': user.id,
+                'Username': user_data['username'],
                 'Name': user_data.get('name'),
                 'Role': user_data.get('role'),
                 'Work Center': user_data.get('work_center'),
@@ -2169,7 +2838,7 @@ def user_management_page():
                         'work_center': new_work_center,
                         'password': new_password  # WARNING: Plaintext. Use Hashing.
                     }
-                    db.collection(USERS_COLLECTION).document(new_username).set(user_data)
+                    storage.set_user(new_username, user_data)
                     st.success(f"User account for {new_name} created successfully!", icon="✅")
                     st.rerun()
                 except Exception as e:
@@ -2203,7 +2872,28 @@ def user_management_page():
                     else:
                         st.error("Please select a user to remove.", icon="❌")
 
-def profile_page():
+    # --- Work order numbers leased but never used ---
+    st.subheader("Work Order Number Gaps")
+    with st.expander("🔢 Check for unused Work Order numbers"):
+        st.caption("Servers reserve Work Order numbers in blocks. Numbers left in a block when a server restarts are never issued.")
+        if st.button("Scan Recent Number Blocks"):
+            try:
+                gaps = storage.get_work_order_gaps()
+                if not gaps:
+                    st.success("No gaps found in recent Work Order number blocks.", icon="✅")
+                else:
+                    gap_df = pd.DataFrame([{
+                        'Block': f"{format_work_order_number(g['start'])} - {format_work_order_number(g['end'])}",
+                        'Server': g['process'],
+                        'Leased At': g['leased_at'][:16],
+                        'Unused Numbers': len(g['unused']),
+                        'First Unused': format_work_order_number(g['unused'][0])
+                    } for g in gaps])
+                    st.dataframe(gap_df, use_container_width=True)
+            except Exception as e:
+                st.error(f"Error scanning work order numbers: {e}", icon="❌")
+
+def profile_page(reads):
     st.header("👤 My Profile & Statistics")
     
     user_data = st.session_state.user_data
@@ -2262,11 +2952,10 @@ def profile_page():
 
     with col2:
         st.subheader("Performance Statistics")
-        user_tasks = get_tasks_by_filters({'username': user_data.get('username', '')})
-        total_tasks = len(user_tasks)
-        pending_tasks = len([t for t in user_tasks if t['status'] == 'pending'])
-        approved_tasks = len([t for t in user_tasks if t['status'] == 'approved'])
-        rejected_tasks = len([t for t in user_tasks if t['status'] == 'rejected'])
+        total_tasks = reads.get('user_tasks_total')
+        pending_tasks = reads.get('user_tasks_pending')
+        approved_tasks = reads.get('user_tasks_approved')
+        rejected_tasks = reads.get('user_tasks_rejected')
         
         st.metric("Total Work Orders Submitted", total_tasks)
         st.metric("Pending Approval", pending_tasks)
@@ -2280,8 +2969,8 @@ def profile_page():
             st.metric("Personal Approval Rate", f"{approval_rate:.1f}%")
             
             # Location distribution
-            onshore_tasks = len([t for t in user_tasks if t.get('location_type') == 'Onshore'])
-            offshore_tasks = len([t for t in user_tasks if t.get('location_type') == 'Offshore'])
+            onshore_tasks = reads.get('user_tasks_Onshore')
+            offshore_tasks = reads.get('user_tasks_Offshore')
             
             if onshore_tasks > 0 or offshore_tasks > 0:
                 st.write("**Work Order Location Breakdown:**")
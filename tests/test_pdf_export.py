@@ -0,0 +1,40 @@
+import io
+import sys
+import types
+import zipfile
+from utils.pdf_export import export_task_pdfs
+
+
+def _task(number):
+    return {
+        'id': f"task{number}", 'work_order_number': f"WO-{number:05d}", 'work_center': "Mechanical",
+        'specific_location': "TGAST", 'status': "approved", 'submission_date': "2026-09-01T10:00:00",
+        'overall_findings': "Seal leak", 'safety_checks': ["PPE"],
+        'checklist_data': [{'task': "Inspect seals", 'status': "FAIL", 'remarks': "leak"}],
+    }
+
+
+def test_export_through_pool_does_not_run_app_script(tmp_path, monkeypatch):
+    # Streamlit runs the app script as a __main__ module with a __file__; workers must not re-run it
+    marker = tmp_path / "app_ran"
+    script = tmp_path / "app.py"
+    script.write_text(f"open({str(marker)!r}, 'w').close()\n")
+    app_main = types.ModuleType('__main__')
+    app_main.__file__ = str(script)
+    monkeypatch.setitem(sys.modules, '__main__', app_main)
+
+    output = io.BytesIO()
+    written = export_task_pdfs([_task(1), _task(2)], output, max_workers=2, chunk_size=1)
+
+    assert written == 2
+    archive = zipfile.ZipFile(output)
+    assert sorted(archive.namelist()) == ["WO-00001_Mechanical.pdf", "WO-00002_Mechanical.pdf"]
+    assert archive.read("WO-00001_Mechanical.pdf").startswith(b"%PDF")
+    assert not marker.exists()
+    assert sys.modules['__main__'] is app_main
+
+
+def test_export_without_tasks_writes_empty_archive():
+    output = io.BytesIO()
+    assert export_task_pdfs(iter([]), output) == 0
+    assert zipfile.ZipFile(output).namelist() == []
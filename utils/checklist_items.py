@@ -0,0 +1,74 @@
+# In file: utils/checklist_items.py
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# One row per checklist item result; repeated strings are dictionary-encoded
+_CATEGORY = pa.dictionary(pa.int32(), pa.string())
+CHECKLIST_ITEM_SCHEMA = pa.schema([
+    ('task_id', pa.string()),
+    ('work_center', _CATEGORY),
+    ('equipment_type', _CATEGORY),
+    ('location_type', _CATEGORY),
+    ('specific_location', _CATEGORY),
+    ('item', _CATEGORY),
+    ('status', _CATEGORY),
+])
+
+
+def checklist_item_table(tasks):
+    """Explodes the checklist_data of task dicts into a CHECKLIST_ITEM_SCHEMA table"""
+    columns = {name: [] for name in CHECKLIST_ITEM_SCHEMA.names}
+    for task in tasks:
+        items = [item for item in task.get('checklist_data') or [] if isinstance(item, dict)]
+        if not items:
+            continue
+        equipment_type = task.get('equipment_type') or task.get('instrument_type')
+        for name, value in [('task_id', task['id']), ('work_center', task.get('work_center')),
+                            ('equipment_type', equipment_type), ('location_type', task.get('location_type')),
+                            ('specific_location', task.get('specific_location'))]:
+            columns[name].extend([value if value is None else str(value)] * len(items))
+        columns['item'].extend(item.get('task') for item in items)
+        columns['status'].extend(item.get('status') for item in items)
+    return pa.table({
+        field.name: pa.array(columns[field.name], type=pa.string()).cast(field.type) if field.type == _CATEGORY
+        else pa.array(columns[field.name], type=field.type)
+        for field in CHECKLIST_ITEM_SCHEMA
+    }, schema=CHECKLIST_ITEM_SCHEMA)
+
+
+def _codes(column):
+    """Dictionary codes of a combined column as a NumPy array, nulls coded as len(dictionary)"""
+    dictionary = column.dictionary.to_pylist() + [None]
+    return column.indices.fill_null(len(dictionary) - 1).to_numpy(zero_copy_only=False), dictionary
+
+
+def failure_rates(items, by):
+    """
+    FAIL counts and rates per group of an item table. NA results are not
+    checks, so fail_rate is FAIL / (PASS + FAIL), in %. Returns a DataFrame
+    with the 'by' columns plus checked, failed and fail_rate.
+    """
+    columns = ['checked', 'failed', 'fail_rate']
+    if not items.num_rows:
+        return pd.DataFrame(columns=by + columns)
+    # Counted straight from the dictionary codes; only the groups are decoded
+    items = items.select(by + ['status']).unify_dictionaries().combine_chunks()
+    status_codes, statuses = _codes(items['status'].chunk(0))
+    checked = np.array([value not in (None, 'NA') for value in statuses])[status_codes]
+    failed = np.array([value == 'FAIL' for value in statuses])[status_codes]
+
+    codes, labels = zip(*(_codes(items[name].chunk(0)) for name in by))
+    sizes = [len(values) for values in labels]
+    group = np.ravel_multi_index(codes, sizes)
+    size = int(np.prod(sizes))
+    present = np.flatnonzero(np.bincount(group, minlength=size))
+    frame = pd.DataFrame({
+        name: [values[code] for code in group_codes]
+        for name, values, group_codes in zip(by, labels, np.unravel_index(present, sizes))
+    })
+    frame['checked'] = np.bincount(group, weights=checked, minlength=size)[present].astype('int64')
+    frame['failed'] = np.bincount(group, weights=failed, minlength=size)[present].astype('int64')
+    frame['fail_rate'] = (frame['failed'] / frame['checked'].where(frame['checked'] > 0) * 100).fillna(0)
+    return frame[by + columns]
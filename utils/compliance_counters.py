@@ -0,0 +1,80 @@
+# In file: utils/compliance_counters.py
+
+from datetime import date
+from .kpi_counters import merge_counts
+
+# Compliance counter sets use the KPI counter layout (see utils/kpi_counters.py):
+# {'location': {location: {field: n}}, 'location_month': {"location/YYYY-MM": {field: n}}}
+# with fields 'reports', 'compliant' (all checks passed) and one pass count per check.
+
+# Report fields of the compliance form and their display names
+COMPLIANCE_CHECKS = {
+    'permits_verified': "Permits Verified",
+    'jsa_complete': "JSA Complete",
+    'area_secured': "Area Secured",
+    'loto_applied': "LOTO Applied",
+    'tools_certified': "Tools Certified",
+    'fire_equipment_ok': "Fire Equipment OK",
+    'ppe_ok': "PPE OK",
+}
+
+# Bumped whenever the counter layout changes so stored counters get rebuilt
+COMPLIANCE_COUNTERS_VERSION = 1
+# The rolling compliance score covers the current and previous months
+COMPLIANCE_ROLLING_MONTHS = 3
+
+
+def compliance_deltas(report):
+    """Counter changes for one new compliance report"""
+    location = report.get('location', 'Unknown')
+    month = str(report.get('report_date') or '')[:7] or 'unknown'
+    passed = {check: int(bool(report.get(check))) for check in COMPLIANCE_CHECKS}
+    values = {'reports': 1, 'compliant': int(all(passed.values())), **passed}
+    return {
+        'location': {location: dict(values)},
+        'location_month': {f"{location}/{month}": dict(values)},
+    }
+
+
+def count_reports_for_compliance(reports):
+    """Builds a compliance counter set from scratch for a list of reports"""
+    totals = {}
+    for report in reports:
+        merge_counts(totals, compliance_deltas(report))
+    return totals
+
+
+def _rolling_months(today, months):
+    year, month = today.year, today.month
+    result = []
+    for _ in range(months):
+        result.append(f"{year:04d}-{month:02d}")
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return result
+
+
+def compliance_matrix(counters, locations, today=None, rolling_months=COMPLIANCE_ROLLING_MONTHS):
+    """
+    Per-location compliance summary from a counter set: one row per location
+    with 'reports', 'compliant_rate', a pass rate (%) per check and
+    'rolling_score', the share of checks passed (%) over the last
+    rolling_months months. Rates are None for locations without reports.
+    """
+    months = _rolling_months(today or date.today(), rolling_months)
+    by_location = counters.get('location', {})
+    by_month = counters.get('location_month', {})
+    rows = []
+    for location in locations:
+        stats = by_location.get(location, {})
+        reports = stats.get('reports', 0)
+        row = {'location': location, 'reports': reports,
+               'compliant_rate': stats.get('compliant', 0) / reports * 100 if reports else None}
+        for check in COMPLIANCE_CHECKS:
+            row[check] = stats.get(check, 0) / reports * 100 if reports else None
+
+        recent = [by_month.get(f"{location}/{month}", {}) for month in months]
+        recent_checks = sum(month.get('reports', 0) for month in recent) * len(COMPLIANCE_CHECKS)
+        recent_passed = sum(month.get(check, 0) for month in recent for check in COMPLIANCE_CHECKS)
+        row['rolling_score'] = recent_passed / recent_checks * 100 if recent_checks else None
+        rows.append(row)
+    return rows
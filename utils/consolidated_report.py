@@ -0,0 +1,217 @@
+# In file: utils/consolidated_report.py
+
+import zlib
+from datetime import datetime
+from fpdf import FPDF
+from .pdf_report import safe_text, write_task_sections
+
+
+def _roman(number):
+    numerals = [(100, 'c'), (90, 'xc'), (50, 'l'), (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i')]
+    result = ''
+    for value, numeral in numerals:
+        while number >= value:
+            result += numeral
+            number -= value
+    return result
+
+
+class StreamingPDF(FPDF):
+    """
+    FPDF that writes every page to the output file as soon as the page is
+    finished, so memory does not grow with the number of pages. Pages added
+    after begin_front_matter() are placed before all earlier pages. Page
+    totals ({nb}) are not supported: earlier pages are already written.
+    """
+    def __init__(self, output):
+        super().__init__()
+        # The default open action points at object 3, the first page written rather than the first page shown
+        self.set_display_mode('default')
+        self._output = output
+        self._written = 0
+        self._body_pages = []   # page object numbers
+        self._front_pages = []
+        self._page_objects = self._body_pages
+        self._front_matter_requested = False
+
+    @property
+    def in_front_matter(self):
+        return self._page_objects is self._front_pages
+
+    def begin_front_matter(self):
+        """Pages from the next one on are placed before all earlier pages"""
+        self._front_matter_requested = True
+
+    def _beginpage(self, orientation):
+        # Switched here, after add_page() has finished the previous page
+        if self._front_matter_requested:
+            self._page_objects = self._front_pages
+        super()._beginpage(orientation)
+
+    def open(self):
+        super().open()
+        self._putheader()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        data = self.buffer.encode('latin-1')
+        self._output.write(data)
+        self._written += len(data)
+        self.buffer = ''
+
+    def _newobj(self):
+        # Offsets count the bytes already flushed
+        self.n += 1
+        self.offsets[self.n] = self._written + len(self.buffer)
+        self._out(f"{self.n} 0 obj")
+
+    def _putresources(self):
+        super()._putresources()
+        # FPDF takes the resource dictionary's offset from the unflushed buffer alone
+        self.offsets[2] += self._written
+
+    def _endpage(self):
+        super()._endpage()
+        content = self.pages.pop(self.page).encode('latin-1')
+        if self.compress:
+            content = zlib.compress(content)
+        self._newobj()
+        self._page_objects.append(self.n)
+        self._out('<</Type /Page')
+        self._out('/Parent 1 0 R')
+        self._out('/Resources 2 0 R')
+        self._out(f"/Contents {self.n + 1} 0 R>>")
+        self._out('endobj')
+        self._newobj()
+        self._out(('<</Filter /FlateDecode ' if self.compress else '<<') + f"/Length {len(content)}>>")
+        self._putstream(content)
+        self._out('endobj')
+        self._flush()
+
+    def _enddoc(self):
+        # FPDF._enddoc with the page tree built from the written pages
+        kids = self._front_pages + self._body_pages
+        self.offsets[1] = self._written + len(self.buffer)
+        self._out('1 0 obj')
+        self._out('<</Type /Pages')
+        self._out('/Kids [' + ' '.join(f"{n} 0 R" for n in kids) + ']')
+        self._out(f"/Count {len(kids)}")
+        self._out('/MediaBox [0 0 %.2f %.2f]' % (self.fw_pt, self.fh_pt))
+        self._out('>>')
+        self._out('endobj')
+        self._putresources()
+        self._newobj()
+        self._out('<<')
+        self._putinfo()
+        self._out('>>')
+        self._out('endobj')
+        self._newobj()
+        self._out('<<')
+        self._putcatalog()
+        self._out('>>')
+        self._out('endobj')
+        xref = self._written + len(self.buffer)
+        self._out('xref')
+        self._out(f"0 {self.n + 1}")
+        self._out('0000000000 65535 f ')
+        for i in range(1, self.n + 1):
+            self._out('%010d 00000 n ' % self.offsets[i])
+        self._out('trailer')
+        self._out('<<')
+        self._puttrailer()
+        self._out('>>')
+        self._out('startxref')
+        self._out(xref)
+        self._out('%%EOF')
+        self.state = 3
+
+
+class ConsolidatedReport(StreamingPDF):
+    """
+    One PDF for many work orders: a cover page with the KPI summary and a
+    table of contents, then the report sections of each work order.
+    Work orders are added one at a time with add_work_order(); finish(kpis)
+    writes the cover and contents (numbered i, ii, ...) and closes the file.
+    """
+    def __init__(self, output, title, scope):
+        super().__init__(output)
+        self._title = title
+        self._scope = scope
+        self._generated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._contents = []   # (work order, work center, location, status, page)
+        self.set_title(safe_text(title))
+
+    def header(self):
+        self.set_font('Arial', 'B', 14)
+        self.cell(0, 10, safe_text(self._title), 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        # Work order pages come first in the file, so their numbers are final
+        number = _roman(self.page - len(self._body_pages)) if self.in_front_matter else self.page
+        self.cell(0, 10, f'Page {number}', 0, 0, 'L')
+        self.cell(0, 10, f'Report Generated: {self._generated}', 0, 0, 'R')
+
+    def add_work_order(self, task):
+        """Adds the report sections of one task (full document, checklist included) on a new page"""
+        self.add_page()
+        self._contents.append((task.get('work_order_number'), task.get('work_center'),
+                               task.get('specific_location'), (task.get('status') or 'N/A').title(), self.page))
+        write_task_sections(self, task)
+
+    def finish(self, kpis):
+        """Writes the cover page (KPI summary from calculate_kpis) and table of contents, then closes the document"""
+        self.begin_front_matter()
+        self.add_page()
+        line_height = 7
+
+        for label, value in [("Scope:", self._scope), ("Work Orders:", len(self._contents)),
+                             ("Generated:", self._generated)]:
+            self.set_font('Arial', 'B', 10)
+            self.cell(40, line_height, safe_text(label), 0, 0)
+            self.set_font('Arial', '', 10)
+            self.cell(150, line_height, safe_text(value), 0, 1)
+
+        self.ln(5)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'KPI Summary', 0, 1, 'L')
+        for label, value in [("Total Work Orders", kpis['total_tasks']),
+                             ("Reviewed Work Orders", kpis['completed_tasks']),
+                             ("Approval Rate", f"{kpis['approval_rate']:.1f}%"),
+                             ("Avg Completion Time", f"{kpis['avg_completion_time']:.1f} hours")]:
+            self.set_font('Arial', 'B', 10)
+            self.cell(95, line_height, label, 1, 0)
+            self.set_font('Arial', '', 10)
+            self.cell(95, line_height, safe_text(value), 1, 1)
+
+        for heading, rates in [("Approval Rate by Work Center", kpis['work_center_performance']),
+                               ("Approval Rate by Location", kpis['location_performance'])]:
+            if not rates:
+                continue
+            self.ln(5)
+            self.set_font('Arial', 'B', 12)
+            self.cell(0, 10, heading, 0, 1, 'L')
+            self.set_font('Arial', '', 10)
+            for group, rate in rates.items():
+                self.cell(95, line_height, safe_text(group), 1, 0)
+                self.cell(95, line_height, f"{rate:.1f}%", 1, 1)
+
+        self.add_page()
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Table of Contents', 0, 1, 'L')
+        self.set_font('Arial', 'B', 10)
+        widths = [45, 40, 40, 40, 25]
+        for width, label in zip(widths, ['Work Order #', 'Work Center', 'Location', 'Status', 'Page']):
+            self.cell(width, line_height, label, 1, 0, 'C')
+        self.ln()
+        self.set_font('Arial', '', 9)
+        for *fields, page in self._contents:
+            for width, value in zip(widths, fields):
+                self.cell(width, line_height - 1, safe_text(value), 1, 0, 'L')
+            self.cell(widths[-1], line_height - 1, str(page), 1, 1, 'C')
+        self.close()
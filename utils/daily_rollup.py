@@ -0,0 +1,124 @@
+# In file: utils/daily_rollup.py
+
+import os
+import threading
+from datetime import date, timedelta
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+from .kpi_counters import COMPLETED_STATUSES
+from .task_snapshot import get_task_snapshot
+
+# Rollup rows are broken out by these task fields
+ROLLUP_DIMENSIONS = ['work_center', 'specific_location', 'work_type']
+ROLLUP_MEASURES = ['submitted', 'approved', 'rejected', 'pending']
+ROLLUP_FILE = "_daily_rollup.parquet"
+ROLLUP_VERSION = b"1"
+
+
+def _day(values):
+    return values.str[:10]
+
+
+def compute_rollup(tasks, first_day, last_day):
+    """
+    Per-day rollup rows for the days first_day..last_day (YYYY-MM-DD, inclusive)
+    from a frame of task columns. 'submitted', 'approved' and 'rejected' count
+    what happened on the day (reviews by review_date); 'pending' is the
+    backlog left at the end of the day. Only days with activity get a row.
+    """
+    columns = ['day'] + ROLLUP_DIMENSIONS + ROLLUP_MEASURES
+    if tasks.empty or first_day > last_day:
+        return pd.DataFrame(columns=columns)
+
+    frame = tasks[ROLLUP_DIMENSIONS].fillna('Unknown')
+    submitted_day = _day(tasks['submission_date'].fillna(''))
+    completed = tasks['status'].isin(COMPLETED_STATUSES)
+    # Tasks reviewed before review dates were recorded count as reviewed on submission
+    reviewed_day = _day(tasks['review_date'].fillna(tasks['submission_date']).fillna('')).where(completed)
+
+    def daily_counts(days, mask):
+        in_window = mask & (days >= first_day) & (days <= last_day)
+        return frame[in_window].groupby([days[in_window].rename('day')] + ROLLUP_DIMENSIONS).size()
+
+    counts = pd.DataFrame({
+        'submitted': daily_counts(submitted_day, submitted_day != ''),
+        'approved': daily_counts(reviewed_day, tasks['status'] == 'approved'),
+        'rejected': daily_counts(reviewed_day, tasks['status'] == 'rejected'),
+    }).fillna(0).astype('int64')
+    if counts.empty:
+        return pd.DataFrame(columns=columns)
+    counts.index.names = ['day'] + ROLLUP_DIMENSIONS
+    counts = counts.sort_index()
+
+    # Backlog: what was open when the window started, plus the running net change
+    open_at_start = (submitted_day != '') & (submitted_day < first_day) & ~(reviewed_day < first_day)
+    opening = frame[open_at_start].groupby(ROLLUP_DIMENSIONS).size()
+    net = counts['submitted'] - counts['approved'] - counts['rejected']
+    running = net.groupby(level=ROLLUP_DIMENSIONS).cumsum()
+    group_index = running.index.droplevel('day')
+    counts['pending'] = running.to_numpy() + opening.reindex(group_index, fill_value=0).to_numpy()
+    return counts.reset_index()[columns]
+
+
+class DailyRollup:
+    """
+    Per-day activity rollup stored next to the task snapshot. Days are only
+    added once they are over, so stored rows never change; each new day is
+    computed from the snapshot the first time it is read after midnight.
+    """
+    def __init__(self, snapshot, path):
+        self._snapshot = snapshot
+        self._path = path
+        self._lock = threading.Lock()
+        self._rows = None
+        self._closed_through = None
+
+    def _load(self):
+        try:
+            table = pq.read_table(self._path)
+        except (OSError, pa.ArrowInvalid):
+            return None, None
+        metadata = table.schema.metadata or {}
+        if metadata.get(b'version') != ROLLUP_VERSION:
+            return None, None
+        return table.to_pandas(), metadata[b'closed_through'].decode()
+
+    def _save(self, rows, closed_through):
+        table = pa.Table.from_pandas(rows, preserve_index=False)
+        table = table.replace_schema_metadata({b'version': ROLLUP_VERSION, b'closed_through': closed_through.encode()})
+        directory, name = os.path.split(self._path)
+        os.makedirs(directory or '.', exist_ok=True)
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, self._path)
+
+    def rows(self):
+        """All rollup rows up to and including yesterday"""
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        with self._lock:
+            if self._rows is None:
+                self._rows, self._closed_through = self._load()
+
+            if self._closed_through is None or self._closed_through < yesterday:
+                tasks = self._snapshot.read(ROLLUP_DIMENSIONS + ['status', 'submission_date', 'review_date']).to_pandas()
+                if self._closed_through is None:
+                    first_day = _day(tasks['submission_date'].dropna()).min() if not tasks.empty else yesterday
+                    stored = []
+                else:
+                    first_day = (date.fromisoformat(self._closed_through) + timedelta(days=1)).isoformat()
+                    stored = [self._rows]
+                new_rows = compute_rollup(tasks, first_day or yesterday, yesterday)
+                parts = [part for part in stored + [new_rows] if not part.empty]
+                self._rows = pd.concat(parts, ignore_index=True) if parts else new_rows
+                self._closed_through = yesterday
+                self._save(self._rows, yesterday)
+            return self._rows.copy()
+
+
+@st.cache_resource(show_spinner=False)
+def get_daily_rollup():
+    """The process-wide DailyRollup, kept in the task snapshot directory"""
+    snapshot = get_task_snapshot()
+    return DailyRollup(snapshot, os.path.join(snapshot.root, ROLLUP_FILE))
@@ -0,0 +1,173 @@
+# In file: utils/findings_index.py
+
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime, timedelta
+import numpy as np
+import streamlit as st
+from .storage import get_storage
+
+# How often tasks written by other server processes are pulled in (seconds)
+FINDINGS_INDEX_REFRESH_INTERVAL = 60
+FINDINGS_INDEX_REFRESH_OVERLAP = timedelta(minutes=5)
+
+# BM25 ranking parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase word tokens, punctuation dropped"""
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def searchable_text(task):
+    """The text a task is found by: its overall findings and every checklist remark"""
+    parts = [task.get('overall_findings') or '']
+    parts.extend(item.get('remarks') or '' for item in task.get('checklist_data') or [] if isinstance(item, dict))
+    return ' '.join(parts)
+
+
+class FindingsIndex:
+    """
+    Inverted index over findings and checklist remarks. Each term keeps its
+    postings as compact arrays of document numbers (ascending, since
+    documents are only appended) and term frequencies. Queries AND their
+    words, treat each word as a prefix and rank matches with BM25.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}         # term -> (array of doc numbers, array of term frequencies)
+        self._terms = []            # sorted vocabulary, for prefix lookups
+        self._doc_ids = []          # doc number -> task id
+        self._doc_numbers = {}      # task id -> doc number
+        self._doc_lengths = array('I')
+        self._doc_lengths_view = np.empty(0)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def add(self, task):
+        """Indexes one task; tasks already indexed are skipped (findings are never edited)"""
+        with self._lock:
+            task_id = task['id']
+            if task_id in self._doc_numbers:
+                return
+            doc_number = len(self._doc_ids)
+            tokens = tokenize(searchable_text(task))
+            self._doc_ids.append(task_id)
+            self._doc_numbers[task_id] = doc_number
+            self._doc_lengths.append(len(tokens))
+            self._total_length += len(tokens)
+            for term, frequency in Counter(tokens).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array('I'), array('I'))
+                    insort(self._terms, term)
+                postings[0].append(doc_number)
+                postings[1].append(frequency)
+
+    def _expand(self, prefix):
+        """Vocabulary terms starting with prefix"""
+        start = bisect_left(self._terms, prefix)
+        end = start
+        while end < len(self._terms) and self._terms[end].startswith(prefix):
+            end += 1
+        return self._terms[start:end]
+
+    def _word_scores(self, word, doc_lengths, average_length):
+        """(doc numbers, BM25 scores) for every document containing a term starting with word"""
+        doc_count = len(self._doc_ids)
+        doc_parts, score_parts = [], []
+        for term in self._expand(word):
+            docs = np.array(self._postings[term][0], dtype=np.int64)
+            frequencies = np.array(self._postings[term][1], dtype=np.float64)
+            idf = np.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[docs] / average_length)
+            doc_parts.append(docs)
+            score_parts.append(idf * frequencies * (BM25_K1 + 1) / (frequencies + norm))
+        if not doc_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+        return docs, np.bincount(inverse, weights=np.concatenate(score_parts))
+
+    def search(self, query, limit=None):
+        """Task ids matching every word of the query (as a prefix), best match first, as (id, score) pairs"""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        with self._lock:
+            if not self._doc_ids:
+                return []
+            if len(self._doc_lengths_view) != len(self._doc_lengths):
+                self._doc_lengths_view = np.array(self._doc_lengths, dtype=np.float64)
+            doc_lengths = self._doc_lengths_view
+            average_length = max(self._total_length / len(self._doc_ids), 1)
+
+            matches = None
+            for word in words:
+                docs, scores = self._word_scores(word, doc_lengths, average_length)
+                if matches is None:
+                    matches = (docs, scores)
+                else:
+                    common, left, right = np.intersect1d(matches[0], docs, assume_unique=True, return_indices=True)
+                    matches = (common, matches[1][left] + scores[right])
+                if not len(matches[0]):
+                    return []
+
+            docs, scores = matches
+            # Stable, so equal scores keep indexing order
+            order = np.argsort(-scores, kind='stable')[:limit]
+            doc_ids = self._doc_ids
+            return [(doc_ids[doc], score) for doc, score in zip(docs[order].tolist(), scores[order].tolist())]
+
+
+class LiveFindingsIndex:
+    """
+    A FindingsIndex built from the storage backend on first use and kept
+    current from local writes (add) plus a periodic pull of tasks submitted
+    elsewhere.
+    """
+    def __init__(self, storage):
+        self._storage = storage
+        self._index = None
+        self._lock = threading.Lock()
+        self._watermark = None
+        self._checked_at = 0.0
+
+    def add(self, task):
+        if self._index is not None:
+            self._index.add(task)
+
+    def _refresh(self):
+        started_at = datetime.now()
+        if self._index is None:
+            index = FindingsIndex()
+            for task in self._storage.query_tasks():
+                index.add(task)
+            self._index = index
+        else:
+            since = (self._watermark - FINDINGS_INDEX_REFRESH_OVERLAP).isoformat()
+            for task in self._storage.query_tasks_changed_since(since):
+                self._index.add(task)
+        self._watermark = started_at
+        self._checked_at = time.monotonic()
+
+    def search(self, query, limit=None):
+        with self._lock:
+            if self._index is None or time.monotonic() - self._checked_at >= FINDINGS_INDEX_REFRESH_INTERVAL:
+                self._refresh()
+        return self._index.search(query, limit)
+
+
+@st.cache_resource(show_spinner=False)
+def get_findings_index():
+    """The process-wide LiveFindingsIndex over the configured storage backend"""
+    return LiveFindingsIndex(get_storage())
@@ -0,0 +1,53 @@
+# In file: utils/findings_terms.py
+
+import re
+from collections import Counter
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Stop Words for Findings Analysis
+STOP_WORDS = set([
+    'a', 'an', 'and', 'the', 'in', 'is', 'it', 'of', 'for', 'on', 'with', 'was', 'to',
+    'as', 'at', 'by', 'but', 'or', 'be', 'not', 'no', 'na', 'n/a', 'leaking', 'found',
+    'observed', 'requires', 'required', 'needs', 'due', 'level', 'high', 'low', 'unit',
+    'equipment', 'work', 'task', 'see', 'check', 'checked', 'also', 'has', 'had', 'per',
+    'need', 'replace', 'repair', 'broken', 'faulty', 'damage', 'damaged'
+])
+
+# Task fields holding the precomputed counts, and their Arrow type in the snapshot
+WORD_COUNTS_FIELD = 'finding_words'
+PHRASE_COUNTS_FIELD = 'finding_phrases'
+TERM_COUNTS_TYPE = pa.map_(pa.string(), pa.int32())
+# The same layout as a plain list, which the list kernels accept
+_TERM_ENTRIES_TYPE = pa.list_(pa.struct([('key', pa.string()), ('value', pa.int32())]))
+
+
+def _keyword(word):
+    return word not in STOP_WORDS and len(word) > 3
+
+
+def findings_term_counts(text):
+    """
+    Keyword and two-word phrase counts for one findings text, stored with the
+    task at submission. Phrases are adjacent words that are both keywords,
+    e.g. "seal leak" or "bearing noise".
+    """
+    words = re.sub(r'[^\w\s]', '', (text or '').lower()).split()
+    phrases = [f"{first} {second}" for first, second in zip(words, words[1:]) if _keyword(first) and _keyword(second)]
+    return {
+        WORD_COUNTS_FIELD: dict(Counter(word for word in words if _keyword(word))),
+        PHRASE_COUNTS_FIELD: dict(Counter(phrases)),
+    }
+
+
+def top_terms(term_counts, n=20):
+    """Merges an Arrow column of per-task term counts and returns the n most common (term, count) pairs"""
+    if isinstance(term_counts, pa.ChunkedArray):
+        term_counts = term_counts.combine_chunks() if term_counts.num_chunks else pa.array([], TERM_COUNTS_TYPE)
+    entries = term_counts.cast(_TERM_ENTRIES_TYPE).flatten()
+    if not len(entries):
+        return []
+    totals = pa.table({'term': entries.field('key'), 'count': entries.field('value')}) \
+        .group_by('term').aggregate([('count', 'sum')])
+    top = totals.take(pc.select_k_unstable(totals, n, [('count_sum', 'descending'), ('term', 'ascending')]))
+    return list(zip(top['term'].to_pylist(), top['count_sum'].to_pylist()))
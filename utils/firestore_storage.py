@@ -0,0 +1,543 @@
+# In file: utils/firestore_storage.py
+
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from google.api_core.exceptions import FailedPrecondition
+from .firebase_config import (
+    db, TASKS_COLLECTION, USERS_COLLECTION, COUNTERS_COLLECTION,
+    NOTIFICATIONS_COLLECTION, COMPLIANCE_COLLECTION
+)
+from .storage import StorageBackend, project_fields, task_cursor
+from .task_query import build_task_query, FILTER_FIELDS
+from .task_repository import task_matches_filters
+from .task_mirror import TaskMirror
+from .work_order_allocator import WorkOrderAllocator
+from .kpi_counters import (
+    counter_deltas, count_tasks_for_kpis, merge_counts, split_daily,
+    KPI_COUNTERS_VERSION, KPI_TASK_FIELDS, DAILY_DIMENSION
+)
+from .compliance_counters import compliance_deltas, count_reports_for_compliance, COMPLIANCE_COUNTERS_VERSION
+
+# KPI counter writes are spread over several shard documents to avoid a single hot document.
+# Each rebuild starts a new generation of shards; the meta document names the current one.
+KPI_SHARD_COUNT = 10
+KPI_SHARD_PREFIX = "kpi_shard_"
+KPI_BASE_PREFIX = "kpi_base_"
+# The daily series is kept in per-month documents (kpi_days_<generation>_<YYYY-MM>_<shard>),
+# so the headline shards stay small and a chart reads only the months it shows
+KPI_DAY_SHARD_COUNT = 4
+KPI_DAY_PREFIX = "kpi_days_"
+KPI_META_DOC = "kpi_meta"
+# Firestore serves reads at a past read_time for an hour; a rebuild older than this starts over
+COUNTER_REBUILD_TIMEOUT = timedelta(minutes=50)
+# Compliance reports are rare enough for one counter document per generation
+# (compliance_counts_<generation>) on top of the generation's base; the meta
+# document names the current generation like the KPI one does
+COMPLIANCE_META_DOC = "compliance_meta"
+COMPLIANCE_COUNTS_PREFIX = "compliance_counts_"
+COMPLIANCE_BASE_PREFIX = "compliance_base_"
+# The single counter document used before compliance counters had generations
+LEGACY_COMPLIANCE_COUNTERS_DOC = "compliance_counters"
+
+# Firestore rejects batches with more than 500 writes. A bulk task update costs
+# up to three writes per task (task, notification, its month's daily counters)
+# plus one headline counter shard write.
+FIRESTORE_BATCH_LIMIT = 500
+BULK_UPDATE_CHUNK_SIZE = (FIRESTORE_BATCH_LIMIT - 1) // 3
+
+
+def _as_increments(deltas):
+    """Turns a nested counter delta dict into Firestore Increment sentinels, dropping zeros"""
+    result = {}
+    for key, value in deltas.items():
+        if isinstance(value, dict):
+            nested = _as_increments(value)
+            if nested:
+                result[key] = nested
+        elif value:
+            result[key] = firestore.Increment(value)
+    return result
+
+
+class FirestoreStorage(StorageBackend):
+    """
+    Firestore backend. Task reads are served from a live snapshot mirror when
+    it is running, work order numbers are leased in blocks and KPI counters
+    are sharded.
+    """
+    name = "firestore"
+
+    def __init__(self, client=None):
+        self._client = client or db
+        self._allocator = WorkOrderAllocator(self._client, COUNTERS_COLLECTION)
+        self._mirror = None
+        self._mirror_lock = threading.Lock()
+
+    def _tasks(self):
+        return self._client.collection(TASKS_COLLECTION)
+
+    # --- Live mirror ---
+    def live_mirror(self):
+        """Starts the snapshot mirror on first use; returns it once it is streaming, else None"""
+        with self._mirror_lock:
+            if self._mirror is None:
+                try:
+                    mirror = TaskMirror(self._client, TASKS_COLLECTION)
+                    mirror.start()
+                    mirror.wait_until_ready()
+                    self._mirror = mirror
+                except Exception:
+                    # Fall back to direct reads; the listener is not retried
+                    self._mirror = False
+        return self._mirror if self._mirror and self._mirror.is_ready else None
+
+    @property
+    def reads_are_local(self):
+        return self.live_mirror() is not None
+
+    # --- Tasks ---
+    def next_work_order_number(self):
+        return self._allocator.next_number()
+
+    def get_work_order_gaps(self):
+        return self._allocator.get_work_order_gaps(TASKS_COLLECTION)
+
+    def _counters(self):
+        return self._client.collection(COUNTERS_COLLECTION)
+
+    def _kpi_meta_ref(self):
+        return self._counters().document(KPI_META_DOC)
+
+    def _shard_refs(self, generation):
+        return [self._counters().document(f"{KPI_SHARD_PREFIX}{generation}_{i}") for i in range(KPI_SHARD_COUNT)]
+
+    def _counter_generation(self, transaction, meta_ref):
+        """Reads the current counter generation inside a transaction, so a rebuild cannot start under the write"""
+        meta = meta_ref.get(transaction=transaction)
+        return (meta.to_dict() or {}).get('generation', 0) if meta.exists else 0
+
+    def _day_refs(self, generation, month):
+        """A month's daily counter shards, then its base document"""
+        prefix = f"{KPI_DAY_PREFIX}{generation}_{month}_"
+        return [self._counters().document(f"{prefix}{i}") for i in range(KPI_DAY_SHARD_COUNT)] + \
+            [self._counters().document(f"{prefix}base")]
+
+    def _record_counter_deltas(self, writer, generation, deltas):
+        """Adds a KPI counter update to a transaction: one headline shard write, one per month of the daily series"""
+        headline, days = split_daily(deltas)
+        increments = _as_increments(headline)
+        if increments:
+            writer.set(random.choice(self._shard_refs(generation)), increments, merge=True)
+        months = {}
+        for day, stats in days.items():
+            months.setdefault(day[:7], {})[day] = stats
+        for month, month_days in months.items():
+            increments = _as_increments({DAILY_DIMENSION: month_days})
+            if increments:
+                shard_ref = random.choice(self._day_refs(generation, month)[:KPI_DAY_SHARD_COUNT])
+                writer.set(shard_ref, increments, merge=True)
+
+    def add_task(self, task_data):
+        # The task and its counter updates are written together
+        task_ref = self._tasks().document()
+
+        @firestore.transactional
+        def add_in_transaction(transaction):
+            generation = self._counter_generation(transaction, self._kpi_meta_ref())
+            transaction.set(task_ref, task_data)
+            self._record_counter_deltas(transaction, generation, counter_deltas(new_task=task_data))
+
+        add_in_transaction(self._client.transaction())
+
+        mirror = self.live_mirror()
+        if mirror:
+            mirror.put({'id': task_ref.id, **task_data})
+        return task_ref.id
+
+    def update_task(self, task_id, update_data):
+        task_ref = self._tasks().document(task_id)
+
+        @firestore.transactional
+        def update_in_transaction(transaction):
+            task_doc = task_ref.get(transaction=transaction)
+            if not task_doc.exists:
+                return None
+            generation = self._counter_generation(transaction, self._kpi_meta_ref())
+            old_task = task_doc.to_dict()
+            transaction.update(task_ref, update_data)
+            self._record_counter_deltas(transaction, generation,
+                                        counter_deltas(old_task, {**old_task, **update_data}))
+            return old_task
+
+        old_task = update_in_transaction(self._client.transaction())
+
+        mirror = self.live_mirror()
+        if mirror and old_task is not None:
+            mirror.put({'id': task_id, **old_task, **update_data})
+        return old_task
+
+    def bulk_update_tasks(self, updates, expected_status=None):
+        for start in range(0, len(updates), BULK_UPDATE_CHUNK_SIZE):
+            yield self._bulk_update_chunk(updates[start:start + BULK_UPDATE_CHUNK_SIZE], expected_status)
+
+    def _bulk_update_chunk(self, updates, expected_status=None):
+        """
+        One transaction for a chunk of updates: a single get_all, which also
+        supplies the status check, then the writes
+        """
+        task_refs = [self._tasks().document(task_id) for task_id, _, _ in updates]
+        notifications = self._client.collection(NOTIFICATIONS_COLLECTION)
+
+        @firestore.transactional
+        def update_in_transaction(transaction):
+            docs = {doc.id: doc for doc in transaction.get_all(task_refs)}
+            generation = self._counter_generation(transaction, self._kpi_meta_ref())
+            deltas = {}
+            old_tasks = []
+            for task_ref, (task_id, update_data, notification) in zip(task_refs, updates):
+                doc = docs.get(task_id)
+                old_task = doc.to_dict() if doc is not None and doc.exists else None
+                if old_task is None or (expected_status is not None and old_task.get('status') != expected_status):
+                    old_tasks.append(None)
+                    continue
+                transaction.update(task_ref, update_data)
+                merge_counts(deltas, counter_deltas(old_task, {**old_task, **update_data}))
+                if notification:
+                    transaction.set(notifications.document(), notification)
+                old_tasks.append(old_task)
+            # One counter write covers the whole chunk
+            self._record_counter_deltas(transaction, generation, deltas)
+            return old_tasks
+
+        old_tasks = update_in_transaction(self._client.transaction())
+
+        mirror = self.live_mirror()
+        if mirror:
+            for (task_id, update_data, _), old_task in zip(updates, old_tasks):
+                if old_task is not None:
+                    mirror.put({'id': task_id, **old_task, **update_data})
+        return old_tasks
+
+    def get_task(self, task_id, fields=None):
+        mirror = self.live_mirror()
+        if mirror:
+            task = mirror.get(task_id)
+            return project_fields(task, fields) if task else None
+        doc = self._tasks().document(task_id).get(field_paths=fields)
+        return {'id': doc.id, **doc.to_dict()} if doc.exists else None
+
+    def query_tasks(self, filters=None):
+        mirror = self.live_mirror()
+        if mirror:
+            return mirror.query(filters)
+
+        # Every filter Firestore can express runs server-side
+        query, client_filters = build_task_query(self._tasks(), filters)
+        if query is None:
+            return []
+        task_list = [{'id': doc.id, **doc.to_dict()} for doc in query.stream()]
+        # Python filter for the combinations Firestore cannot express
+        if client_filters:
+            task_list = [t for t in task_list if task_matches_filters(t, client_filters)]
+        return task_list
+
+    def query_tasks_page(self, filters=None, page_size=20, cursor=None, fields=None):
+        mirror = self.live_mirror()
+        if mirror:
+            page, next_cursor = mirror.page(filters, page_size, cursor)
+            return [project_fields(t, fields) for t in page], next_cursor
+
+        query, client_filters = build_task_query(self._tasks(), filters)
+        if query is None:
+            return [], None
+        query = (query.order_by('submission_date', direction=firestore.Query.DESCENDING)
+                 .order_by('__name__', direction=firestore.Query.DESCENDING))
+        if fields:
+            query = query.select(list(set(fields) | {'submission_date'} | {FILTER_FIELDS[name] for name in client_filters}))
+
+        # Fetch one extra task to know whether a next page exists.
+        # Client-side filters can thin a batch out, so keep reading until the page is full.
+        page = []
+        batch_cursor = cursor
+        while len(page) <= page_size:
+            batch_query = query.limit(page_size + 1)
+            if isinstance(batch_cursor, str):
+                batch_query = batch_query.start_after({'submission_date': batch_cursor})
+            elif batch_cursor:
+                batch_query = batch_query.start_after({'submission_date': batch_cursor[0], '__name__': batch_cursor[1]})
+            batch = [{'id': doc.id, **doc.to_dict()} for doc in batch_query.stream()]
+            page.extend(t for t in batch if task_matches_filters(t, client_filters))
+            if len(batch) <= page_size:
+                break
+            batch_cursor = task_cursor(batch[-1])
+
+        next_cursor = task_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size], next_cursor
+
+    def count_tasks(self, filters=None):
+        mirror = self.live_mirror()
+        if mirror:
+            return len(mirror.query(filters))
+
+        query, client_filters = build_task_query(self._tasks(), filters)
+        if query is None:
+            return 0
+        if not client_filters:
+            return int(query.count().get()[0][0].value)
+        # Only the fields the Python filter needs are downloaded
+        fields = [FILTER_FIELDS[name] for name in client_filters]
+        docs = query.select(fields).stream()
+        return sum(1 for doc in docs if task_matches_filters(doc.to_dict(), client_filters))
+
+    def query_tasks_changed_since(self, since):
+        mirror = self.live_mirror()
+        if mirror:
+            return StorageBackend.query_tasks_changed_since(self, since)
+        # Two single-field range queries; a task matching both is returned once
+        changed = {}
+        for field in ['submission_date', 'review_date']:
+            for doc in self._tasks().where(field, '>=', since).stream():
+                changed[doc.id] = {'id': doc.id, **doc.to_dict()}
+        return list(changed.values())
+
+    def _start_counter_generation(self, meta_ref, version, stale_generation=None):
+        """
+        Moves counter writes to a new, empty generation of shards, unless the
+        counters behind meta_ref are current (or another process got there
+        first). Writers read the meta document in their transactions, so
+        every write commits either before the switch or into the new shards.
+        """
+        @firestore.transactional
+        def start_in_transaction(transaction):
+            meta = meta_ref.get(transaction=transaction)
+            data = (meta.to_dict() or {}) if meta.exists else {}
+            generation = data.get('generation', 0)
+            if data.get('version', 0) >= version and generation != stale_generation:
+                return
+            transaction.set(meta_ref, {'version': version, 'generation': generation + 1, 'ready': False})
+
+        start_in_transaction(self._client.transaction())
+
+    def _write_counter_base(self, generation, switched_at):
+        """
+        Counts the tasks as they were when the generation started (a full scan
+        at that read time) and stores the result as the generation's base.
+        Returns the headline base; shard writes after the switch come on top of it.
+        """
+        docs = self._tasks().select(KPI_TASK_FIELDS).stream(read_time=switched_at)
+        headline, days = split_daily(count_tasks_for_kpis(doc.to_dict() for doc in docs))
+        months = {}
+        for day, stats in days.items():
+            months.setdefault(day[:7], {})[day] = stats
+        writes = [(self._counters().document(f"{KPI_BASE_PREFIX}{generation}"), headline)]
+        writes += [(self._day_refs(generation, month)[-1], {DAILY_DIMENSION: month_days})
+                   for month, month_days in months.items()]
+
+        # The meta update goes in the last batch: the generation is ready once every base is stored
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT - 1):
+            batch = self._client.batch()
+            for ref, data in writes[start:start + FIRESTORE_BATCH_LIMIT - 1]:
+                batch.set(ref, data)
+            if start + FIRESTORE_BATCH_LIMIT - 1 >= len(writes):
+                # Marks the generation ready only if no newer one started meanwhile
+                batch.update(self._kpi_meta_ref(), {'ready': True},
+                             option=self._client.write_option(last_update_time=switched_at))
+            try:
+                batch.commit()
+            except FailedPrecondition:
+                pass
+        return headline
+
+    def _delete_counter_generation(self, generation):
+        """Best-effort cleanup of a previous generation's documents"""
+        prefixes = (f"{KPI_SHARD_PREFIX}{generation}_", f"{KPI_DAY_PREFIX}{generation}_")
+        try:
+            refs = [ref for ref in self._counters().list_documents()
+                    if ref.id.startswith(prefixes) or ref.id == f"{KPI_BASE_PREFIX}{generation}"]
+            for start in range(0, len(refs), FIRESTORE_BATCH_LIMIT):
+                batch = self._client.batch()
+                for ref in refs[start:start + FIRESTORE_BATCH_LIMIT]:
+                    batch.delete(ref)
+                batch.commit()
+        except Exception:
+            pass
+
+    def load_kpi_counters(self):
+        """
+        Sums the current generation's headline base and shards (a handful of
+        document reads). Counters that are missing or from an older layout are rebuilt
+        from a full task scan in a new generation; increments made during the
+        scan land in the new shards and are not lost.
+        """
+        meta_ref = self._kpi_meta_ref()
+        meta = meta_ref.get()
+        data = (meta.to_dict() or {}) if meta.exists else {}
+        if data.get('version', 1) < KPI_COUNTERS_VERSION:
+            self._start_counter_generation(meta_ref, KPI_COUNTERS_VERSION)
+            meta = meta_ref.get()
+            data = meta.to_dict()
+        generation = data['generation']
+
+        base = None
+        if not data.get('ready'):
+            if datetime.now(timezone.utc) - meta.update_time > COUNTER_REBUILD_TIMEOUT:
+                # An abandoned rebuild; its switch time is too old to read at
+                self._start_counter_generation(meta_ref, KPI_COUNTERS_VERSION, stale_generation=generation)
+                return self.load_kpi_counters()
+            # A rebuild in progress here or elsewhere: compute the same base it will store
+            base = self._write_counter_base(generation, meta.update_time)
+            self._delete_counter_generation(generation - 1)
+
+        totals = base or {}
+        refs = self._shard_refs(generation)
+        if base is None:
+            refs.append(self._counters().document(f"{KPI_BASE_PREFIX}{generation}"))
+        for doc in self._client.get_all(refs):
+            if doc.exists:
+                merge_counts(totals, doc.to_dict())
+        return totals
+
+    def load_daily_kpi_counters(self, months):
+        """Sums the month documents of the daily series (shards and base, five reads per month)"""
+        meta = self._kpi_meta_ref().get()
+        data = (meta.to_dict() or {}) if meta.exists else {}
+        if data.get('version', 1) < KPI_COUNTERS_VERSION or not data.get('ready'):
+            # Starts or completes the rebuild, which also writes the daily bases
+            self.load_kpi_counters()
+            data = self._kpi_meta_ref().get().to_dict()
+        refs = [ref for month in months for ref in self._day_refs(data['generation'], month)]
+        totals = {}
+        for doc in self._client.get_all(refs):
+            if doc.exists:
+                merge_counts(totals, doc.to_dict())
+        return totals.get(DAILY_DIMENSION, {})
+
+    # --- Notifications ---
+    def add_notification(self, notif_data):
+        _, notif_ref = self._client.collection(NOTIFICATIONS_COLLECTION).add(notif_data)
+        return notif_ref.id
+
+    def get_unread_notifications(self, username):
+        query = (self._client.collection(NOTIFICATIONS_COLLECTION)
+                 .where('username', '==', username)
+                 .where('read', '==', False)
+                 .order_by('timestamp', direction=firestore.Query.DESCENDING))
+        return [{'id': notif.id, **notif.to_dict()} for notif in query.stream()]
+
+    def mark_notification_read(self, notification_id):
+        self._client.collection(NOTIFICATIONS_COLLECTION).document(notification_id).update({'read': True})
+
+    # --- Compliance reports ---
+    def _compliance_meta_ref(self):
+        return self._counters().document(COMPLIANCE_META_DOC)
+
+    def _compliance_refs(self, generation):
+        """A generation's counter document (increments), then its base document"""
+        return (self._counters().document(f"{COMPLIANCE_COUNTS_PREFIX}{generation}"),
+                self._counters().document(f"{COMPLIANCE_BASE_PREFIX}{generation}"))
+
+    def add_compliance_report(self, report_data):
+        # The report and its counter updates are written together, into the current generation
+        report_ref = self._client.collection(COMPLIANCE_COLLECTION).document()
+
+        @firestore.transactional
+        def add_in_transaction(transaction):
+            generation = self._counter_generation(transaction, self._compliance_meta_ref())
+            transaction.set(report_ref, report_data)
+            transaction.set(self._compliance_refs(generation)[0],
+                            {'counts': _as_increments(compliance_deltas(report_data))}, merge=True)
+
+        add_in_transaction(self._client.transaction())
+        return report_ref.id
+
+    def get_compliance_reports(self, location):
+        query = (self._client.collection(COMPLIANCE_COLLECTION)
+                 .where('location', '==', location)
+                 .order_by('report_date', direction=firestore.Query.DESCENDING))
+        return [{'id': report.id, **report.to_dict()} for report in query.stream()]
+
+    def load_compliance_counters(self):
+        """
+        Sums the current generation's base and counter document (two reads).
+        Counters that are missing or from an older layout are rebuilt in a
+        new generation, like the KPI counters: the base counts the reports
+        as of the switch, and reports added during the scan land in the new
+        generation's counter document.
+        """
+        meta_ref = self._compliance_meta_ref()
+        meta = meta_ref.get()
+        data = (meta.to_dict() or {}) if meta.exists else {}
+        if data.get('version', 0) < COMPLIANCE_COUNTERS_VERSION:
+            self._start_counter_generation(meta_ref, COMPLIANCE_COUNTERS_VERSION)
+            meta = meta_ref.get()
+            data = meta.to_dict()
+        generation = data['generation']
+        counts_ref, base_ref = self._compliance_refs(generation)
+
+        base = None
+        if not data.get('ready'):
+            if datetime.now(timezone.utc) - meta.update_time > COUNTER_REBUILD_TIMEOUT:
+                # An abandoned rebuild; its switch time is too old to read at
+                self._start_counter_generation(meta_ref, COMPLIANCE_COUNTERS_VERSION, stale_generation=generation)
+                return self.load_compliance_counters()
+            # A rebuild in progress here or elsewhere: compute the same base it will store
+            reports = self._client.collection(COMPLIANCE_COLLECTION).stream(read_time=meta.update_time)
+            base = count_reports_for_compliance(report.to_dict() for report in reports)
+            batch = self._client.batch()
+            batch.set(base_ref, {'counts': base})
+            # Marks the generation ready only if no newer one started meanwhile
+            batch.update(meta_ref, {'ready': True}, option=self._client.write_option(last_update_time=meta.update_time))
+            try:
+                batch.commit()
+            except FailedPrecondition:
+                pass
+            self._delete_compliance_generation(generation - 1)
+
+        totals = base or {}
+        refs = [counts_ref] if base is not None else [counts_ref, base_ref]
+        for doc in self._client.get_all(refs):
+            if doc.exists:
+                merge_counts(totals, (doc.to_dict() or {}).get('counts', {}))
+        return totals
+
+    def _delete_compliance_generation(self, generation):
+        """Best-effort cleanup of a previous generation's documents"""
+        refs = list(self._compliance_refs(generation))
+        if generation == 0:
+            refs.append(self._counters().document(LEGACY_COMPLIANCE_COUNTERS_DOC))
+        try:
+            batch = self._client.batch()
+            for ref in refs:
+                batch.delete(ref)
+            batch.commit()
+        except Exception:
+            pass
+
+    # --- Users ---
+    def get_user(self, username):
+        user_doc = self._client.collection(USERS_COLLECTION).document(username).get()
+        if not user_doc.exists:
+            return None
+        # Add username to data dict, as it's the document ID
+        return {**user_doc.to_dict(), 'username': username}
+
+    def set_user(self, username, user_data):
+        self._client.collection(USERS_COLLECTION).document(username).set(user_data)
+
+    def set_users(self, users):
+        batch = self._client.batch()
+        for username, user_data in users.items():
+            batch.set(self._client.collection(USERS_COLLECTION).document(username), user_data)
+        batch.commit()
+
+    def update_user(self, username, update_data):
+        self._client.collection(USERS_COLLECTION).document(username).update(update_data)
+
+    def delete_user(self, username):
+        self._client.collection(USERS_COLLECTION).document(username).delete()
+
+    def list_users(self):
+        return [{**user.to_dict(), 'username': user.id}
+                for user in self._client.collection(USERS_COLLECTION).stream()]
@@ -0,0 +1,140 @@
+# In file: utils/kpi_counters.py
+
+# Counter math shared by the storage backends. A counter set is a nested dict:
+# {'overall': {field: n}, dimension: {key: {field: n}}}
+# with fields 'pending', 'approved', 'rejected', 'duration_sum' and 'duration_count'.
+
+STATUSES = ['pending', 'approved', 'rejected']
+COMPLETED_STATUSES = ['approved', 'rejected']
+
+# Dimensions the KPI pages break results down by; 'day' (the submission day,
+# YYYY-MM-DD) carries the daily series the trend pages chart
+KPI_DIMENSIONS = ['work_center', 'location', 'location_type', 'location_type_work_center', 'day']
+
+# The daily series gains a key every day, so backends store it apart from the
+# headline counters and read it a month at a time (see load_daily_kpi_counters)
+DAILY_DIMENSION = 'day'
+HEADLINE_SCOPES = ['overall'] + [d for d in KPI_DIMENSIONS if d != DAILY_DIMENSION]
+
+# Task fields the counters are computed from
+KPI_TASK_FIELDS = ['status', 'estimated_duration', 'work_center', 'specific_location',
+                   'location_type', 'submission_date']
+
+# Bumped whenever the counter layout changes so stored counters get rebuilt
+KPI_COUNTERS_VERSION = 4
+
+
+def _task_buckets(task):
+    """The (dimension, key) buckets a task is counted in besides 'overall'"""
+    work_center = task.get('work_center', 'Unknown')
+    location_type = task.get('location_type', 'Unknown')
+    buckets = [
+        ('work_center', work_center),
+        ('location', task.get('specific_location', 'Unknown')),
+        ('location_type', location_type),
+        ('location_type_work_center', f"{location_type}/{work_center}")
+    ]
+    submission_day = str(task.get('submission_date') or '')[:10]
+    if submission_day:
+        buckets.append(('day', submission_day))
+    return buckets
+
+
+def _task_contribution(task):
+    """Counter values one task adds to each of its buckets"""
+    status = task.get('status')
+    values = {status: 1} if status else {}
+    duration = task.get('estimated_duration')
+    if status in COMPLETED_STATUSES and isinstance(duration, (int, float)):
+        values['duration_sum'] = duration
+        values['duration_count'] = 1
+    return values
+
+
+def counter_deltas(old_task=None, new_task=None):
+    """Nested {'overall': {...}, dimension: {key: {...}}} of counter changes"""
+    deltas = {}
+
+    def add(task, sign):
+        contribution = _task_contribution(task)
+        targets = [deltas.setdefault('overall', {})]
+        for dimension, key in _task_buckets(task):
+            targets.append(deltas.setdefault(dimension, {}).setdefault(key, {}))
+        for target in targets:
+            for field, value in contribution.items():
+                target[field] = target.get(field, 0) + sign * value
+
+    if old_task:
+        add(old_task, -1)
+    if new_task:
+        add(new_task, 1)
+    return deltas
+
+
+def merge_counts(total, counts):
+    """Adds one counter set into another (in place) and returns it"""
+    for key, value in counts.items():
+        if isinstance(value, dict):
+            merge_counts(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def split_daily(counts):
+    """Splits a counter set into (headline counters, {day: stats})"""
+    headline = {scope: values for scope, values in counts.items() if scope != DAILY_DIMENSION}
+    return headline, counts.get(DAILY_DIMENSION, {})
+
+
+def count_tasks_for_kpis(tasks):
+    """Builds a counter set from scratch for a list of tasks"""
+    totals = {}
+    for task in tasks:
+        merge_counts(totals, counter_deltas(new_task=task))
+    return totals
+
+
+def _approval_rate(stats):
+    completed = sum(stats.get(s, 0) for s in COMPLETED_STATUSES)
+    return (stats.get('approved', 0) / completed * 100) if completed > 0 else 0
+
+
+def kpis_from_counters(counters, location_type=None):
+    """
+    Builds the calculate_kpis result from summed counters, for all tasks or
+    for one location type.
+    """
+    if location_type:
+        scope = counters.get('location_type', {}).get(location_type, {})
+    else:
+        scope = counters.get('overall', {})
+
+    total_tasks = sum(scope.get(s, 0) for s in STATUSES)
+    completed_tasks = sum(scope.get(s, 0) for s in COMPLETED_STATUSES)
+    duration_count = scope.get('duration_count', 0)
+
+    def performance(dimension):
+        return {key: _approval_rate(stats)
+                for key, stats in counters.get(dimension, {}).items()
+                if sum(stats.get(s, 0) for s in STATUSES) > 0}
+
+    if location_type:
+        prefix = f"{location_type}/"
+        work_center_performance = {key[len(prefix):]: rate
+                                   for key, rate in performance('location_type_work_center').items()
+                                   if key.startswith(prefix)}
+        location_type_performance = {location_type: _approval_rate(scope)} if total_tasks else {}
+    else:
+        work_center_performance = performance('work_center')
+        location_type_performance = performance('location_type')
+
+    return {
+        'total_tasks': total_tasks,
+        'completed_tasks': completed_tasks,
+        'approval_rate': _approval_rate(scope),
+        'avg_completion_time': (scope.get('duration_sum', 0) / duration_count) if duration_count > 0 else 0,
+        'work_center_performance': work_center_performance,
+        'location_performance': performance('location'),
+        'location_type_performance': location_type_performance
+    }
@@ -0,0 +1,83 @@
+# In file: utils/kpi_engine.py
+
+import threading
+import time
+import streamlit as st
+from .kpi_counters import counter_deltas, merge_counts, split_daily
+from .storage import get_storage
+
+# How often the in-process aggregates are re-read from the stored counters (seconds)
+KPI_SNAPSHOT_INTERVAL = 60
+
+
+def _months(start_date, end_date):
+    """'YYYY-MM' of every month from start_date to end_date"""
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        yield f"{year:04d}-{month:02d}"
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+class KpiEngine:
+    """
+    Process-wide KPI aggregates (see utils/kpi_counters.py), kept current by
+    folding in task create and status-change events as they happen. Every
+    KPI_SNAPSHOT_INTERVAL seconds the aggregates are replaced by a snapshot
+    of the stored counters, which picks up writes made by other processes
+    and corrects any event that raced with the previous snapshot. The daily
+    series is held only for the months that have been asked for.
+    """
+    def __init__(self, load_counters, load_daily_counters, snapshot_interval=KPI_SNAPSHOT_INTERVAL):
+        self._load_counters = load_counters
+        self._load_daily_counters = load_daily_counters
+        self._snapshot_interval = snapshot_interval
+        self._lock = threading.Lock()
+        self._counters = None
+        self._daily = {}   # month -> {day: stats}
+        self._snapshot_at = 0.0
+
+    def apply(self, old_task=None, new_task=None):
+        """Folds one task change into the aggregates; cost is independent of the task count"""
+        headline, days = split_daily(counter_deltas(old_task, new_task))
+        with self._lock:
+            if self._counters is not None:
+                merge_counts(self._counters, headline)
+            for day, stats in days.items():
+                month = self._daily.get(day[:7])
+                if month is not None:
+                    merge_counts(month.setdefault(day, {}), stats)
+
+    def _expire(self):
+        if time.monotonic() - self._snapshot_at >= self._snapshot_interval:
+            self._counters = None
+            self._daily = {}
+            self._snapshot_at = time.monotonic()
+
+    def counters(self):
+        """Current headline aggregates (a copy), taking a new snapshot when the last one is too old"""
+        with self._lock:
+            self._expire()
+            if self._counters is None:
+                self._counters = self._load_counters()
+            return merge_counts({}, self._counters)
+
+    def daily_counts(self, start_date, end_date):
+        """The daily series {day: stats} (a copy) for the months from start_date to end_date"""
+        months = list(_months(start_date, end_date))
+        with self._lock:
+            self._expire()
+            missing = [month for month in months if month not in self._daily]
+            if missing:
+                loaded = self._load_daily_counters(missing)
+                for month in missing:
+                    self._daily[month] = {}
+                for day, stats in loaded.items():
+                    self._daily[day[:7]][day] = stats
+            return {day: dict(stats) for month in months for day, stats in self._daily[month].items()}
+
+
+@st.cache_resource(show_spinner=False)
+def get_kpi_engine():
+    """The process-wide KpiEngine over the configured storage backend"""
+    storage = get_storage()
+    return KpiEngine(storage.load_kpi_counters, storage.load_daily_kpi_counters)
@@ -0,0 +1,140 @@
+# In file: utils/kpi_forecast.py
+
+import math
+import threading
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import streamlit as st
+from .daily_rollup import get_daily_rollup
+
+# Series are forecast per work center x location, plus one overall series
+FORECAST_SEGMENTS = ['work_center', 'specific_location']
+OVERALL_SEGMENT = 'All'
+FORECAST_HISTORY_DAYS = 90
+# Discounting the least-squares fit by age is exponential smoothing of level and trend
+FORECAST_HALF_LIFE_DAYS = 14
+# Shrinks the trend and weekday terms of series with few reviews towards zero
+FORECAST_RIDGE = 1.0
+FORECAST_Z = 1.96   # 95% prediction intervals
+
+FORECAST_COLUMNS = FORECAST_SEGMENTS + [
+    'reviews', 'current_rate', 'predicted_rate', 'lower', 'upper', 'trend', 'achievement_probability'
+]
+
+
+def _design(offsets):
+    """Model terms per day offset: level, trend (per week) and six weekday effects relative to offset 0"""
+    offsets = np.asarray(offsets)
+    weekdays = (offsets % 7)[:, None] == np.arange(1, 7)[None, :]
+    return np.column_stack([np.ones(len(offsets)), offsets / 7, weekdays])
+
+
+def _normal_cdf(values):
+    return np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in values])
+
+
+def forecast_segments(rollup, as_of, horizon=7, target=80,
+                      history_days=FORECAST_HISTORY_DAYS, half_life=FORECAST_HALF_LIFE_DAYS):
+    """
+    Forecasts the approval rate (approved / reviewed, in %) averaged over the
+    horizon days after as_of for every segment at once, from daily rollup
+    rows. Each series gets a weighted least-squares fit of level, trend and
+    weekday effects; days weigh by their review count and by
+    0.5 ** (age / half_life). Returns a DataFrame with FORECAST_COLUMNS,
+    overall row first.
+    """
+    as_of = pd.Timestamp(as_of).normalize()
+    first_day = as_of - pd.Timedelta(days=history_days - 1)
+    days = pd.to_datetime(rollup['day']) if not rollup.empty else pd.Series(dtype='datetime64[ns]')
+    window = rollup[(days >= first_day) & (days <= as_of)]
+    if window.empty:
+        return pd.DataFrame(columns=FORECAST_COLUMNS)
+
+    # Segments x days matrices of approved and reviewed counts
+    segments = window[FORECAST_SEGMENTS].fillna('Unknown')
+    codes, uniques = pd.MultiIndex.from_frame(segments).factorize()
+    day_index = (pd.to_datetime(window['day']) - first_day).dt.days.to_numpy()
+    approved = np.zeros((len(uniques) + 1, history_days))
+    rejected = np.zeros_like(approved)
+    np.add.at(approved, (codes + 1, day_index), window['approved'].to_numpy())
+    np.add.at(rejected, (codes + 1, day_index), window['rejected'].to_numpy())
+    approved[0], rejected[0] = approved[1:].sum(axis=0), rejected[1:].sum(axis=0)
+    reviewed = approved + rejected
+    keep = reviewed.sum(axis=1) > 0
+    approved, reviewed = approved[keep], reviewed[keep]
+    labels = np.array([(OVERALL_SEGMENT,) * len(FORECAST_SEGMENTS)] + list(uniques), dtype=object)[keep]
+    rates = np.divide(approved * 100, reviewed, out=np.zeros_like(approved), where=reviewed > 0)
+
+    # Offsets count days back from as_of, so the level term is the rate at as_of
+    offsets = np.arange(history_days) - (history_days - 1)
+    X = _design(offsets)
+    terms = X.shape[1]
+    decay = 0.5 ** (-offsets / half_life)
+    weights = reviewed * decay[None, :]
+
+    # Batched weighted normal equations: one (terms x terms) system per series
+    ridge = np.diag([0.0] + [FORECAST_RIDGE] * (terms - 1))
+    A = np.einsum('st,tp,tq->spq', weights, X, X) + ridge
+    b = np.einsum('st,tp,st->sp', weights, X, rates)
+    A_inv = np.linalg.inv(A)
+    beta = np.einsum('spq,sq->sp', A_inv, b)
+
+    # Per-review variance from the residuals of the days that had reviews, never
+    # below the binomial variance so short series do not look certain
+    residuals = rates - beta @ X.T
+    degrees_of_freedom = (reviewed > 0).sum(axis=1) - terms
+    residual_var = np.where(degrees_of_freedom > 0, (reviewed * residuals ** 2).sum(axis=1) / np.maximum(degrees_of_freedom, 1), 0)
+    mean_rate = np.clip(approved.sum(axis=1) / reviewed.sum(axis=1), 0.05, 0.95)
+    sigma2 = np.maximum(residual_var, mean_rate * (1 - mean_rate) * 100 ** 2)
+
+    # Horizon average: mean model terms over the coming days
+    future = _design(np.arange(1, horizon + 1)).mean(axis=0)
+    predicted = beta @ future
+    coefficient_var = sigma2 * np.einsum('p,spq,q->s', future, A_inv, future)
+    expected_reviews = np.maximum(reviewed.sum(axis=1) / history_days * horizon, 1)
+    spread = np.sqrt(coefficient_var + sigma2 / expected_reviews)
+
+    recent = slice(history_days - 7, None)
+    recent_reviewed = reviewed[:, recent].sum(axis=1)
+    current = np.divide(approved[:, recent].sum(axis=1) * 100, recent_reviewed,
+                        out=np.full(len(labels), np.nan), where=recent_reviewed > 0)
+    z = np.divide(predicted - target, spread, out=np.where(predicted >= target, np.inf, -np.inf), where=spread > 0)
+
+    result = pd.DataFrame(list(labels), columns=FORECAST_SEGMENTS)
+    result['reviews'] = reviewed.sum(axis=1).astype('int64')
+    result['current_rate'] = current
+    result['predicted_rate'] = np.clip(predicted, 0, 100)
+    result['lower'] = np.clip(predicted - FORECAST_Z * spread, 0, 100)
+    result['upper'] = np.clip(predicted + FORECAST_Z * spread, 0, 100)
+    result['trend'] = beta[:, 1] / 7
+    result['achievement_probability'] = _normal_cdf(z) * 100
+    return result[FORECAST_COLUMNS]
+
+
+class KpiForecaster:
+    """
+    Caches forecast_segments results over the daily rollup. The rollup only
+    gains rows when a day closes, so results are kept until the next day.
+    """
+    def __init__(self, rollup):
+        self._rollup = rollup
+        self._lock = threading.Lock()
+        self._as_of = None
+        self._results = {}
+
+    def forecast(self, horizon=7, target=80):
+        as_of = date.today() - timedelta(days=1)
+        with self._lock:
+            if as_of != self._as_of:
+                self._as_of, self._results = as_of, {}
+            key = (horizon, target)
+            if key not in self._results:
+                self._results[key] = forecast_segments(self._rollup.rows(), as_of, horizon, target)
+            return self._results[key].copy()
+
+
+@st.cache_resource(show_spinner=False)
+def get_kpi_forecaster():
+    """The process-wide KpiForecaster over the daily rollup"""
+    return KpiForecaster(get_daily_rollup())
@@ -0,0 +1,58 @@
+# In file: utils/page_loader.py
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+# The pool is shared by every session of the process. It is sized so this many
+# sessions can load a page at the same moment, each with its reads in parallel;
+# the reads wait on the network, so idle threads cost little.
+PAGE_LOADER_CONCURRENT_SESSIONS = 16
+# Most reads a page declares (see page_reads in app.py)
+PAGE_LOADER_READS_PER_PAGE = 4
+PAGE_LOADER_MAX_WORKERS = PAGE_LOADER_CONCURRENT_SESSIONS * PAGE_LOADER_READS_PER_PAGE
+
+_executor = ThreadPoolExecutor(max_workers=PAGE_LOADER_MAX_WORKERS, thread_name_prefix="page_loader")
+
+
+def _run_with_context(ctx, func, args):
+    # The Streamlit run context lets the data functions use st.error and st.cache_data
+    add_script_run_ctx(ctx=ctx)
+    return func(*args)
+
+
+def _run_here(func, args):
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+class PageReads:
+    """
+    The independent reads a page needs, all started at once so a render
+    waits for the slowest read rather than the sum of them. The first read
+    runs on the script thread, so a page makes progress even when other
+    sessions keep the pool busy, and a session uses at most
+    PAGE_LOADER_READS_PER_PAGE - 1 pool threads.
+    """
+    def __init__(self, reads):
+        ctx = get_script_run_ctx()
+        items = list(reads.items())
+        pooled = items[1:PAGE_LOADER_READS_PER_PAGE]
+        # Reads past the bound also run here, after the pooled ones are started
+        inline = items[:1] + items[PAGE_LOADER_READS_PER_PAGE:]
+        self._futures = {
+            name: _executor.submit(_run_with_context, ctx, func, args)
+            for name, (func, *args) in pooled
+        }
+        for name, (func, *args) in inline:
+            self._futures[name] = _run_here(func, args)
+
+    def __contains__(self, name):
+        return name in self._futures
+
+    def get(self, name):
+        """Waits for one read and returns its result (exceptions are re-raised here)"""
+        return self._futures[name].result()
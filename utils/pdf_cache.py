@@ -0,0 +1,73 @@
+# In file: utils/pdf_cache.py
+
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+# Rendered work order PDFs are a few KB each; this keeps thousands
+PDF_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def task_revision(task):
+    """
+    Changes whenever a task's report would: after submission only a review
+    (status, feedback, reviewer) changes a task, and every review sets
+    review_date.
+    """
+    return f"{task.get('status')}|{task.get('review_date') or ''}"
+
+
+class PdfCache:
+    """
+    Least-recently-used cache of rendered PDFs keyed by (task id, revision),
+    bounded by the total size of the cached documents. Only the newest
+    revision of a task is kept.
+    """
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # task id -> (revision, pdf bytes)
+        self._size = 0
+
+    def get(self, task_id, revision):
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None or entry[0] != revision:
+                return None
+            self._entries.move_to_end(task_id)
+            return entry[1]
+
+    def put(self, task_id, revision, pdf_bytes):
+        with self._lock:
+            old = self._entries.pop(task_id, None)
+            if old is not None:
+                self._size -= len(old[1])
+            if len(pdf_bytes) > self._max_bytes:
+                return
+            self._entries[task_id] = (revision, pdf_bytes)
+            self._size += len(pdf_bytes)
+            while self._size > self._max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_render(self, task_id, revision, render):
+        """Cached bytes for this revision, or render() them and cache the result"""
+        pdf_bytes = self.get(task_id, revision)
+        if pdf_bytes is None:
+            # Rendered outside the lock; a concurrent miss on the same task just renders twice
+            pdf_bytes = render()
+            self.put(task_id, revision, pdf_bytes)
+        return pdf_bytes
+
+    @property
+    def size(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+@st.cache_resource(show_spinner=False)
+def get_pdf_cache():
+    """The process-wide PdfCache"""
+    return PdfCache()
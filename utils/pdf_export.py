@@ -0,0 +1,101 @@
+# In file: utils/pdf_export.py
+
+import os
+import sys
+import types
+import zipfile
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from .pdf_report import generate_task_pdf
+
+# Work orders sent to a worker at a time; a few KB of task data and PDF each
+PDF_EXPORT_CHUNK_SIZE = 16
+# Chunks queued per worker
+PDF_EXPORT_CHUNKS_PER_WORKER = 2
+
+# Spawned workers re-run the parent's __main__ module before they start. Under
+# Streamlit that is the app script (the script runner installs it as __main__),
+# which would set up storage, counters and the page in every worker; workers
+# are started with this empty stand-in instead.
+_WORKER_MAIN = types.ModuleType('__main__')
+_worker_main_lock = threading.Lock()
+
+
+def task_pdf_file_name(task):
+    """The file name of a task's PDF, as in the Review Center download"""
+    return f"{task.get('work_order_number', 'task')}_{task.get('work_center')}.pdf"
+
+
+def _render_chunk(named_tasks):
+    # Runs in a worker process
+    return [(name, generate_task_pdf(task)) for name, task in named_tasks]
+
+
+def _unique_names(tasks):
+    """File names per task; repeated names get the task id appended"""
+    seen = set()
+    for task in tasks:
+        name = task_pdf_file_name(task)
+        if name in seen:
+            name = f"{name[:-4]}_{task.get('id')}.pdf"
+        seen.add(name)
+        yield name, task
+
+
+@contextmanager
+def _bare_main():
+    """Shows spawned processes an empty __main__ while the block runs"""
+    with _worker_main_lock:
+        main = sys.modules['__main__']
+        sys.modules['__main__'] = _WORKER_MAIN
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main
+
+
+def _write(archive, futures):
+    written = 0
+    for future in futures:
+        for name, pdf_bytes in future.result():
+            archive.writestr(name, pdf_bytes)
+            written += 1
+    return written
+
+
+def export_task_pdfs(tasks, output, on_progress=None, max_workers=None, chunk_size=PDF_EXPORT_CHUNK_SIZE):
+    """
+    Renders the PDF of every task (full documents, checklist included) in a
+    process pool and writes them into a ZIP archive on the file object
+    'output' as they finish. 'tasks' is consumed as the workers need more
+    work, so it can be a lazy iterator. on_progress(done) is called after
+    each chunk. Returns the number of PDFs written.
+    """
+    named = _unique_names(tasks)
+    chunks = iter(lambda: list(islice(named, chunk_size)), [])
+    workers = max_workers or os.cpu_count() or 1
+    # Read before starting the pool, so a small export starts only the workers it needs
+    first = list(islice(chunks, workers * PDF_EXPORT_CHUNKS_PER_WORKER))
+    written = 0
+
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        if not first:
+            return 0
+        workers = min(workers, len(first))
+        # Spawned, not forked: the web server process runs many threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Refilled as chunks finish, so a large export never holds every task in flight.
+            # The pool starts a worker per submit until it has them all, so
+            # every worker is started here, under the stand-in __main__.
+            with _bare_main():
+                pending = {executor.submit(_render_chunk, chunk) for chunk in first}
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                pending |= {executor.submit(_render_chunk, chunk) for chunk in islice(chunks, len(finished))}
+                written += _write(archive, finished)
+                if on_progress:
+                    on_progress(written)
+    return written
@@ -0,0 +1,149 @@
+# In file: utils/pdf_report.py
+
+from datetime import datetime
+from fpdf import FPDF
+
+
+class PDF(FPDF):
+    """Custom PDF class with header and footer"""
+    def header(self):
+        self.set_font('Arial', 'B', 14)
+        self.cell(0, 10, 'Work Order Maintenance Report', 0, 1, 'C')
+        self.ln(5)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        page_num = f'Page {self.page_no()}/{{nb}}'
+        gen_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        self.cell(0, 10, page_num, 0, 0, 'L')
+        self.cell(0, 10, f'Report Generated: {gen_time}', 0, 0, 'R')
+
+def safe_text(text):
+    """Helper to clean text for FPDF latin-1 encoding"""
+    if text is None:
+        return "N/A"
+    return str(text).encode('latin-1', 'replace').decode('latin-1')
+
+def generate_task_pdf(task_data):
+    """Generates a dynamic PDF report for a given task and returns it as bytes"""
+    
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.add_page()
+    write_task_sections(pdf, task_data)
+
+    # Output the PDF as bytes ('S' returns the document instead of printing it)
+    return pdf.output(dest='S').encode('latin-1')
+
+def write_task_sections(pdf, task_data):
+    """Writes the report sections of one task (details, findings, safety, checklist) from the current position"""
+    pdf.set_font('Arial', '', 10)
+    
+    line_height = 7 # Define a standard line height
+    
+    #Helper function for metadata rows 
+    def add_dual_row(l1, v1, l2, v2):
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(40, line_height, safe_text(l1), 1, 0)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(55, line_height, safe_text(v1), 1, 0)
+        
+        pdf.set_font('Arial', 'B', 10)
+        pdf.cell(40, line_height, safe_text(l2), 1, 0)
+        pdf.set_font('Arial', '', 10)
+        pdf.cell(55, line_height, safe_text(v2), 1, 1) # ln=1 for new line
+    
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, '1. Work Order Details', 0, 1, 'L')
+    
+    # Get dynamic names
+    equip_name = task_data.get('equipment_name', task_data.get('instrument_name', 'N/A'))
+    equip_type = task_data.get('equipment_type', task_data.get('instrument_type', 'N/A'))
+    
+    add_dual_row("Work Order #:", task_data.get('work_order_number'), "Status:", task_data.get('status', 'N/A').title())
+    add_dual_row("Submitted By:", task_data.get('submitted_by_name'), "Submission Date:", task_data.get('submission_date', 'N/A')[:10])
+    add_dual_row("Work Center:", task_data.get('work_center'), "Priority:", task_data.get('priority'))
+    add_dual_row("Location Type:", task_data.get('location_type'), "Location:", task_data.get('specific_location'))
+    add_dual_row("Area/Unit:", task_data.get('area'), "Est. Duration (h):", task_data.get('estimated_duration'))
+    add_dual_row("Equipment Tag:", equip_name, "Equipment Type:", equip_type)
+    
+    # Single row for Work Type
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(40, line_height, safe_text("Work Type:"), 1, 0)
+    pdf.set_font('Arial', '', 10)
+    pdf.cell(150, line_height, safe_text(task_data.get('work_type')), 1, 1)
+
+    # Findings ---
+    pdf.ln(5) # Add space
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, '2. Overall Findings / Summary', 0, 1, 'L')
+    pdf.set_font('Arial', '', 10)
+    pdf.multi_cell(190, line_height - 2, safe_text(task_data.get('overall_findings', 'N/A')), 1, 1)
+    
+    #  Safety ---
+    pdf.ln(5)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, '3. Safety Checks Performed', 0, 1, 'L')
+    pdf.set_font('Arial', '', 10)
+    
+    safety_checks = task_data.get('safety_checks', [])
+    if not safety_checks:
+        pdf.cell(190, line_height, "No safety checks recorded.", 1, 1)
+    else:
+        safety_text = ""
+        for check in safety_checks:
+            safety_text += f"- {safe_text(check)}\n"
+        pdf.multi_cell(190, line_height - 2, safety_text, 1, 1)
+
+    # Checklist ---
+    pdf.ln(5)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, '4. PPM Checklist Results', 0, 1, 'L')
+    
+    # Table Header
+    col_width_task = 110
+    col_width_status = 25
+    col_width_remarks = 55
+    
+    pdf.set_font('Arial', 'B', 10)
+    pdf.cell(col_width_task, line_height, 'Task Description', 1, 0, 'C')
+    pdf.cell(col_width_status, line_height, 'Status', 1, 0, 'C')
+    pdf.cell(col_width_remarks, line_height, 'Remarks', 1, 1, 'C')
+    
+    pdf.set_font('Arial', '', 9)
+    checklist_data = task_data.get('checklist_data', [])
+    
+    if not checklist_data:
+           pdf.cell(190, line_height, "No checklist data found.", 1, 1, 'C')
+    else:
+        for item in checklist_data:
+            task_desc = safe_text(item.get('task', 'N/A'))
+            status = safe_text(item.get('status', 'N/A'))
+            remarks = safe_text(item.get('remarks', 'N/A'))
+            
+            # Get Y position before drawing row
+            y_start = pdf.get_y()
+            
+            # Cell Task
+            pdf.multi_cell(col_width_task, line_height - 2, task_desc, 1, 'L')
+            y1 = pdf.get_y() # Get Y after drawing
+            
+            # Reset X,Y for Cell 2
+            pdf.set_xy(pdf.get_x() + col_width_task, y_start)
+            
+            # Cell Status
+            pdf.multi_cell(col_width_status, line_height - 2, status, 1, 'C')
+            y2 = pdf.get_y() # Get Y after drawing
+            
+            # Reset X,Y for Cell 3
+            pdf.set_xy(pdf.get_x() + col_width_task + col_width_status, y_start)
+            
+            # Cell Remarks
+            pdf.multi_cell(col_width_remarks, line_height - 2, remarks, 1, 'L')
+            y3 = pdf.get_y() # Get Y after drawing
+
+            # Set cursor to the bottom of the tallest cell 
+            max_y = max(y1, y2, y3)
+            pdf.set_y(max_y)
@@ -0,0 +1,430 @@
+# In file: utils/sqlite_storage.py
+
+import json
+import sqlite3
+import threading
+import uuid
+from .storage import StorageBackend, project_fields
+from .task_query import FILTER_FIELDS, FILTER_DEFAULTS, EMPTY_MEANS_NONE
+from .kpi_counters import counter_deltas, count_tasks_for_kpis, KPI_COUNTERS_VERSION, DAILY_DIMENSION, HEADLINE_SCOPES
+from .compliance_counters import compliance_deltas, count_reports_for_compliance, COMPLIANCE_COUNTERS_VERSION
+
+# Task fields copied into indexed columns; the full task is kept as JSON in 'data'
+TASK_COLUMNS = ['work_order_number', 'work_center', 'status', 'location_type',
+                'specific_location', 'submitted_by', 'priority', 'submission_date']
+# Stored instead of NULL. A NULL submission_date never compares true against
+# a (submission_date, id) page cursor, so such tasks would drop out of every
+# page after the first; '' sorts them last, like task_cursor() does.
+TASK_COLUMN_DEFAULTS = {'submission_date': ''}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    work_order_number TEXT,
+    work_center TEXT,
+    status TEXT,
+    location_type TEXT,
+    specific_location TEXT,
+    submitted_by TEXT,
+    priority TEXT,
+    submission_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_date ON tasks (submission_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_user ON tasks (submitted_by, submission_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, submission_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_wc_status ON tasks (work_center, status, submission_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_location ON tasks (specific_location, submission_date);
+CREATE INDEX IF NOT EXISTS idx_tasks_wo ON tasks (work_order_number);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id TEXT PRIMARY KEY,
+    username TEXT,
+    read INTEGER,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_notifications_user ON notifications (username, read, timestamp);
+
+CREATE TABLE IF NOT EXISTS compliance_reports (
+    id TEXT PRIMARY KEY,
+    location TEXT,
+    report_date TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_compliance_location ON compliance_reports (location, report_date);
+
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS kpi_counters (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (scope, key, field)
+);
+
+CREATE TABLE IF NOT EXISTS compliance_counters (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (scope, key, field)
+);
+"""
+
+
+def _filter_clause(filters):
+    """
+    Turns get_tasks_by_filters filters into a SQL WHERE clause.
+    Returns (clause, params), or (None, None) when nothing can match.
+    """
+    conditions, params = [], []
+    filters = filters or {}
+    for name, field in FILTER_FIELDS.items():
+        value = filters.get(name)
+        column, column_params = field, []
+        if name in FILTER_DEFAULTS:
+            # Tasks without the field match as if they had the default
+            column, column_params = f"COALESCE({field}, ?)", [FILTER_DEFAULTS[name]]
+        if isinstance(value, (list, tuple, set)):
+            if not value:
+                if name in EMPTY_MEANS_NONE:
+                    return None, None
+                continue
+            conditions.append(f"{column} IN ({', '.join('?' * len(value))})")
+            params.extend(column_params + list(value))
+        elif value:
+            conditions.append(f"{column} = ?")
+            params.extend(column_params + [value])
+    clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return clause, params
+
+
+def _flatten_counters(deltas):
+    """Nested counter deltas -> (scope, key, field, value) rows ('overall' uses an empty key)"""
+    rows = []
+    for scope, values in deltas.items():
+        if scope == 'overall':
+            rows.extend((scope, '', field, value) for field, value in values.items() if value)
+        else:
+            for key, stats in values.items():
+                rows.extend((scope, key, field, value) for field, value in stats.items() if value)
+    return rows
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite backend with indexed task columns. Suited to single-site
+    deployments and to profiling without a Firebase project.
+    """
+    name = "sqlite"
+    reads_are_local = True
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # Streamlit serves sessions from several threads
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            # Tasks stored before TASK_COLUMN_DEFAULTS
+            self._conn.execute("UPDATE tasks SET submission_date = '' WHERE submission_date IS NULL")
+        self._upgrade_kpi_counters()
+        self._upgrade_compliance_counters()
+
+    @staticmethod
+    def _new_id():
+        return uuid.uuid4().hex
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _write(self, statements):
+        """Runs (sql, params) statements in one transaction"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _task_row(task_id, task_data):
+        values = [task_data.get(column) for column in TASK_COLUMNS]
+        values = [TASK_COLUMN_DEFAULTS.get(column) if value is None else value for column, value in zip(TASK_COLUMNS, values)]
+        return [task_id] + values + [json.dumps(task_data)]
+
+    @staticmethod
+    def _counter_statements(old_task=None, new_task=None):
+        return [(
+            "INSERT INTO kpi_counters (scope, key, field, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (scope, key, field) DO UPDATE SET value = value + excluded.value",
+            row
+        ) for row in _flatten_counters(counter_deltas(old_task, new_task))]
+
+    def _upgrade_kpi_counters(self):
+        """Rebuilds the KPI counters from the tasks when they predate the current counter layout"""
+        rows = self._execute("SELECT value FROM counters WHERE name = 'kpi_counters_version'")
+        if rows and rows[0]['value'] >= KPI_COUNTERS_VERSION:
+            return
+        rows = _flatten_counters(count_tasks_for_kpis(self.query_tasks()))
+        self._write(
+            [("DELETE FROM kpi_counters", ())]
+            + [("INSERT INTO kpi_counters (scope, key, field, value) VALUES (?, ?, ?, ?)", row) for row in rows]
+            + [("INSERT INTO counters (name, value) VALUES ('kpi_counters_version', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value", (KPI_COUNTERS_VERSION,))]
+        )
+
+    def _upgrade_compliance_counters(self):
+        """Rebuilds the compliance counters from the reports when they are missing or predate the current layout"""
+        rows = self._execute("SELECT value FROM counters WHERE name = 'compliance_counters_version'")
+        if rows and rows[0]['value'] >= COMPLIANCE_COUNTERS_VERSION:
+            return
+        reports = [json.loads(row['data']) for row in self._execute("SELECT data FROM compliance_reports")]
+        rows = _flatten_counters(count_reports_for_compliance(reports))
+        self._write(
+            [("DELETE FROM compliance_counters", ())]
+            + [("INSERT INTO compliance_counters (scope, key, field, value) VALUES (?, ?, ?, ?)", row) for row in rows]
+            + [("INSERT INTO counters (name, value) VALUES ('compliance_counters_version', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value", (COMPLIANCE_COUNTERS_VERSION,))]
+        )
+
+    # --- Tasks ---
+    def next_work_order_number(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO counters (name, value) VALUES ('work_order_counter', 1) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+                )
+                value = self._conn.execute(
+                    "SELECT value FROM counters WHERE name = 'work_order_counter'"
+                ).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return value
+
+    def add_task(self, task_data):
+        task_id = self._new_id()
+        placeholders = ', '.join('?' * (len(TASK_COLUMNS) + 2))
+        self._write([
+            (f"INSERT INTO tasks (id, {', '.join(TASK_COLUMNS)}, data) VALUES ({placeholders})",
+             self._task_row(task_id, task_data))
+        ] + self._counter_statements(new_task=task_data))
+        return task_id
+
+    def _update_task_row(self, task_id, update_data, expected_status=None):
+        """
+        Updates one task and its counters inside an open transaction; returns
+        the old task, or None if it is missing or not in expected_status
+        """
+        row = self._conn.execute("SELECT status, data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None or (expected_status is not None and row['status'] != expected_status):
+            return None
+        old_task = json.loads(row['data'])
+        new_task = {**old_task, **update_data}
+        assignments = ', '.join(f"{column} = ?" for column in TASK_COLUMNS)
+        self._conn.execute(
+            f"UPDATE tasks SET {assignments}, data = ? WHERE id = ?",
+            self._task_row(task_id, new_task)[1:] + [task_id]
+        )
+        for sql, params in self._counter_statements(old_task, new_task):
+            self._conn.execute(sql, params)
+        return old_task
+
+    def update_task(self, task_id, update_data):
+        return next(self.bulk_update_tasks([(task_id, update_data, None)]))[0]
+
+    def bulk_update_tasks(self, updates, expected_status=None):
+        # One transaction covers every update, so there is a single chunk
+        old_tasks = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for task_id, update_data, notification in updates:
+                    old_task = self._update_task_row(task_id, update_data, expected_status)
+                    if old_task is not None and notification:
+                        self._conn.execute(*self._notification_statement(self._new_id(), notification))
+                    old_tasks.append(old_task)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        yield old_tasks
+
+    def get_task(self, task_id, fields=None):
+        rows = self._execute("SELECT id, data FROM tasks WHERE id = ?", (task_id,))
+        if not rows:
+            return None
+        return project_fields({'id': rows[0]['id'], **json.loads(rows[0]['data'])}, fields)
+
+    def query_tasks(self, filters=None):
+        clause, params = _filter_clause(filters)
+        if clause is None:
+            return []
+        rows = self._execute(f"SELECT id, data FROM tasks {clause}", params)
+        return [{'id': row['id'], **json.loads(row['data'])} for row in rows]
+
+    def query_tasks_page(self, filters=None, page_size=20, cursor=None, fields=None):
+        clause, params = _filter_clause(filters)
+        if clause is None:
+            return [], None
+        if cursor:
+            # A (submission_date, id) cursor continues after that task; a bare date starts before it
+            if isinstance(cursor, str):
+                condition, cursor_params = "submission_date < ?", [cursor]
+            else:
+                condition, cursor_params = "(submission_date, id) < (?, ?)", list(cursor)
+            clause = f"{clause} AND {condition}" if clause else f"WHERE {condition}"
+            params = params + cursor_params
+        rows = self._execute(
+            f"SELECT id, submission_date, data FROM tasks {clause} ORDER BY submission_date DESC, id DESC LIMIT ?",
+            params + [page_size + 1]
+        )
+        page = [project_fields({'id': row['id'], **json.loads(row['data'])}, fields) for row in rows[:page_size]]
+        last = rows[page_size - 1] if len(rows) > page_size else None
+        next_cursor = (last['submission_date'] or '', last['id']) if last else None
+        return page, next_cursor
+
+    def count_tasks(self, filters=None):
+        clause, params = _filter_clause(filters)
+        if clause is None:
+            return 0
+        return self._execute(f"SELECT COUNT(*) FROM tasks {clause}", params)[0][0]
+
+    def query_tasks_changed_since(self, since):
+        rows = self._execute(
+            "SELECT id, data FROM tasks WHERE submission_date >= ? "
+            "UNION SELECT id, data FROM tasks WHERE json_extract(data, '$.review_date') >= ?",
+            (since, since)
+        )
+        return [{'id': row['id'], **json.loads(row['data'])} for row in rows]
+
+    def load_kpi_counters(self):
+        totals = {}
+        rows = self._execute(
+            f"SELECT scope, key, field, value FROM kpi_counters WHERE scope IN ({', '.join('?' * len(HEADLINE_SCOPES))})",
+            HEADLINE_SCOPES
+        )
+        for row in rows:
+            target = totals.setdefault(row['scope'], {})
+            if row['scope'] != 'overall':
+                target = target.setdefault(row['key'], {})
+            value = row['value']
+            target[row['field']] = int(value) if value.is_integer() else value
+        return totals
+
+    def load_daily_kpi_counters(self, months):
+        if not months:
+            return {}
+        # One primary key range scan; the day keys sort by month
+        rows = self._execute(
+            "SELECT key, field, value FROM kpi_counters WHERE scope = ? AND key >= ? AND key <= ?",
+            (DAILY_DIMENSION, f"{min(months)}-01", f"{max(months)}-31")
+        )
+        days = {}
+        for row in rows:
+            if row['key'][:7] in months:
+                value = row['value']
+                days.setdefault(row['key'], {})[row['field']] = int(value) if value.is_integer() else value
+        return days
+
+    # --- Notifications ---
+    @staticmethod
+    def _notification_statement(notif_id, notif_data):
+        return (
+            "INSERT INTO notifications (id, username, read, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+            (notif_id, notif_data.get('username'), int(bool(notif_data.get('read'))),
+             notif_data.get('timestamp'), json.dumps(notif_data))
+        )
+
+    def add_notification(self, notif_data):
+        notif_id = self._new_id()
+        self._write([self._notification_statement(notif_id, notif_data)])
+        return notif_id
+
+    def get_unread_notifications(self, username):
+        rows = self._execute(
+            "SELECT id, data FROM notifications WHERE username = ? AND read = 0 ORDER BY timestamp DESC",
+            (username,)
+        )
+        return [{'id': row['id'], **json.loads(row['data'])} for row in rows]
+
+    def mark_notification_read(self, notification_id):
+        self._write([(
+            "UPDATE notifications SET read = 1, data = json_set(data, '$.read', json('true')) WHERE id = ?",
+            (notification_id,)
+        )])
+
+    # --- Compliance reports ---
+    def add_compliance_report(self, report_data):
+        report_id = self._new_id()
+        # The report and its counter updates are written together
+        self._write([(
+            "INSERT INTO compliance_reports (id, location, report_date, data) VALUES (?, ?, ?, ?)",
+            (report_id, report_data.get('location'), report_data.get('report_date'), json.dumps(report_data))
+        )] + [(
+            "INSERT INTO compliance_counters (scope, key, field, value) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (scope, key, field) DO UPDATE SET value = value + excluded.value",
+            row
+        ) for row in _flatten_counters(compliance_deltas(report_data))])
+        return report_id
+
+    def get_compliance_reports(self, location):
+        rows = self._execute(
+            "SELECT id, data FROM compliance_reports WHERE location = ? ORDER BY report_date DESC",
+            (location,)
+        )
+        return [{'id': row['id'], **json.loads(row['data'])} for row in rows]
+
+    def load_compliance_counters(self):
+        counters = {}
+        for row in self._execute("SELECT scope, key, field, value FROM compliance_counters"):
+            counters.setdefault(row['scope'], {}).setdefault(row['key'], {})[row['field']] = int(row['value'])
+        return counters
+
+    # --- Users ---
+    def get_user(self, username):
+        rows = self._execute("SELECT data FROM users WHERE username = ?", (username,))
+        return {**json.loads(rows[0]['data']), 'username': username} if rows else None
+
+    def set_user(self, username, user_data):
+        self.set_users({username: user_data})
+
+    def set_users(self, users):
+        self._write([(
+            "INSERT INTO users (username, data) VALUES (?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET data = excluded.data",
+            (username, json.dumps(user_data))
+        ) for username, user_data in users.items()])
+
+    def update_user(self, username, update_data):
+        user = self.get_user(username)
+        if user is None:
+            raise KeyError(f"User '{username}' not found")
+        user.pop('username', None)
+        self.set_user(username, {**user, **update_data})
+
+    def delete_user(self, username):
+        self._write([("DELETE FROM users WHERE username = ?", (username,))])
+
+    def list_users(self):
+        rows = self._execute("SELECT username, data FROM users")
+        return [{**json.loads(row['data']), 'username': row['username']} for row in rows]
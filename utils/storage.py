@@ -0,0 +1,427 @@
+# In file: utils/storage.py
+
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left, insort
+import streamlit as st
+from .task_repository import task_matches_filters
+from .kpi_counters import counter_deltas, merge_counts, split_daily
+from .compliance_counters import compliance_deltas
+
+# Backend used when nothing is configured
+DEFAULT_STORAGE_BACKEND = "firestore"
+DEFAULT_SQLITE_PATH = "iwa_dcs.db"
+
+
+def task_cursor(task):
+    """
+    The page cursor after a task: (submission_date, id). Pages are ordered
+    by submission_date, newest first, with ties broken by id (descending),
+    so tasks sharing a timestamp are never skipped at a page boundary.
+    A missing or None submission_date counts as '', so those tasks come
+    last (the SQLite backend stores them as '' for the same order).
+    """
+    return (task.get('submission_date') or '', task['id'])
+
+
+def is_before_cursor(task, cursor):
+    """
+    True when a task comes after 'cursor' in page order. A cursor is a
+    task_cursor() tuple, or a bare submission_date string to start with
+    the tasks submitted before it.
+    """
+    if isinstance(cursor, str):
+        return (task.get('submission_date') or '') < cursor
+    return task_cursor(task) < tuple(cursor)
+
+
+class TaskOrder:
+    """
+    The task_cursor() keys of a set of in-memory tasks, kept sorted as tasks
+    are added, changed and removed. A page is cut by bisecting to the cursor
+    and walking back from there, instead of sorting every task for every
+    page. The owner serializes access with its own lock.
+    """
+    def __init__(self):
+        self._keys = []   # ascending, so pages walk it from the end
+
+    def update(self, old_task=None, new_task=None):
+        """Replaces a task's key (either task may be None for an add or a remove)"""
+        if old_task is not None:
+            key = task_cursor(old_task)
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+        if new_task is not None:
+            insort(self._keys, task_cursor(new_task))
+
+    def page(self, tasks, filters, page_size, cursor=None):
+        """
+        One page of 'tasks' (id -> task) matching the filters.
+        Returns (tasks, next_cursor) like StorageBackend.query_tasks_page.
+        """
+        if not cursor:
+            end = len(self._keys)
+        elif isinstance(cursor, str):
+            # (date,) sorts before every (date, id), so this skips the tasks submitted at or after it
+            end = bisect_left(self._keys, (cursor,))
+        else:
+            end = bisect_left(self._keys, tuple(cursor))
+        page = []
+        for index in range(end - 1, -1, -1):
+            task = tasks[self._keys[index][1]]
+            if task_matches_filters(task, filters):
+                if len(page) == page_size:
+                    return page, task_cursor(page[-1])
+                page.append(task)
+        return page, None
+
+
+def project_fields(task, fields=None):
+    """Keeps only 'fields' (plus the id) of a task dict, like a Firestore select"""
+    if not fields:
+        return task
+    return {key: value for key, value in task.items() if key == 'id' or key in fields}
+
+
+class StorageBackend(ABC):
+    """
+    Interface every storage backend implements. Tasks, notifications and
+    compliance reports are plain dicts carrying their document id as 'id';
+    users carry their username as 'username'.
+    """
+    name = "base"
+
+    # True when task reads are served from local memory or disk, so the
+    # TTL task cache in front of remote reads is not needed
+    reads_are_local = False
+
+    # --- Tasks ---
+    @abstractmethod
+    def next_work_order_number(self):
+        """Returns the next unique work order number as an int"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_task(self, task_data):
+        """Stores a new task (and updates the KPI counters); returns its id"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_task(self, task_id, update_data):
+        """Updates a task (and the KPI counters) atomically; returns the task before the update, or None if missing"""
+        raise NotImplementedError
+
+    def bulk_update_tasks(self, updates, expected_status=None):
+        """
+        Applies several task updates in committed chunks. 'updates' is a list
+        of (task_id, update_data, notification) tuples; the notification (or
+        None) is only stored when its task is updated. With expected_status,
+        tasks whose current status differs are skipped. Yields, per committed
+        chunk, the tasks before the update in the same order as 'updates',
+        None for missing or skipped ones. Backends check and write each chunk
+        atomically; this default does one task at a time.
+        """
+        for task_id, update_data, notification in updates:
+            old_task = None
+            current = self.get_task(task_id, ['status'])
+            if current is not None and (expected_status is None or current.get('status') == expected_status):
+                old_task = self.update_task(task_id, update_data)
+            if old_task is not None and notification:
+                self.add_notification(notification)
+            yield [old_task]
+
+    @abstractmethod
+    def get_task(self, task_id, fields=None):
+        """Returns one task, or None if missing"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def query_tasks(self, filters=None):
+        """Returns every task matching the get_tasks_by_filters filters"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def query_tasks_page(self, filters=None, page_size=20, cursor=None, fields=None):
+        """
+        Returns (tasks, next_cursor) for one page ordered by submission_date,
+        newest first, ties by id. 'cursor' is the previous page's next_cursor
+        or a bare submission_date (see is_before_cursor).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_tasks(self, filters=None):
+        raise NotImplementedError
+
+    def query_tasks_changed_since(self, since):
+        """Tasks submitted or reviewed at or after the ISO timestamp 'since'"""
+        return [t for t in self.query_tasks()
+                if t.get('submission_date', '') >= since or (t.get('review_date') or '') >= since]
+
+    @abstractmethod
+    def load_kpi_counters(self):
+        """Returns the summed headline KPI counter set (see utils/kpi_counters.py), without the daily series"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_daily_kpi_counters(self, months):
+        """Returns the daily KPI series {day: stats} for the given months ('YYYY-MM')"""
+        raise NotImplementedError
+
+    def get_work_order_gaps(self):
+        """Work order numbers reserved but never used (only block-leasing backends leave gaps)"""
+        return []
+
+    # --- Notifications ---
+    @abstractmethod
+    def add_notification(self, notif_data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_unread_notifications(self, username):
+        """Unread notifications for a user, newest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_notification_read(self, notification_id):
+        raise NotImplementedError
+
+    # --- Compliance reports ---
+    @abstractmethod
+    def add_compliance_report(self, report_data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_compliance_reports(self, location):
+        """Reports for one location, newest report_date first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_compliance_counters(self):
+        """Returns the compliance counter set (see utils/compliance_counters.py), kept current by add_compliance_report"""
+        raise NotImplementedError
+
+    # --- Users ---
+    @abstractmethod
+    def get_user(self, username):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_user(self, username, user_data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_users(self, users):
+        """Stores several users ({username: user_data}) in one write"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_user(self, username, update_data):
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_user(self, username):
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_users(self):
+        raise NotImplementedError
+
+
+class MemoryStorage(StorageBackend):
+    """Keeps everything in process memory. Meant for benchmarks, load tests and demos."""
+    name = "memory"
+    reads_are_local = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tasks = {}
+        self._task_order = TaskOrder()
+        self._notifications = {}
+        self._compliance_reports = {}
+        self._users = {}
+        self._counters = {}
+        self._compliance_counters = {}
+        self._work_order_number = 0
+
+    @staticmethod
+    def _new_id():
+        return uuid.uuid4().hex
+
+    # --- Tasks ---
+    def next_work_order_number(self):
+        with self._lock:
+            self._work_order_number += 1
+            return self._work_order_number
+
+    def add_task(self, task_data):
+        task_id = self._new_id()
+        with self._lock:
+            self._tasks[task_id] = {'id': task_id, **task_data}
+            self._task_order.update(new_task=self._tasks[task_id])
+            merge_counts(self._counters, counter_deltas(new_task=task_data))
+        return task_id
+
+    def update_task(self, task_id, update_data):
+        with self._lock:
+            old_task = self._tasks.get(task_id)
+            if old_task is None:
+                return None
+            new_task = {**old_task, **update_data}
+            self._tasks[task_id] = new_task
+            self._task_order.update(old_task, new_task)
+            merge_counts(self._counters, counter_deltas(old_task, new_task))
+        return {k: v for k, v in old_task.items() if k != 'id'}
+
+    def bulk_update_tasks(self, updates, expected_status=None):
+        old_tasks = []
+        with self._lock:
+            for task_id, update_data, notification in updates:
+                old_task = self._tasks.get(task_id)
+                if old_task is None or (expected_status is not None and old_task.get('status') != expected_status):
+                    old_tasks.append(None)
+                    continue
+                new_task = {**old_task, **update_data}
+                self._tasks[task_id] = new_task
+                self._task_order.update(old_task, new_task)
+                merge_counts(self._counters, counter_deltas(old_task, new_task))
+                if notification:
+                    notif_id = self._new_id()
+                    self._notifications[notif_id] = {'id': notif_id, **notification}
+                old_tasks.append({k: v for k, v in old_task.items() if k != 'id'})
+        yield old_tasks
+
+    def get_task(self, task_id, fields=None):
+        with self._lock:
+            task = self._tasks.get(task_id)
+        return project_fields(task, fields) if task else None
+
+    def query_tasks(self, filters=None):
+        with self._lock:
+            tasks = list(self._tasks.values())
+        return [t for t in tasks if task_matches_filters(t, filters)]
+
+    def query_tasks_page(self, filters=None, page_size=20, cursor=None, fields=None):
+        with self._lock:
+            page, next_cursor = self._task_order.page(self._tasks, filters, page_size, cursor)
+        return [project_fields(t, fields) for t in page], next_cursor
+
+    def count_tasks(self, filters=None):
+        return len(self.query_tasks(filters))
+
+    def load_kpi_counters(self):
+        with self._lock:
+            return merge_counts({}, split_daily(self._counters)[0])
+
+    def load_daily_kpi_counters(self, months):
+        with self._lock:
+            days = split_daily(self._counters)[1]
+            return {day: dict(stats) for day, stats in days.items() if day[:7] in months}
+
+    # --- Notifications ---
+    def add_notification(self, notif_data):
+        notif_id = self._new_id()
+        with self._lock:
+            self._notifications[notif_id] = {'id': notif_id, **notif_data}
+        return notif_id
+
+    def get_unread_notifications(self, username):
+        with self._lock:
+            notifications = [n for n in self._notifications.values()
+                             if n.get('username') == username and not n.get('read')]
+        return sorted(notifications, key=lambda n: n.get('timestamp', ''), reverse=True)
+
+    def mark_notification_read(self, notification_id):
+        with self._lock:
+            notification = self._notifications[notification_id]
+            self._notifications[notification_id] = {**notification, 'read': True}
+
+    # --- Compliance reports ---
+    def add_compliance_report(self, report_data):
+        report_id = self._new_id()
+        with self._lock:
+            self._compliance_reports[report_id] = {'id': report_id, **report_data}
+            merge_counts(self._compliance_counters, compliance_deltas(report_data))
+        return report_id
+
+    def get_compliance_reports(self, location):
+        with self._lock:
+            reports = [r for r in self._compliance_reports.values() if r.get('location') == location]
+        return sorted(reports, key=lambda r: r.get('report_date', ''), reverse=True)
+
+    def load_compliance_counters(self):
+        with self._lock:
+            return merge_counts({}, self._compliance_counters)
+
+    # --- Users ---
+    def get_user(self, username):
+        with self._lock:
+            user = self._users.get(username)
+        return {**user, 'username': username} if user else None
+
+    def set_user(self, username, user_data):
+        with self._lock:
+            self._users[username] = dict(user_data)
+
+    def set_users(self, users):
+        with self._lock:
+            self._users.update((username, dict(user_data)) for username, user_data in users.items())
+
+    def update_user(self, username, update_data):
+        with self._lock:
+            self._users[username] = {**self._users[username], **update_data}
+
+    def delete_user(self, username):
+        with self._lock:
+            self._users.pop(username, None)
+
+    def list_users(self):
+        with self._lock:
+            return [{**data, 'username': username} for username, data in self._users.items()]
+
+
+def _storage_setting(name, default):
+    """Reads a [storage] setting from Streamlit secrets; IWA_STORAGE_<NAME> env vars take precedence"""
+    env_value = os.environ.get(f"IWA_STORAGE_{name.upper()}")
+    if env_value:
+        return env_value
+    try:
+        return st.secrets.get("storage", {}).get(name, default)
+    except Exception:
+        # No secrets file at all
+        return default
+
+
+@st.cache_resource(show_spinner=False)
+def get_storage():
+    """
+    Returns the process-wide storage backend chosen by configuration:
+
+        [storage]
+        backend = "firestore"   # or "sqlite" / "memory"
+        sqlite_path = "iwa_dcs.db"
+
+    Local backends start with the demo user accounts so the app can be
+    used without a Firebase project.
+    """
+    backend = _storage_setting("backend", DEFAULT_STORAGE_BACKEND).lower()
+
+    if backend == "firestore":
+        from .firestore_storage import FirestoreStorage
+        return FirestoreStorage()
+
+    if backend == "sqlite":
+        from .sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(_storage_setting("sqlite_path", DEFAULT_SQLITE_PATH))
+    elif backend == "memory":
+        storage = MemoryStorage()
+    else:
+        raise ValueError(f"Unknown storage backend '{backend}'. Use 'firestore', 'sqlite' or 'memory'.")
+
+    if not storage.list_users():
+        from .auth import SAMPLE_USERS
+        storage.set_users(SAMPLE_USERS)
+    return storage
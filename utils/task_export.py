@@ -0,0 +1,209 @@
+# In file: utils/task_export.py
+
+import os
+import csv
+import tempfile
+import threading
+import time
+import weakref
+from importlib.util import find_spec
+from concurrent.futures import ThreadPoolExecutor
+
+# Tasks read per storage page while exporting
+EXPORT_PAGE_SIZE = 500
+# Export files live here. A file is deleted with its job (when the session
+# replaces or drops it); files older than the TTL, e.g. left by a process
+# that stopped, are swept whenever an export starts.
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "task_exports")
+EXPORT_FILE_TTL = 6 * 60 * 60
+# Rows per worksheet, header included; Excel's limit is 1,048,576
+XLSX_MAX_ROWS = 1_000_000
+
+# XLSX is written with xlsxwriter (see requirements.txt), or openpyxl when only that is
+# installed; both write rows as they come
+if find_spec('xlsxwriter'):
+    XLSX_ENGINE = 'xlsxwriter'
+elif find_spec('openpyxl'):
+    XLSX_ENGINE = 'openpyxl'
+else:
+    XLSX_ENGINE = None
+
+EXPORT_FORMATS = ['CSV'] + (['XLSX'] if XLSX_ENGINE else [])
+
+# How checklist results are laid out in an export
+CHECKLIST_LAYOUTS = {
+    'none': "Leave out",
+    'columns': "Columns (one row per work order)",
+    'rows': "Rows (one row per checklist item)",
+}
+CHECKLIST_ITEM_FIELDS = ['task', 'status', 'remarks']
+
+# Exports run outside the script thread so the page stays responsive
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="task_export")
+
+
+def iter_tasks(storage, filters=None, fields=None, page_size=EXPORT_PAGE_SIZE):
+    """Yields every task matching the filters, newest first, reading one storage page at a time"""
+    cursor = None
+    while True:
+        tasks, cursor = storage.query_tasks_page(filters, page_size, cursor, fields)
+        yield from tasks
+        if not cursor:
+            return
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return '; '.join(str(item) for item in value)
+    return value
+
+
+def export_rows(tasks, fields, layout='none', max_items=0):
+    """
+    Yields a header row, then the rows of every task: 'fields' first, then
+    the checklist as item columns (up to max_items items) or as one row per
+    item, depending on the layout.
+    """
+    header = list(fields)
+    if layout == 'columns':
+        header += [f"item_{n}_{field}" for n in range(1, max_items + 1) for field in CHECKLIST_ITEM_FIELDS]
+    elif layout == 'rows':
+        header += ['item_number'] + [f"item_{field}" for field in CHECKLIST_ITEM_FIELDS]
+    yield header
+
+    for task in tasks:
+        row = [_cell(task.get(field)) for field in fields]
+        items = [item for item in task.get('checklist_data') or [] if isinstance(item, dict)]
+        if layout == 'columns':
+            for item in items[:max_items]:
+                row += [_cell(item.get(field)) for field in CHECKLIST_ITEM_FIELDS]
+            row += [''] * (len(header) - len(row))
+            yield row
+        elif layout == 'rows':
+            if not items:
+                yield row + [''] * (1 + len(CHECKLIST_ITEM_FIELDS))
+            for number, item in enumerate(items, 1):
+                yield row + [number] + [_cell(item.get(field)) for field in CHECKLIST_ITEM_FIELDS]
+        else:
+            yield row
+
+
+def write_csv(rows, path):
+    # utf-8-sig so Excel detects the encoding
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        csv.writer(file).writerows(rows)
+
+
+def write_xlsx(rows, path):
+    """
+    Writes rows to an XLSX file without holding them in memory. Rows past
+    XLSX_MAX_ROWS continue on further sheets, each starting with the header.
+    """
+    if XLSX_ENGINE is None:
+        raise ImportError("XLSX export needs xlsxwriter or openpyxl")
+    rows = iter(rows)
+    header = next(rows)
+
+    if XLSX_ENGINE == 'xlsxwriter':
+        import xlsxwriter
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        sheet, row_number = None, XLSX_MAX_ROWS
+        for row in rows:
+            if row_number == XLSX_MAX_ROWS:
+                sheet = workbook.add_worksheet()
+                sheet.write_row(0, 0, header)
+                row_number = 1
+            sheet.write_row(row_number, 0, row)
+            row_number += 1
+        if sheet is None:
+            workbook.add_worksheet().write_row(0, 0, header)
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet, row_number = None, XLSX_MAX_ROWS
+        for row in rows:
+            if row_number == XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet()
+                sheet.append(header)
+                row_number = 1
+            sheet.append(row)
+            row_number += 1
+        if sheet is None:
+            workbook.create_sheet().append(header)
+        workbook.save(path)
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def sweep_export_files(max_age=EXPORT_FILE_TTL):
+    """Deletes export files older than max_age seconds"""
+    cutoff = time.time() - max_age
+    with os.scandir(EXPORT_DIR) as entries:
+        for entry in entries:
+            try:
+                expired = entry.is_file() and entry.stat().st_mtime < cutoff
+            except FileNotFoundError:
+                # Deleted by another session meanwhile
+                continue
+            if expired:
+                _remove_file(entry.path)
+
+
+class ExportJob:
+    """
+    A task export written to a temp file by a background thread. The page
+    polls 'exported' and 'finished'; 'error' holds the message of a failed
+    export.
+    """
+    def __init__(self, storage, filters, file_format, fields, layout='none', max_items=0):
+        self.file_format = file_format
+        self.exported = 0
+        self.finished = False
+        self.error = None
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        sweep_export_files()
+        handle, self.path = tempfile.mkstemp(suffix=f".{file_format.lower()}", prefix="tasks_", dir=EXPORT_DIR)
+        os.close(handle)
+        # Runs when the job is garbage collected, e.g. with an abandoned session's state
+        self._delete_file = weakref.finalize(self, _remove_file, self.path)
+        self._cancelled = threading.Event()
+        # The checklist payload is only downloaded when it is exported
+        query_fields = [field for field in fields if field != 'id'] + (['checklist_data'] if layout != 'none' else [])
+        self._future = _executor.submit(self._run, storage, filters, query_fields, fields, layout, max_items)
+
+    def _counted(self, tasks):
+        for task in tasks:
+            if self._cancelled.is_set():
+                raise RuntimeError("Export cancelled")
+            yield task
+            self.exported += 1
+
+    def _run(self, storage, filters, query_fields, fields, layout, max_items):
+        try:
+            rows = export_rows(self._counted(iter_tasks(storage, filters, query_fields)), fields, layout, max_items)
+            (write_xlsx if self.file_format == 'XLSX' else write_csv)(rows, self.path)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.finished = True
+
+    def read(self):
+        """The exported file's content"""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError("The export file has expired; start the export again")
+        with open(self.path, 'rb') as file:
+            return file.read()
+
+    def discard(self):
+        """Stops the export if it is still running and deletes its file"""
+        self._cancelled.set()
+        delete_file = self._delete_file
+        self._future.add_done_callback(lambda _future: delete_file())
@@ -0,0 +1,78 @@
+# In file: utils/task_mirror.py
+
+import threading
+from .task_repository import task_matches_filters
+from .storage import TaskOrder
+
+# How long the first page render waits for the initial snapshot (seconds)
+INITIAL_SNAPSHOT_TIMEOUT = 10
+
+
+class TaskMirror:
+    """
+    In-process copy of the tasks collection, kept current by a single
+    Firestore snapshot listener and shared by every Streamlit session.
+    """
+    def __init__(self, client, collection):
+        self._client = client
+        self._collection = collection
+        self._tasks = {}
+        self._order = TaskOrder()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._watch = None
+
+    def start(self):
+        """Attach the snapshot listener (the first snapshot loads every task)"""
+        if self._watch is None:
+            self._watch = self._client.collection(self._collection).on_snapshot(self._on_snapshot)
+
+    def stop(self):
+        """Detach the snapshot listener"""
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+        self._ready.clear()
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        """Apply incremental adds, modifies and removes from the listener"""
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                old_task = self._tasks.pop(doc.id, None)
+                new_task = None if change.type.name == 'REMOVED' else {'id': doc.id, **doc.to_dict()}
+                if new_task is not None:
+                    self._tasks[doc.id] = new_task
+                self._order.update(old_task, new_task)
+        self._ready.set()
+
+    def wait_until_ready(self, timeout=INITIAL_SNAPSHOT_TIMEOUT):
+        return self._ready.wait(timeout)
+
+    @property
+    def is_ready(self):
+        """True once the initial snapshot has arrived and the listener is still streaming"""
+        return self._ready.is_set() and self._watch is not None and self._watch.is_active
+
+    def put(self, task):
+        """Apply a local write straight away so the writer's next rerun sees it"""
+        with self._lock:
+            self._order.update(self._tasks.get(task['id']), task)
+            self._tasks[task['id']] = task
+
+    def get(self, task_id):
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def query(self, filters=None):
+        """Return the tasks matching the get_tasks_by_filters filters"""
+        with self._lock:
+            tasks = list(self._tasks.values())
+        if not filters:
+            return tasks
+        return [t for t in tasks if task_matches_filters(t, filters)]
+
+    def page(self, filters=None, page_size=20, cursor=None):
+        """One page of the tasks matching the filters, in query_tasks_page order, without sorting them all"""
+        with self._lock:
+            return self._order.page(self._tasks, filters, page_size, cursor)
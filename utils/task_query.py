@@ -0,0 +1,75 @@
+# In file: utils/task_query.py
+
+# Task filter name -> Firestore document field
+FILTER_FIELDS = {
+    'work_center': 'work_center',
+    'status': 'status',
+    'location_type': 'location_type',
+    'specific_location': 'specific_location',
+    'username': 'submitted_by',
+    'priority': 'priority'
+}
+
+# Every value a list filter can take. Selecting all of them filters nothing,
+# so no server-side clause is spent on it.
+FILTER_DOMAINS = {
+    'work_center': {'Electrical', 'Mechanical', 'Instrument'},
+    'status': {'pending', 'approved', 'rejected'},
+    'location_type': {'Onshore', 'Offshore'},
+    'priority': {'Low', 'Medium', 'High'}
+}
+
+# Value a task without the field is treated as having (legacy tasks have no priority)
+FILTER_DEFAULTS = {'priority': 'Medium'}
+
+# List filters where an empty selection means "show nothing"
+# (for the others an empty selection means "no filter")
+EMPTY_MEANS_NONE = {'status', 'priority'}
+
+# Firestore allows at most 30 disjunctions once 'in' clauses are expanded
+FIRESTORE_DISJUNCTION_LIMIT = 30
+
+
+def build_task_query(collection_ref, filters=None):
+    """
+    Turns task filters into server-side 'where' clauses.
+
+    Returns (query, client_filters). 'client_filters' holds the filters
+    Firestore cannot express and must be applied in Python with
+    task_matches_filters. 'query' is None when the filters can match
+    nothing (e.g. an empty status selection).
+    """
+    query = collection_ref
+    client_filters = {}
+    if not filters:
+        return query, client_filters
+
+    disjunctions = 1
+    for name, field in FILTER_FIELDS.items():
+        value = filters.get(name)
+
+        if isinstance(value, (list, tuple, set)):
+            values = sorted(set(value))
+            if not values:
+                if name in EMPTY_MEANS_NONE:
+                    return None, {}
+                continue
+            if name in FILTER_DOMAINS and set(values) >= FILTER_DOMAINS[name]:
+                # Everything selected: only drop documents missing the field
+                client_filters[name] = list(value)
+            elif FILTER_DEFAULTS.get(name) in values:
+                # Documents missing the field match too, which no where clause can express
+                client_filters[name] = list(value)
+            elif len(values) == 1:
+                query = query.where(field, '==', values[0])
+            elif disjunctions * len(values) <= FIRESTORE_DISJUNCTION_LIMIT:
+                query = query.where(field, 'in', values)
+                disjunctions *= len(values)
+            else:
+                client_filters[name] = list(value)
+        elif value and value == FILTER_DEFAULTS.get(name):
+            client_filters[name] = value
+        elif value:
+            query = query.where(field, '==', value)
+
+    return query, client_filters
@@ -0,0 +1,102 @@
+# In file: utils/task_repository.py
+
+import threading
+import time
+from .task_query import FILTER_FIELDS, FILTER_DEFAULTS, EMPTY_MEANS_NONE
+
+# How long a cached task list stays valid (seconds)
+CACHE_TTL_SECONDS = 60
+
+# Process-wide cache shared by every Streamlit session:
+# normalized filter key -> {'filters': dict, 'expires': float, 'tasks': list}
+_task_cache = {}
+_cache_lock = threading.Lock()
+
+
+def normalize_filters(filters=None):
+    """
+    Turns a task filter dict into a hashable cache key.
+    Unset values are dropped and lists are sorted, so equivalent
+    filters share one cache entry.
+    """
+    if not filters:
+        return ()
+    key = []
+    for name, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            # An empty list is kept: an empty status list means "no results"
+            key.append((name, tuple(sorted(value))))
+        elif value:
+            key.append((name, value))
+    return tuple(sorted(key))
+
+
+def task_matches_filters(task, filters=None):
+    """Checks a task dict against the filters used by get_tasks_by_filters"""
+    if not filters:
+        return True
+
+    for name, field in FILTER_FIELDS.items():
+        value = filters.get(name)
+        task_value = task.get(field, FILTER_DEFAULTS.get(name))
+        if isinstance(value, (list, tuple, set)):
+            if not value:
+                if name in EMPTY_MEANS_NONE:
+                    return False
+                continue
+            if task_value not in value:
+                return False
+        elif value and task_value != value:
+            return False
+
+    return True
+
+
+def get_cached_tasks(filters=None):
+    """
+    Returns the cached task list for these filters, or None on a miss.
+    A fresh unfiltered entry (from get_all_tasks) also answers filtered
+    lookups in memory.
+    """
+    key = normalize_filters(filters)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _task_cache.get(key)
+        if entry and entry['expires'] > now:
+            return list(entry['tasks'])
+
+        full_entry = _task_cache.get(())
+        if key and full_entry and full_entry['expires'] > now:
+            return [t for t in full_entry['tasks'] if task_matches_filters(t, filters)]
+    return None
+
+
+def cache_tasks(filters, tasks):
+    """Stores a freshly fetched task list under its normalized filters"""
+    key = normalize_filters(filters)
+    with _cache_lock:
+        _task_cache[key] = {
+            'filters': dict(filters) if filters else {},
+            'expires': time.monotonic() + CACHE_TTL_SECONDS,
+            'tasks': list(tasks)
+        }
+
+
+def cache_put_task(task):
+    """
+    Write-through for a created or updated task (must include 'id').
+    The task replaces any older copy and is kept only in the entries
+    whose filters it still matches.
+    """
+    with _cache_lock:
+        for entry in _task_cache.values():
+            tasks = [t for t in entry['tasks'] if t.get('id') != task['id']]
+            if task_matches_filters(task, entry['filters']):
+                tasks.append(task)
+            entry['tasks'] = tasks
+
+
+def invalidate_task_cache():
+    """Drops every cached task list"""
+    with _cache_lock:
+        _task_cache.clear()
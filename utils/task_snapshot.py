@@ -0,0 +1,182 @@
+# In file: utils/task_snapshot.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import streamlit as st
+from .storage import get_storage, _storage_setting
+from .checklist_items import checklist_item_table, CHECKLIST_ITEM_SCHEMA
+from .findings_terms import findings_term_counts, WORD_COUNTS_FIELD, PHRASE_COUNTS_FIELD, TERM_COUNTS_TYPE
+
+# Where the snapshot lives and how stale the analytics pages may see it (seconds)
+DEFAULT_SNAPSHOT_PATH = "task_snapshot"
+SNAPSHOT_REFRESH_INTERVAL = 60
+# Changes are re-read with this much overlap to tolerate clock skew between servers
+SNAPSHOT_REFRESH_OVERLAP = timedelta(minutes=5)
+SNAPSHOT_VERSION = 3
+
+META_FILE = "_snapshot.json"
+PARTITION_FIELD = "submission_month"
+# Flattened checklist results; the leading underscore keeps them out of task reads
+CHECKLIST_ITEMS_DIR = "_checklist_items"
+
+# Flat task fields kept in the snapshot; checklist and safety lists stay in the database
+SNAPSHOT_SCHEMA = pa.schema(
+    [(name, pa.string()) for name in [
+        'id', 'work_order_number', 'work_center', 'location_type', 'specific_location', 'area',
+        'equipment_name', 'equipment_type', 'instrument_name', 'instrument_type',
+        'work_type', 'priority'
+    ]]
+    + [('estimated_duration', pa.float64())]
+    + [(name, pa.string()) for name in [
+        'overall_findings', 'submitted_by', 'submitted_by_name', 'submission_date',
+        'status', 'feedback', 'reviewed_by', 'review_date'
+    ]]
+    + [(WORD_COUNTS_FIELD, TERM_COUNTS_TYPE), (PHRASE_COUNTS_FIELD, TERM_COUNTS_TYPE)]
+)
+
+
+def _month(task):
+    return str(task.get('submission_date') or '')[:7] or 'unknown'
+
+
+def _term_counts(task):
+    """The task's stored findings term counts; tasks submitted before they were stored get them computed here"""
+    if isinstance(task.get(WORD_COUNTS_FIELD), dict) and isinstance(task.get(PHRASE_COUNTS_FIELD), dict):
+        return task
+    return findings_term_counts(task.get('overall_findings'))
+
+
+def _to_table(tasks):
+    """Task dicts -> Arrow table with SNAPSHOT_SCHEMA (non-numeric durations become null)"""
+    term_counts = [_term_counts(task) for task in tasks]
+    columns = {}
+    for field in SNAPSHOT_SCHEMA:
+        values = [task.get(field.name) for task in tasks]
+        if field.type == TERM_COUNTS_TYPE:
+            values = [list(counts[field.name].items()) for counts in term_counts]
+        elif field.type == pa.float64():
+            values = [v if isinstance(v, (int, float)) else None for v in values]
+        else:
+            values = [v if v is None else str(v) for v in values]
+        columns[field.name] = pa.array(values, type=field.type)
+    return pa.table(columns, schema=SNAPSHOT_SCHEMA)
+
+
+class TaskSnapshot:
+    """
+    Columnar copy of the tasks collection as zstd-compressed Parquet files,
+    one per submission month (<root>/submission_month=YYYY-MM/tasks.parquet),
+    with their checklist results exploded into one row per item alongside
+    (<root>/_checklist_items/submission_month=YYYY-MM/items.parquet).
+    A refresh only reads tasks submitted or reviewed since the previous one
+    and rewrites the months they fall in. Reads are memory-mapped and only
+    decode the requested columns.
+    """
+    def __init__(self, storage, root):
+        self._storage = storage
+        self._root = root
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+
+    @property
+    def root(self):
+        return self._root
+
+    def _partition_path(self, month):
+        return os.path.join(self._root, f"{PARTITION_FIELD}={month}", "tasks.parquet")
+
+    def _items_path(self, month):
+        return os.path.join(self._root, CHECKLIST_ITEMS_DIR, f"{PARTITION_FIELD}={month}", "items.parquet")
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self._root, META_FILE)) as f:
+                meta = json.load(f)
+            return meta if meta.get('version') == SNAPSHOT_VERSION else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path, write):
+        # The dot prefix keeps half-written files out of directory reads
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_partition(self, path, table):
+        self._write_atomic(path, lambda tmp_path: pq.write_table(table, tmp_path, compression='zstd'))
+
+    def _write_meta(self, watermark):
+        meta = {'version': SNAPSHOT_VERSION, 'watermark': watermark, 'refreshed_at': datetime.now().isoformat()}
+
+        def write(path):
+            with open(path, 'w') as f:
+                json.dump(meta, f)
+        self._write_atomic(os.path.join(self._root, META_FILE), write)
+
+    def refresh(self):
+        """Brings the snapshot up to date; the first call (or a version change) writes it from scratch"""
+        started_at = datetime.now().isoformat()
+        meta = self._read_meta()
+        if meta is None:
+            changed = self._storage.query_tasks()
+        else:
+            since = (datetime.fromisoformat(meta['watermark']) - SNAPSHOT_REFRESH_OVERLAP).isoformat()
+            changed = self._storage.query_tasks_changed_since(since)
+
+        by_month = {}
+        for task in changed:
+            by_month.setdefault(_month(task), []).append(task)
+
+        for month, tasks in by_month.items():
+            changed_ids = pa.array([str(task['id']) for task in tasks], type=pa.string())
+            for path, table, id_field in [(self._partition_path(month), _to_table(tasks), 'id'),
+                                          (self._items_path(month), checklist_item_table(tasks), 'task_id')]:
+                if meta is not None and os.path.exists(path):
+                    # Replace the changed tasks' rows, keep the rest of the month
+                    existing = pq.read_table(path, memory_map=True)
+                    keep = pc.invert(pc.is_in(existing[id_field], value_set=changed_ids))
+                    table = pa.concat_tables([existing.filter(keep), table])
+                self._write_partition(path, table)
+
+        self._write_meta(started_at)
+
+    def _ensure_fresh(self):
+        with self._lock:
+            if time.monotonic() - self._checked_at >= SNAPSHOT_REFRESH_INTERVAL or self._read_meta() is None:
+                self.refresh()
+                self._checked_at = time.monotonic()
+
+    def _read_dataset(self, directory, schema, columns, filters):
+        columns = list(columns) if columns else schema.names
+        if not any(name.endswith(('tasks.parquet', 'items.parquet')) for _, _, files in os.walk(directory) for name in files):
+            return schema.empty_table().select(columns)
+        return pq.read_table(directory, columns=columns, filters=filters, memory_map=True,
+                             partitioning='hive', schema=schema.append(pa.field(PARTITION_FIELD, pa.string())))
+
+    def read(self, columns=None, filters=None):
+        """
+        Returns an Arrow table of the snapshot, refreshing it first when the
+        last check is older than SNAPSHOT_REFRESH_INTERVAL. 'filters' uses the
+        pyarrow DNF form, e.g. [('status', '=', 'approved')].
+        """
+        self._ensure_fresh()
+        return self._read_dataset(self._root, SNAPSHOT_SCHEMA, columns, filters)
+
+    def read_checklist_items(self, columns=None, filters=None):
+        """Like read, for the flattened checklist results (CHECKLIST_ITEM_SCHEMA)"""
+        self._ensure_fresh()
+        return self._read_dataset(os.path.join(self._root, CHECKLIST_ITEMS_DIR), CHECKLIST_ITEM_SCHEMA, columns, filters)
+
+
+@st.cache_resource(show_spinner=False)
+def get_task_snapshot():
+    """The process-wide TaskSnapshot, stored at [storage] snapshot_path"""
+    return TaskSnapshot(get_storage(), _storage_setting("snapshot_path", DEFAULT_SNAPSHOT_PATH))
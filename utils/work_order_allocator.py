@@ -0,0 +1,101 @@
+# In file: utils/work_order_allocator.py
+
+import os
+import socket
+import threading
+from datetime import datetime
+from firebase_admin import firestore
+
+# How many work order numbers a server process reserves per counter transaction
+WORK_ORDER_BLOCK_SIZE = 50
+
+WORK_ORDER_COUNTER_DOC = "work_order_counter"
+LEASES_COLLECTION = "leases"
+
+
+def format_work_order_number(number):
+    return f"WO-{number:05d}"
+
+
+class WorkOrderAllocator:
+    """
+    Hands out work order numbers from blocks leased off the shared Firestore
+    counter. Only leasing a block touches counters/work_order_counter, so
+    concurrent submissions no longer contend on that single document.
+    Numbers stay unique across processes; numbers left in a block when a
+    process stops become gaps (see get_work_order_gaps).
+    """
+    def __init__(self, client, counters_collection, block_size=WORK_ORDER_BLOCK_SIZE):
+        self._client = client
+        self._counter_ref = client.collection(counters_collection).document(WORK_ORDER_COUNTER_DOC)
+        self._block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0  # exclusive
+        self.lease_id = None
+
+    def next_number(self):
+        with self._lock:
+            if self._next >= self._end:
+                self._lease_block()
+            number = self._next
+            self._next += 1
+            return number
+
+    def _lease_block(self):
+        counter_ref = self._counter_ref
+        lease_ref = counter_ref.collection(LEASES_COLLECTION).document()
+        block_size = self._block_size
+
+        @firestore.transactional
+        def lease_in_transaction(transaction):
+            doc = counter_ref.get(transaction=transaction)
+            current = doc.to_dict().get('current_number', 0) if doc.exists else 0
+            start, end = current + 1, current + block_size
+            transaction.set(counter_ref, {'current_number': end}, merge=True)
+            transaction.set(lease_ref, {
+                'start': start,
+                'end': end,
+                'leased_at': datetime.now().isoformat(),
+                'process': f"{socket.gethostname()}:{os.getpid()}"
+            })
+            return start, end
+
+        start, end = lease_in_transaction(self._client.transaction())
+        self._next, self._end = start, end + 1
+        self.lease_id = lease_ref.id
+
+    def get_work_order_gaps(self, tasks_collection, max_leases=20):
+        """
+        Lists work order numbers that were leased but never used by a task,
+        for the most recent leases. This process's open lease is skipped
+        because its remaining numbers are still being handed out; other
+        running processes' leases may also still be in use.
+        """
+        leases = (self._counter_ref.collection(LEASES_COLLECTION)
+                  .order_by('start', direction=firestore.Query.DESCENDING)
+                  .limit(max_leases)
+                  .stream())
+
+        gaps = []
+        for lease in leases:
+            if lease.id == self.lease_id:
+                continue
+            data = lease.to_dict()
+            start, end = data['start'], data['end']
+            used_docs = (self._client.collection(tasks_collection)
+                         .where('work_order_number', '>=', format_work_order_number(start))
+                         .where('work_order_number', '<=', format_work_order_number(end))
+                         .select(['work_order_number'])
+                         .stream())
+            used = {doc.to_dict().get('work_order_number') for doc in used_docs}
+            unused = [n for n in range(start, end + 1) if format_work_order_number(n) not in used]
+            if unused:
+                gaps.append({
+                    'process': data.get('process', 'unknown'),
+                    'leased_at': data.get('leased_at', ''),
+                    'start': start,
+                    'end': end,
+                    'unused': unused
+                })
+        return gaps